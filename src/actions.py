@@ -1,30 +1,38 @@
 "Side-effecting actions"
 
+import atexit
 import datetime
 import json
 import os
+import threading
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
 import attr
 from effect import (
     ComposedDispatcher,
     Effect,
+    ParallelEffects,
     TypeDispatcher,
     base_dispatcher,
-    sync_perform,
+    parallel,
     sync_performer,
 )
-from effect.do import (
-    do,
-    do_return
-)
-from effect.testing import perform_sequence
-import requests
+from effect.threads import perform_parallel_with_pool
+
+# requests, the thread pool and the modules behind the file performers are
+# slow to import: they are imported when first performed, see
+# benchmarks.startup
+if TYPE_CHECKING:
+    from multiprocessing.pool import ThreadPool
+    import requests
 
 @attr.s
 class HttpRequest:
     url = attr.ib(validator=attr.validators.instance_of(str))
     params = attr.ib(validator=attr.validators.instance_of(dict),
                      default=attr.Factory(dict))
+    stream = attr.ib(validator=attr.validators.instance_of(bool),
+                     default=False)
 
 def get_redmine_info(
         base_url: str,
@@ -32,7 +40,12 @@ def get_redmine_info(
         start_date: datetime.date,
         end_date: datetime.date,
         api_key: str,
+        stream: bool = False,
 ) -> Effect:
+    """Query time entries of C{user} between both dates (included)
+
+    If C{stream} is true, the result is an iterator over chunks of the
+    response body instead of the whole text (see L{entries.parse_chunks})."""
     return Effect(HttpRequest(
         base_url,
         {"c[]": ["project", "spent_on", "user", "activity", "issue",
@@ -44,12 +57,121 @@ def get_redmine_info(
              start_date, end_date)],
          "v[user_id][]": user,
          "key": api_key,
-        }))
+        },
+        stream))
 
 
-@sync_performer
-def perform_http_request(dispatcher, req):
-    return requests.get(req.url, params=req.params).text
+def split_date_range(
+        start_date: datetime.date,
+        end_date: datetime.date,
+        window_days: int,
+) -> List[Tuple[datetime.date, datetime.date]]:
+    """Split [start_date, end_date] into consecutive windows of window_days
+
+    Both bounds of each window are included, as in Redmine's C{><} filter."""
+    if window_days < 1:
+        raise ValueError("'window_days' must be >= 1 and {!r} isn't".format(
+            window_days))
+    result = []
+    step = datetime.timedelta(window_days)
+    one_day = datetime.timedelta(1)
+    while start_date <= end_date:
+        result.append((start_date, min(start_date + step - one_day, end_date)))
+        start_date += step
+    return result
+
+
+def get_redmine_info_by_windows(
+        base_url: str,
+        user: str,
+        start_date: datetime.date,
+        end_date: datetime.date,
+        api_key: str,
+        window_days: int,
+) -> Effect:
+    """Like L{get_redmine_info} but with one request per window of days
+
+    The requests are performed in parallel (see L{perform_parallel_effects}):
+    the result is the list of response bodies, in date order."""
+    return parallel([get_redmine_info(base_url, user, start, end, api_key)
+                     for (start, end) in split_date_range(
+                             start_date, end_date, window_days)])
+
+
+HTTP_CHUNK_SIZE = 64 * 1024
+"@var: size in bytes of the chunks of a streamed HTTP response body"
+
+class HttpPerformer(object):
+    """Perform L{HttpRequest}s with one C{requests.Session}
+
+    The session keeps up to C{pool_size} connections per host alive, asks
+    for gzip compressed bodies and retries up to C{retries} times, with
+    exponential backoff, requests failing to connect, timing out or getting
+    a 5xx status.  A streamed body is not retried once it started arriving.
+    The session is only created when the first request is performed."""
+    def __init__(
+            self,
+            pool_size: int = 4,
+            timeout: Tuple[float, float] = (10.0, 300.0),
+            retries: int = 3,
+            backoff_factor: float = 0.5,
+    ) -> None:
+        self.pool_size = pool_size
+        self.timeout = timeout
+        "@ivar: (connect, read) timeouts in seconds"
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._session: Optional[requests.Session] = None
+        self._lock = threading.Lock()
+
+    def session(self) -> "requests.Session":
+        with self._lock:
+            if self._session is None:
+                import requests
+                import requests.adapters
+                from requests.packages.urllib3.util.retry import Retry
+
+                retry = Retry(total=self.retries,
+                              backoff_factor=self.backoff_factor,
+                              status_forcelist=(500, 502, 503, 504))
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=self.pool_size,
+                    pool_maxsize=self.pool_size,
+                    max_retries=retry)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers["Accept-Encoding"] = "gzip"
+                self._session = session
+            return self._session
+
+    @sync_performer
+    def perform(self, dispatcher, req):
+        response = self.session().get(req.url,
+                                      params=req.params,
+                                      timeout=self.timeout,
+                                      stream=req.stream)
+        try:
+            response.raise_for_status()
+        except BaseException:
+            response.close()
+            raise
+        if req.stream:
+            return _closing_chunks(response)
+        else:
+            return response.text
+
+
+def _closing_chunks(response):
+    """Yield the chunks of the body of streamed C{response}
+
+    The response, and its connection, are closed once the body was read or
+    the generator is closed."""
+    try:
+        yield from response.iter_content(chunk_size=HTTP_CHUNK_SIZE,
+                                         decode_unicode=True)
+    finally:
+        response.close()
 
 
 @attr.s
@@ -66,6 +188,135 @@ def perform_read_json(dispatcher, read_json):
         return json.load(fp, parse_int=float)
 
 
+@attr.s
+class ReadCache:
+    "Read days already fetched in [start, end] and their time entries"
+    filename = attr.ib(validator=attr.validators.instance_of(str))
+    host = attr.ib(validator=attr.validators.instance_of(str))
+    user = attr.ib(validator=attr.validators.instance_of(str))
+    start = attr.ib(validator=attr.validators.instance_of(datetime.date))
+    end = attr.ib(validator=attr.validators.instance_of(datetime.date))
+
+
+@attr.s
+class WriteCache:
+    "Replace cached time entries of [start, end] by C{entries}"
+    filename = attr.ib(validator=attr.validators.instance_of(str))
+    host = attr.ib(validator=attr.validators.instance_of(str))
+    user = attr.ib(validator=attr.validators.instance_of(str))
+    start = attr.ib(validator=attr.validators.instance_of(datetime.date))
+    end = attr.ib(validator=attr.validators.instance_of(datetime.date))
+    entries = attr.ib(validator=attr.validators.instance_of(list))
+
+
+def read_cache(fname, host, user, start, end):
+    return Effect(ReadCache(os.path.abspath(fname), host, user, start, end))
+
+def write_cache(fname, host, user, start, end, entries):
+    return Effect(WriteCache(
+        os.path.abspath(fname), host, user, start, end, entries))
+
+@sync_performer
+def perform_read_cache(dispatcher, rc):
+    import cache
+    with cache.open_cache(rc.filename) as conn:
+        return cache.load(conn, rc.host, rc.user, rc.start, rc.end)
+
+@sync_performer
+def perform_write_cache(dispatcher, wc):
+    import cache
+    with cache.open_cache(wc.filename) as conn:
+        cache.store(conn, wc.host, wc.user, wc.start, wc.end, wc.entries)
+
+
+@attr.s
+class ReadSnapshot:
+    "Read a saved L{snapshot.Snapshot} as JSON, None if there is none"
+    filename = attr.ib(validator=attr.validators.instance_of(str))
+
+
+@attr.s
+class WriteSnapshot:
+    "Replace the saved snapshot by JSON C{data}"
+    filename = attr.ib(validator=attr.validators.instance_of(str))
+    data = attr.ib(validator=attr.validators.instance_of(dict))
+
+
+def read_snapshot(fname):
+    return Effect(ReadSnapshot(os.path.abspath(fname)))
+
+def write_snapshot(fname, data):
+    return Effect(WriteSnapshot(os.path.abspath(fname), data))
+
+@sync_performer
+def perform_read_snapshot(dispatcher, rs):
+    import snapshot
+    return snapshot.load(rs.filename)
+
+@sync_performer
+def perform_write_snapshot(dispatcher, ws):
+    import snapshot
+    snapshot.save(ws.filename, ws.data)
+
+
+@attr.s
+class WriteArchive:
+    "Replace archive C{filename} by one of C{entries}, see L{archive}"
+    filename = attr.ib(validator=attr.validators.instance_of(str))
+    entries = attr.ib(validator=attr.validators.instance_of(list))
+
+
+def write_archive(fname, time_entries):
+    return Effect(WriteArchive(os.path.abspath(fname), time_entries))
+
+@sync_performer
+def perform_write_archive(dispatcher, wa):
+    import archive
+    return archive.write(wa.filename, wa.entries)
+
+
+@attr.s
+class ReadEntryFiles:
+    """Read the entries of the exports and archives of C{paths}
+
+    Directories are replaced by their files, see L{ingest.expand_paths}, and
+    the files are read by C{jobs} processes.  The result is one list of
+    entries per file."""
+    paths = attr.ib(validator=attr.validators.instance_of(list))
+    jobs = attr.ib(default=1, validator=attr.validators.instance_of(int))
+
+
+def read_entry_files(paths, jobs=1):
+    return Effect(ReadEntryFiles([os.path.abspath(p) for p in paths], jobs))
+
+@sync_performer
+def perform_read_entry_files(dispatcher, ref):
+    import ingest
+    return ingest.read_files(ingest.expand_paths(ref.paths), ref.jobs)
+
+
+@attr.s
+class ReadEntryColumns:
+    """Read the exports and archives of C{paths} like L{ReadEntryFiles}
+
+    The result is one L{batch.Columns} per file, the rules being selected
+    among C{rules}: archives are read without creating their entries."""
+    paths = attr.ib(validator=attr.validators.instance_of(list))
+    rules = attr.ib(validator=attr.validators.instance_of(list))
+    jobs = attr.ib(default=1, validator=attr.validators.instance_of(int))
+
+
+def read_entry_columns(paths, rules, jobs=1):
+    return Effect(ReadEntryColumns(
+        [os.path.abspath(p) for p in paths], rules, jobs))
+
+@sync_performer
+def perform_read_entry_columns(dispatcher, rec):
+    import ingest
+    return ingest.read_files_columns(
+        ingest.expand_paths(rec.paths), rec.rules, rec.jobs)
+
+
 class GetCurrentDate:
     pass
 
@@ -90,10 +341,38 @@ def do_print(fmt, *args, **kwargs):
     return Effect(Print(fmt.format(*args, **kwargs)))
 
 
+MAX_PARALLEL_EFFECTS = 4
+"@var: number of threads performing L{ParallelEffects} children"
+
+HTTP_PERFORMER = HttpPerformer(pool_size=MAX_PARALLEL_EFFECTS)
+
+_thread_pool: Optional["ThreadPool"] = None
+
+def perform_parallel_effects(dispatcher, parallel_effects, box):
+    # The pool is only created when first needed
+    global _thread_pool
+    if _thread_pool is None:
+        from multiprocessing.pool import ThreadPool
+        _thread_pool = ThreadPool(MAX_PARALLEL_EFFECTS)
+        # Imported late, multiprocessing may be torn down before the pool
+        # is collected at exit: stop it while it is still usable
+        atexit.register(_thread_pool.terminate)
+    return perform_parallel_with_pool(
+        _thread_pool, dispatcher, parallel_effects, box)
+
+
 IO_DISPATCHER = ComposedDispatcher([
     TypeDispatcher({ReadJSON: perform_read_json,
                     GetCurrentDate: perform_get_current_date,
-                    HttpRequest: perform_http_request,
+                    HttpRequest: HTTP_PERFORMER.perform,
                     Print: perform_print,
+                    ParallelEffects: perform_parallel_effects,
+                    ReadCache: perform_read_cache,
+                    WriteCache: perform_write_cache,
+                    ReadSnapshot: perform_read_snapshot,
+                    WriteSnapshot: perform_write_snapshot,
+                    WriteArchive: perform_write_archive,
+                    ReadEntryFiles: perform_read_entry_files,
+                    ReadEntryColumns: perform_read_entry_columns,
     }),
     base_dispatcher])
@@ -0,0 +1,93 @@
+"""Perform effects with asyncio, see L{ASYNC_DISPATCHER}
+
+Blocking intents (HTTP requests, file and cache accesses) are performed with
+the synchronous L{actions.IO_DISPATCHER} in a thread pool, so that the
+children of a C{ParallelEffects} overlap while the event loop stays free."""
+
+import asyncio
+import concurrent.futures
+import functools
+import importlib
+from typing import Any, Optional
+
+from effect import (
+    ComposedDispatcher,
+    Effect,
+    ParallelEffects,
+    TypeDispatcher,
+    base_dispatcher,
+    perform,
+    sync_perform,
+)
+
+import actions
+
+# `async' is a keyword since Python 3.7
+perform_parallel_async = importlib.import_module(
+    "effect.async").perform_parallel_async
+
+_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+def _get_executor() -> concurrent.futures.ThreadPoolExecutor:
+    # Only created when first needed, like actions' thread pool
+    global _executor
+    if _executor is None:
+        _executor = concurrent.futures.ThreadPoolExecutor(
+            actions.MAX_PARALLEL_EFFECTS)
+    return _executor
+
+
+def async_performer(f):
+    """Turn a coroutine function C{f(dispatcher, intent)} into a performer
+
+    The coroutine is scheduled on the current event loop and its outcome
+    put in the box once it is done."""
+    @functools.wraps(f)
+    def performer(dispatcher, intent, box):
+        def done(future):
+            try:
+                result = future.result()
+            except BaseException as e:
+                box.fail((type(e), e, e.__traceback__))
+            else:
+                box.succeed(result)
+        asyncio.ensure_future(f(dispatcher, intent)).add_done_callback(done)
+    return performer
+
+
+@async_performer
+async def perform_in_executor(dispatcher, intent):
+    "Perform C{intent} with L{actions.IO_DISPATCHER} in a worker thread"
+    return await asyncio.get_event_loop().run_in_executor(
+        _get_executor(),
+        functools.partial(sync_perform, actions.IO_DISPATCHER, Effect(intent)))
+
+
+async def async_perform(dispatcher, effect: Effect) -> Any:
+    "Coroutine returning the result of C{effect} (or raising its error)"
+    future = asyncio.get_event_loop().create_future()
+    def succeed(result):
+        if not future.cancelled():
+            future.set_result(result)
+    def fail(exc_info):
+        if not future.cancelled():
+            future.set_exception(exc_info[1])
+    perform(dispatcher, effect.on(success=succeed, error=fail))
+    return await future
+
+
+ASYNC_DISPATCHER = ComposedDispatcher([
+    TypeDispatcher({actions.ReadJSON: perform_in_executor,
+                    actions.GetCurrentDate: actions.perform_get_current_date,
+                    actions.HttpRequest: perform_in_executor,
+                    actions.Print: actions.perform_print,
+                    actions.ReadCache: perform_in_executor,
+                    actions.WriteCache: perform_in_executor,
+                    actions.ReadSnapshot: perform_in_executor,
+                    actions.WriteSnapshot: perform_in_executor,
+                    actions.WriteArchive: perform_in_executor,
+                    actions.ReadEntryFiles: perform_in_executor,
+                    actions.ReadEntryColumns: perform_in_executor,
+                    ParallelEffects: perform_parallel_async,
+    }),
+    base_dispatcher])
@@ -0,0 +1,317 @@
+"""Compact binary archive of time entries
+
+An archive stores the entries column-wise so that loading them needs no
+text parsing nor validation:
+
+- C{category}, C{issue_id} and C{project} are dictionary encoded: each
+  distinct value is stored once and the entries store its code, on 1, 2 or
+  4 bytes depending on the number of distinct values;
+- day ordinals are delta encoded (exports are sorted by date, so deltas
+  usually fit in a byte);
+- durations are 8 bytes floats;
+- the comments are stored one after the other in a single UTF-8 blob, with
+  the offset (in characters) of each comment.
+
+The file starts with a header (L{_HEADER}) followed by sections, each one
+being its length and its content padded to 8 bytes.  The arrays are
+little-endian and aligned, so that L{Archive} reads them straight from a
+memory-mapped file, see L{open_archive}."""
+
+import contextlib
+import datetime
+import itertools
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import batch
+import entries
+import rules
+
+MAGIC = b"RSTE"
+"@var: first bytes of an archive"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHxxQq8s")
+"@var: magic, version, entry count, first day and typecodes of the columns"
+_SECTION_LENGTH = struct.Struct("<Q")
+
+_DICTIONARY_FIELDS = ("category", "issue_id", "project")
+_DICTIONARY_OFFSETS = "I"
+"@var: typecode of the offsets of the dictionaries' values"
+
+
+class ArchiveError(ValueError):
+    "The file is not an archive or is corrupt"
+
+
+def _code_typecode(count: int) -> str:
+    "Smallest unsigned typecode of the codes of C{count} distinct values"
+    return "B" if count <= 1 << 8 else "H" if count <= 1 << 16 else "I"
+
+
+def _delta_typecode(deltas: Sequence[int]) -> str:
+    "Smallest signed typecode holding all of C{deltas}"
+    low, high = min(deltas, default=0), max(deltas, default=0)
+    for typecode in ("b", "h", "i"):
+        bound = 1 << (8 * array(typecode).itemsize - 1)
+        if -bound <= low and high < bound:
+            return typecode
+    return "q"
+
+
+def _little_endian(a: array) -> bytes:
+    if sys.byteorder != "little":
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a.tobytes()
+
+
+def _strings(values: Sequence[str], typecode: str) -> Tuple[bytes, bytes]:
+    "Return the offsets (in characters) of C{values} and their UTF-8 blob"
+    offsets = array(typecode, [0])
+    offsets.extend(itertools.accumulate(map(len, values)))
+    return _little_endian(offsets), "".join(values).encode("utf-8")
+
+
+def write(filename: str, time_entries: Iterable[entries.TimeEntry]) -> int:
+    """Write C{time_entries} in archive C{filename}, atomically
+
+    Return the number of entries written."""
+    codes: Dict[str, Dict[str, int]] = {f: {} for f in _DICTIONARY_FIELDS}
+    columns: Dict[str, List[int]] = {f: [] for f in _DICTIONARY_FIELDS}
+    days: List[int] = []
+    durations = array("d")
+    comments: List[str] = []
+    for e in time_entries:
+        for field in _DICTIONARY_FIELDS:
+            field_codes = codes[field]
+            value = getattr(e, field)
+            try:
+                code = field_codes[value]
+            except KeyError:
+                code = field_codes[value] = len(field_codes)
+            columns[field].append(code)
+        days.append(e.date.toordinal())
+        durations.append(e.duration)
+        comments.append(e.comment)
+    first_day = days[0] if days else 0
+    deltas = [day - previous for previous, day in zip(
+        itertools.chain((first_day,), days), days)]
+    delta_typecode = _delta_typecode(deltas)
+    code_typecodes = [_code_typecode(len(codes[f]))
+                      for f in _DICTIONARY_FIELDS]
+    comment_typecode = "I" if sum(map(len, comments)) < 1 << 32 else "Q"
+    sections: List[bytes] = []
+    for field in _DICTIONARY_FIELDS:
+        sections.extend(_strings(list(codes[field]), _DICTIONARY_OFFSETS))
+    sections.append(_little_endian(array(delta_typecode, deltas)))
+    sections.append(_little_endian(durations))
+    sections.extend(_little_endian(array(typecode, columns[field]))
+                    for typecode, field in zip(code_typecodes,
+                                               _DICTIONARY_FIELDS))
+    sections.extend(_strings(comments, comment_typecode))
+    typecodes = "".join([delta_typecode] + code_typecodes + [comment_typecode])
+    tmp_name = filename + ".tmp"
+    with open(tmp_name, "wb") as fp:
+        fp.write(_HEADER.pack(MAGIC, _VERSION, len(days), first_day,
+                              typecodes.encode("ascii")))
+        for section in sections:
+            fp.write(_SECTION_LENGTH.pack(len(section)))
+            fp.write(section)
+            fp.write(bytes(-len(section) % 8))
+    os.replace(tmp_name, filename)
+    return len(days)
+
+
+class Archive(object):
+    """Time entries read from the C{buffer} of an archive
+
+    The columns are views of C{buffer} (copies on big-endian machines):
+    call L{close} before the buffer, e.g. a memory map, is closed.
+
+    @ivar categories: the distinct categories, indexed by their codes
+    @ivar issue_ids: the distinct issue IDs, indexed by their codes
+    @ivar projects: the distinct projects, indexed by their codes
+    @ivar first_day: ordinal of the day the deltas start from
+    @ivar day_deltas: difference between the day of each entry and of the
+        previous one (or C{first_day})
+    @ivar durations: duration of each entry
+    @ivar category_codes: code of the category of each entry
+    @ivar issue_codes: code of the issue ID of each entry
+    @ivar project_codes: code of the project of each entry"""
+    def __init__(self, buffer) -> None:
+        self._views: List[memoryview] = [memoryview(buffer)]
+        try:
+            self._read(self._views[0])
+        except BaseException:
+            self.close()
+            raise
+
+    def __len__(self) -> int:
+        return len(self.durations)
+
+    def _read(self, buf: memoryview) -> None:
+        try:
+            magic, version, count, self.first_day, typecodes = (
+                _HEADER.unpack_from(buf))
+        except struct.error:
+            raise ArchiveError("Truncated archive header")
+        if magic != MAGIC:
+            raise ArchiveError("Not an archive")
+        if version != _VERSION:
+            raise ArchiveError(
+                "Unsupported archive version {}".format(version))
+        (delta_typecode, category_typecode, issue_typecode, project_typecode,
+         comment_typecode) = typecodes.decode("ascii")[:5]
+        sections = self._sections(buf, _HEADER.size)
+        self.categories = self._strings(sections, _DICTIONARY_OFFSETS)
+        self.issue_ids = self._strings(sections, _DICTIONARY_OFFSETS)
+        self.projects = self._strings(sections, _DICTIONARY_OFFSETS)
+        self.day_deltas = self._array(next(sections), delta_typecode)
+        self.durations = self._array(next(sections), "d")
+        self.category_codes = self._array(next(sections), category_typecode)
+        self.issue_codes = self._array(next(sections), issue_typecode)
+        self.project_codes = self._array(next(sections), project_typecode)
+        self._comment_offsets = self._array(next(sections), comment_typecode)
+        # Decoding all the comments at once is faster than one by one
+        self._comments = str(next(sections), "utf-8")
+        for column in (self.day_deltas, self.durations, self.category_codes,
+                       self.issue_codes, self.project_codes):
+            if len(column) != count:
+                raise ArchiveError("Corrupt archive: {} entries expected, "
+                                   "found {}".format(count, len(column)))
+        if len(self._comment_offsets) != count + 1:
+            raise ArchiveError("Corrupt archive: comments don't match entries")
+
+    def _sections(self, buf: memoryview, offset: int) -> Iterator[memoryview]:
+        while True:
+            try:
+                (length,) = _SECTION_LENGTH.unpack_from(buf, offset)
+            except struct.error:
+                raise ArchiveError("Truncated archive")
+            offset += _SECTION_LENGTH.size
+            if offset + length > len(buf):
+                raise ArchiveError("Truncated archive")
+            section = buf[offset:offset + length]
+            self._views.append(section)
+            yield section
+            offset += length + -length % 8
+
+    def _array(self, section: memoryview, typecode: str):
+        "Return the array of C{section}, a view of it if byte orders match"
+        if sys.byteorder != "little":
+            result = array(typecode, bytes(section))
+            result.byteswap()
+            return result
+        try:
+            view = section.cast(typecode)  # type: ignore
+        except (TypeError, ValueError):
+            raise ArchiveError("Corrupt archive: bad {!r} section".format(
+                typecode))
+        self._views.append(view)
+        return view
+
+    def _strings(self, sections: Iterator[memoryview], typecode: str
+    ) -> List[str]:
+        offsets = self._array(next(sections), typecode)
+        text = str(next(sections), "utf-8")
+        ends = itertools.islice(offsets, 1, None)
+        return [text[start:end] for start, end in zip(offsets, ends)]
+
+    def days(self) -> Iterator[int]:
+        "Yield the day ordinal of each entry"
+        return itertools.accumulate(
+            itertools.chain((self.first_day,), self.day_deltas))
+
+    def comments(self) -> Iterator[str]:
+        "Yield the comment of each entry"
+        text = self._comments
+        offsets = self._comment_offsets
+        # Slicing the offsets would create a view of the buffer that outlives
+        # close()
+        ends = itertools.islice(offsets, 1, None)
+        return (text[start:end] for start, end in zip(offsets, ends))
+
+    def entries(self) -> Iterator[entries.TimeEntry]:
+        "Yield the archived entries, in the order they were written"
+        days = self.days()
+        next(days)
+        # Entries of a day share their date object, like parsed entries
+        dates: Dict[int, datetime.date] = {}
+        categories, issue_ids, projects = (
+            self.categories, self.issue_ids, self.projects)
+        trusted = entries.TimeEntry.trusted
+        for day, duration, c, i, p, comment in zip(
+                days, self.durations, self.category_codes, self.issue_codes,
+                self.project_codes, self.comments()):
+            try:
+                date = dates[day]
+            except KeyError:
+                date = dates[day] = datetime.date.fromordinal(day)
+            yield trusted(issue_ids[i], duration, categories[c], comment, date,
+                          projects[p])
+
+    def columns(self, rule_list: Sequence[rules.Rule],
+                selector: rules.Selector) -> batch.Columns:
+        """Return the L{batch.Columns} of the entries
+
+        If the rules only look at dictionary encoded fields, the rule is
+        selected once per distinct combination of codes instead of once per
+        entry."""
+        result = batch.Columns()
+        days = self.days()
+        next(days)
+        result.day.extend(days)
+        result.duration.extend(self.durations)
+        positions = {id(r): idx for idx, r in enumerate(rule_list)}
+        select = rules.bind_selector(selector, rule_list)
+        if not set(rules.rule_fields(rule_list)) <= set(_DICTIONARY_FIELDS):
+            result.rule_index.extend(positions[id(select(e))]
+                                     for e in self.entries())
+            return result
+        selected: Dict[Tuple[int, int, int], int] = {}
+        append = result.rule_index.append
+        for codes in zip(self.category_codes, self.issue_codes,
+                         self.project_codes):
+            try:
+                append(selected[codes])
+            except KeyError:
+                c, i, p = codes
+                entry = entries.TimeEntry.trusted(
+                    self.issue_ids[i], 0.0, self.categories[c], "",
+                    datetime.date.min, self.projects[p])
+                selected[codes] = positions[id(select(entry))]
+                append(selected[codes])
+        return result
+
+    def close(self) -> None:
+        "Release the views of the buffer"
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+
+
+@contextlib.contextmanager
+def open_archive(filename: str) -> Iterator[Archive]:
+    "Memory-map archive C{filename}: its columns are only valid in the block"
+    with open(filename, "rb") as fp:
+        try:
+            mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            raise ArchiveError("Not an archive: {}".format(filename))
+    with mapped:
+        result = Archive(mapped)
+        try:
+            yield result
+        finally:
+            result.close()
+
+
+def load(filename: str) -> List[entries.TimeEntry]:
+    "Return all the entries of archive C{filename}"
+    with open_archive(filename) as a:
+        return list(a.entries())
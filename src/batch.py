@@ -0,0 +1,132 @@
+"""Columnar evaluation of the satisfaction of many time entries
+
+Instead of building one L{rules.Accumulator} per L{entries.TimeEntry}, the
+entries are first reduced to three columns (day ordinal, duration and index
+of the selected rule) and the per-day sums are then computed in one pass
+over these columns, with NumPy if it is installed."""
+
+import collections
+from array import array
+from typing import Iterable, Optional, Sequence
+
+import entries
+import rules
+
+
+class Columns(object):
+    "Time entries stored column-wise, see L{from_entries}"
+    def __init__(self) -> None:
+        self.day = array("l")
+        "@ivar: proleptic Gregorian ordinal of the entry's date"
+        self.duration = array("d")
+        self.rule_index = array("l")
+        "@ivar: position in the rules sequence of the rule selected"
+
+    def __len__(self) -> int:
+        return len(self.day)
+
+    @classmethod
+    def from_entries(
+            cls,
+            rule_list: Sequence[rules.Rule],
+            time_entries: Iterable[entries.TimeEntry],
+            selector: rules.Selector,
+    ) -> "Columns":
+        result = cls()
+        # Rules need not be hashable: look their positions up by identity
+        positions = {id(r): idx for idx, r in enumerate(rule_list)}
+        append_day = result.day.append
+        append_duration = result.duration.append
+        append_rule_index = result.rule_index.append
+        select = rules.bind_selector(selector, rule_list)
+        for entry in time_entries:
+            append_day(entry.date.toordinal())
+            append_duration(entry.duration)
+            append_rule_index(positions[id(select(entry))])
+        return result
+
+    def extend(self, other: "Columns") -> None:
+        "Append the entries of C{other}, whose rules are the same"
+        self.day.extend(other.day)
+        self.duration.extend(other.duration)
+        self.rule_index.extend(other.rule_index)
+
+    def count_rules(self, rule_list: Sequence[rules.Rule],
+                    stats: rules.EvaluationStats) -> None:
+        "Add the number of entries each rule was selected for to C{stats}"
+        stats.rules = rule_list
+        counts = collections.Counter(self.rule_index)
+        stats.add_counts([counts[idx] for idx in range(len(rule_list))])
+
+
+class DailySums(object):
+    """Good and total hours for each day from C{first_day} on
+
+    C{seen[i]} is 1 if at least one entry with hours was recorded on day
+    C{first_day + i}, 0 otherwise."""
+    def __init__(self, first_day: int, good: array, total: array,
+                 seen: bytearray) -> None:
+        self.first_day = first_day
+        self.good = good
+        self.total = total
+        self.seen = seen
+
+
+def daily_sums(columns: Columns, weights: Sequence[float]) -> DailySums:
+    """Sum weighted and total durations per day
+
+    The sums are computed with C{numpy.bincount} when NumPy is installed
+    (it is optional) and in a Python loop otherwise."""
+    if len(columns) == 0:
+        return DailySums(0, array("d"), array("d"), bytearray())
+    try:
+        import numpy
+    except ImportError:
+        return _daily_sums_loop(columns, weights)
+    day = numpy.asarray(columns.day)
+    duration = numpy.asarray(columns.duration)
+    first_day = int(day.min())
+    idx = day - first_day
+    day_count = int(idx.max()) + 1
+    weighted = numpy.asarray(weights, dtype=float)[
+        numpy.asarray(columns.rule_index)] * duration
+    good = numpy.bincount(idx, weights=weighted, minlength=day_count)
+    total = numpy.bincount(idx, weights=duration, minlength=day_count)
+    # Like StampedHoursAccumulator: days with only 0 hour entries get no data
+    seen = numpy.bincount(idx[duration != 0.0], minlength=day_count) > 0
+    return DailySums(first_day,
+                     array("d", good.tobytes()),
+                     array("d", total.tobytes()),
+                     bytearray(seen.astype(numpy.uint8).tobytes()))
+
+
+def _daily_sums_loop(columns: Columns, weights: Sequence[float]
+) -> DailySums:
+    "Do the work of L{daily_sums} without NumPy"
+    first_day = min(columns.day)
+    day_count = max(columns.day) - first_day + 1
+    good = array("d", bytes(day_count * 8))
+    total = array("d", bytes(day_count * 8))
+    seen = bytearray(day_count)
+    for day, duration, rule_index in zip(
+            columns.day, columns.duration, columns.rule_index):
+        idx = day - first_day
+        if duration == 0.0:
+            # Like StampedHoursAccumulator: the day gets no data
+            continue
+        good[idx] += weights[rule_index] * duration
+        total[idx] += duration
+        seen[idx] = 1
+    return DailySums(first_day, good, total, seen)
+
+
+def evaluate(
+        rule_list: Sequence[rules.Rule],
+        time_entries: Iterable[entries.TimeEntry],
+        selector: rules.Selector,
+        stats: Optional[rules.EvaluationStats] = None,
+) -> DailySums:
+    columns = Columns.from_entries(rule_list, time_entries, selector)
+    if stats is not None:
+        columns.count_rules(rule_list, stats)
+    return daily_sums(columns, [r.weight for r in rule_list])
@@ -0,0 +1,18 @@
+"""Benchmarks, not part of the test suite
+
+Run them from the C{src} directory with only the project's dependencies:
+
+- C{python -m benchmarks [--json]}: time and peak memory of each stage of
+  the pipeline on a configurable synthetic export (see L{pipeline})
+- C{python -m benchmarks.archive_loading}: CSV parsing against loading an
+  L{archive}
+- C{python -m benchmarks.batch_engine}: L{rules.RuleEvaluator} against the
+  L{batch} engine
+- C{python -m benchmarks.memory}: bytes per entry and per accumulator
+- C{python -m benchmarks.parsing}: date conversion and C{parse_from}
+  against the former C{csv.reader} parser, on 1M rows
+- C{python -m benchmarks.startup}: C{-X importtime} of a cold start, e.g.
+  of the C{--week} path
+- C{python -m benchmarks.rule_selection}: the L{rules.Selector}s with 10,
+  100 and 1000 rules
+"""
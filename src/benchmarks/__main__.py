@@ -0,0 +1,3 @@
+from benchmarks import pipeline
+
+pipeline.run()
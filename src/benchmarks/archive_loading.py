@@ -0,0 +1,46 @@
+"Load time entries from CSV text and from an L{archive}"
+
+import argparse
+import os
+import tempfile
+import timeit
+
+import archive
+import batch
+import entries
+import rules
+from benchmarks import synthetic
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--rules", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    csv_text = synthetic.make_csv(args.rows)
+    rule_list = rules.parse_rules({"rules": synthetic.make_rules(args.rules)})
+    selector = rules.SelectRuleUsingCompiledRules()
+
+    def columns_from_archive():
+        with archive.open_archive(filename) as a:
+            return a.columns(rule_list, selector)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, "entries.rste")
+        archive.write(filename, entries.parse_from(csv_text))
+        print("CSV     {:10} bytes".format(len(csv_text.encode("utf-8"))))
+        print("archive {:10} bytes".format(os.path.getsize(filename)))
+        for name, f in (
+                ("parse_from", lambda: list(entries.parse_from(csv_text))),
+                ("archive.load", lambda: archive.load(filename)),
+                ("Columns.from_entries", lambda: batch.Columns.from_entries(
+                    rule_list, entries.parse_from(csv_text), selector)),
+                ("Archive.columns", columns_from_archive)):
+            seconds = min(timeit.repeat(f, number=1, repeat=args.repeat))
+            print("{:<22} {:8.3f}s {:12.0f} rows/s".format(
+                name, seconds, args.rows / seconds))
+
+
+if __name__ == "__main__":
+    run()
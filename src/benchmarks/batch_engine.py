@@ -0,0 +1,64 @@
+"Compare L{rules.RuleEvaluator} with the column-wise L{batch} engine"
+
+import argparse
+import time
+
+import batch
+import entries
+import main
+import rules
+from benchmarks import synthetic
+
+
+def best_of(repeat, f, *args):
+    "Return the shortest wall time of C{repeat} calls to C{f(*args)}"
+    result = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f(*args)
+        result = min(result, time.perf_counter() - start)
+    return result
+
+
+def with_rule_evaluator(rule_list, time_entries):
+    evaluator = rules.RuleEvaluator(rules.SelectRuleUsingCompiledRules(),
+                                    main.StampedHoursAccumulator)
+    return evaluator.satisfaction(rule_list, time_entries).period_data()
+
+
+def with_batch_engine(rule_list, time_entries):
+    daily_sums = batch.evaluate(rule_list, time_entries,
+                                rules.SelectRuleUsingCompiledRules())
+    return main.StampedHoursAccumulator.from_daily_sums(
+        daily_sums).period_data()
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--rules", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    rule_list = rules.parse_rules(
+        {"rules": synthetic.make_rules(args.rules)})
+    time_entries = list(entries.parse_from(synthetic.make_csv(args.rows)))
+    assert (with_rule_evaluator(rule_list, time_entries) ==
+            with_batch_engine(rule_list, time_entries))
+    for name, f in (("RuleEvaluator", with_rule_evaluator),
+                    ("batch", with_batch_engine)):
+        seconds = best_of(args.repeat, f, rule_list, time_entries)
+        print("{:<14} {:8.3f}s {:12.0f} entries/s".format(
+            name, seconds, args.rows / seconds))
+    # Only the reduction, i.e. without selecting the rules
+    columns = batch.Columns.from_entries(
+        rule_list, time_entries, rules.SelectRuleUsingCompiledRules())
+    weights = [r.weight for r in rule_list]
+    for name, f in (("daily_sums", batch.daily_sums),
+                    ("  Python loop", batch._daily_sums_loop)):
+        seconds = best_of(args.repeat, f, columns, weights)
+        print("{:<14} {:8.3f}s {:12.0f} entries/s".format(
+            name, seconds, args.rows / seconds))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,74 @@
+"Memory used by parsed time entries and by accumulators"
+
+import argparse
+import datetime
+import time
+import tracemalloc
+
+import entries
+import main
+from benchmarks import parsing, synthetic
+
+
+def measure(f, *args):
+    """Return result of C{f(*args)}, bytes allocated and still in use, seconds
+
+    The result is kept alive while measuring."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        result = f(*args)
+        seconds = time.perf_counter() - start
+        return result, tracemalloc.get_traced_memory()[0] - before, seconds
+    finally:
+        tracemalloc.stop()
+
+
+def parse(csv_text):
+    return list(entries.parse_from(csv_text))
+
+
+def parse_without_pool(csv_text):
+    "Only dates are shared, as before L{entries.ValuePool}"
+    return list(parsing.parse_with_csv_reader(csv_text))
+
+
+def make_hours_accumulators(count):
+    return [main.HoursAccumulator(1.0, 2.0) for _ in range(count)]
+
+
+def make_calendar(days):
+    acc = main.StampedHoursAccumulator.neutral()
+    start = datetime.date(2017, 1, 1)
+    for day in range(days):
+        acc.update(main.StampedHoursAccumulator(
+            start + datetime.timedelta(day), 1.0, 2.0))
+    return acc
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args(argv)
+    csv_text = synthetic.make_csv(args.rows)
+    # Parsing time is measured without tracemalloc's overhead
+    start = time.perf_counter()
+    parse(csv_text)
+    seconds = time.perf_counter() - start
+    _, size, _ = measure(parse, csv_text)
+    print("TimeEntry:             {:8.1f} bytes/entry {:10.0f} rows/s".format(
+        size / args.rows, args.rows / seconds))
+    _, size, _ = measure(parse_without_pool, csv_text)
+    print("TimeEntry (no pool):   {:8.1f} bytes/entry".format(
+        size / args.rows))
+    _, size, _ = measure(make_hours_accumulators, args.rows)
+    print("HoursAccumulator:      {:8.1f} bytes/instance".format(
+        size / args.rows))
+    days = 3650
+    _, size, _ = measure(make_calendar, days)
+    print("StampedHoursAccumulator: {:6.1f} bytes/day".format(size / days))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,67 @@
+"Micro-benchmarks of date conversion and C{entries.parse_from} throughput"
+
+import argparse
+import csv
+import datetime
+import timeit
+
+import entries
+from benchmarks import synthetic
+
+
+def strptime_date(x):
+    "The way entries used to convert dates"
+    return datetime.datetime.strptime(x, "%Y-%m-%d").date()
+
+
+def parse_with_csv_reader(s):
+    "The way entries used to parse: every column of every row, and a regex"
+    lines = csv.reader(entries._split_lines((s,), "utf-8"))
+    header = next(lin for lin in lines if lin)
+    issue_idx = header.index("Issue")
+    duration_idx = header.index("Hours")
+    category_idx = header.index("Activity")
+    comment_idx = header.index("Comment")
+    date_idx = header.index("Date")
+    project_idx = header.index("Project") if "Project" in header else None
+    dates = {}
+    for row in lines:
+        if len(row) < len(header):
+            continue
+        issue = entries._EXTRACT_ISSUE_ID.match(row[issue_idx]).group(1)
+        date_str = row[date_idx]
+        try:
+            date = dates[date_str]
+        except KeyError:
+            date = dates[date_str] = entries._convert_date(date_str)
+        yield entries.TimeEntry.trusted(
+            issue, float(row[duration_idx]), row[category_idx],
+            row[comment_idx], date,
+            "" if project_idx is None else row[project_idx])
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    number = 100000
+    for name, f in (("strptime", strptime_date),
+                    ("_parse_date", entries._parse_date)):
+        seconds = min(timeit.repeat(lambda: f("2017-07-31"),
+                                    number=number, repeat=args.repeat))
+        print("{:<12} {:8.0f} ns/date".format(name, seconds / number * 1e9))
+
+    csv_text = synthetic.make_csv(args.rows)
+    assert (list(parse_with_csv_reader(csv_text)) ==
+            list(entries.parse_from(csv_text)))
+    for name, f in (("csv.reader", parse_with_csv_reader),
+                    ("parse_from", entries.parse_from)):
+        seconds = min(timeit.repeat(lambda: list(f(csv_text)),
+                                    number=1, repeat=args.repeat))
+        print("{:<12} {:8.0f} rows/s".format(name, args.rows / seconds))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,110 @@
+"""Time and peak memory of each stage of the parse, select, accumulate and
+render pipeline on a synthetic Redmine export"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+import entries
+import main
+import rules
+import sparkline
+from benchmarks import synthetic
+
+
+def measure(repeat: int, f: Callable, *args) -> Tuple[Any, Dict[str, float]]:
+    """Call C{f(*args)} C{repeat} times and once more under tracemalloc
+
+    Return the result and a dict with the best wall time in seconds and the
+    peak memory allocated during the call in bytes."""
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f(*args)
+        seconds = min(seconds, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        result = f(*args)
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, {"seconds": seconds, "peak_bytes": peak_bytes}
+
+
+def parse(csv_text: str) -> List[entries.TimeEntry]:
+    return list(entries.parse_from(csv_text))
+
+
+def evaluate(rule_list, time_entries) -> main.StampedHoursAccumulator:
+    return rules.RuleEvaluator(
+        rules.SelectRuleUsingCompiledRules(),
+        main.StampedHoursAccumulator).satisfaction(rule_list, time_entries)
+
+
+def period_data(acc: main.StampedHoursAccumulator) -> List[float]:
+    return acc.period_data()
+
+
+def render(acc: main.StampedHoursAccumulator, data: List[float]) -> str:
+    return sparkline.format_data(
+        str(acc.period_start()), data, str(acc.period_end()))
+
+
+def make_command_line_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=365,
+                        help="date span of the export")
+    parser.add_argument("--issues", type=int, default=200,
+                        help="number of distinct issue IDs")
+    parser.add_argument("--categories", type=int, default=8,
+                        help="number of distinct activities")
+    parser.add_argument("--rules", type=int, default=100)
+    parser.add_argument("--category-share", type=float, default=0.2,
+                        help="share of rules matching a category rather "
+                        "than an issue ID")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true",
+                        help="print machine-readable results")
+    return parser
+
+
+def run_pipeline(args: argparse.Namespace) -> Dict[str, Any]:
+    csv_text = synthetic.make_csv(args.rows, args.days, args.issues,
+                                  args.categories, args.seed)
+    rule_list = rules.parse_rules({"rules": synthetic.make_rules(
+        args.rules, args.issues, args.categories, args.category_share,
+        args.seed)})
+    stages = {}
+    time_entries, stages["parse"] = measure(args.repeat, parse, csv_text)
+    acc, stages["evaluate"] = measure(
+        args.repeat, evaluate, rule_list, time_entries)
+    data, stages["period_data"] = measure(args.repeat, period_data, acc)
+    _, stages["render"] = measure(args.repeat, render, acc, data)
+    return {"parameters": vars(args),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "stages": stages}
+
+
+def run(argv=None):
+    args = make_command_line_parser().parse_args(argv)
+    result = run_pipeline(args)
+    if args.json:
+        json.dump(result, sys.stdout, indent=2, sort_keys=True)
+        print()
+    else:
+        for name, stage in result["stages"].items():
+            print("{:<12} {:10.4f}s {:12d} bytes peak{}".format(
+                name, stage["seconds"], stage["peak_bytes"],
+                "  {:10.0f} rows/s".format(args.rows / stage["seconds"])
+                if name in ("parse", "evaluate") else ""))
+
+
+if __name__ == "__main__":
+    run()
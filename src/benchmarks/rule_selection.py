@@ -0,0 +1,66 @@
+"""Compare the L{rules.Selector}s on configurations of 10, 100 and 1000 rules
+
+With C{--rich}, the index selector falls back to the rules' match methods
+for the kinds of rules it doesn't know."""
+
+import argparse
+import collections
+
+import entries
+import rules
+from benchmarks import synthetic
+from benchmarks.batch_engine import best_of
+
+SELECTORS = collections.OrderedDict([
+    ("match", rules.SelectRuleUsingTheirMatchMethod),
+    ("index", rules.SelectRuleUsingIndex),
+    ("compiled", rules.SelectRuleUsingCompiledRules),
+])
+
+
+def select_all(selector, rule_list, time_entries):
+    select = rules.bind_selector(selector, rule_list)
+    for entry in time_entries:
+        select(entry)
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--match-rows", type=int, default=20000,
+                        help="Rows for the (slow) match selector")
+    parser.add_argument("--issues", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--rich", action="store_true",
+                        help="Use all the kinds of rules, not only issue "
+                        "and category rules")
+    args = parser.parse_args(argv)
+    time_entries = list(entries.parse_from(
+        synthetic.make_csv(args.rows, issues=args.issues)))
+    print("{:>6} {:<10} {:>12} {:>14}".format(
+        "rules", "selector", "compile (s)", "entries/s"))
+    for count in (10, 100, 1000):
+        make_rules = (synthetic.make_rich_rules if args.rich
+                      else synthetic.make_rules)
+        rule_list = rules.parse_rules({"rules": make_rules(
+            count, issues=args.issues)})
+        for name, selector_class in SELECTORS.items():
+            rows = time_entries[:args.match_rows] if name == "match" \
+                else time_entries
+            compile_seconds = "-"
+            if name == "compiled":
+                # Bypass the cache of compile_rules to time the compilation
+                compile_seconds = "{:.6f}".format(best_of(
+                    args.repeat, rules._compile, rule_list))
+            seconds = best_of(args.repeat, select_all, selector_class(),
+                              rule_list, rows)
+            print("{:>6} {:<10} {:>12} {:>14.0f}".format(
+                count, name, compile_seconds, len(rows) / seconds))
+        # select_all compiled rule_list above: this is a cache hit
+        print("{:>6} {:<10} {:>12.6f} {:>14}".format(
+            count, "cache hit", best_of(args.repeat, rules.compile_rules,
+                                        rule_list), "-"))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,64 @@
+"""Cold start: time spent importing the modules of a run
+
+Each scenario runs in a new interpreter with C{-X importtime}.  The C{--week}
+path imports L{main} and, to perform its only HTTP request, C{requests}.
+Without bytecode cache (e.g. C{PYTHONDONTWRITEBYTECODE}), compiling the
+sources is part of the time."""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = (
+    ("import main", "import main"),
+    ("--week path", "import main, requests; "
+     "main.make_command_line_parser().parse_args(['--week', 'c.json', 'pw'])"),
+    ("--asyncio", "import main, aio, requests"),
+)
+
+
+def import_times(code: str) -> Tuple[float, List[Tuple[float, str]]]:
+    """Return the seconds of a run of C{code} and the imports it triggered
+
+    Imports are (cumulative seconds, module) of the top-level imports, from
+    the slowest."""
+    start = time.perf_counter()
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=SRC_DIR,
+        check=True, stderr=subprocess.PIPE, universal_newlines=True).stderr
+    seconds = time.perf_counter() - start
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented
+        if not name.startswith("  "):
+            imports.append((int(cumulative) / 1e6, name.strip()))
+    return seconds, sorted(imports, reverse=True)
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8,
+                        help="Slowest imports shown per scenario")
+    args = parser.parse_args(argv)
+    baseline, _ = min(import_times("pass") for _ in range(args.repeat))
+    print("{:<14} {:8.1f} ms".format("interpreter", baseline * 1e3))
+    for name, code in SCENARIOS:
+        seconds, imports = min(import_times(code)
+                               for _ in range(args.repeat))
+        print("{:<14} {:8.1f} ms  imports {:6.1f} ms".format(
+            name, seconds * 1e3, sum(s for s, _ in imports) * 1e3))
+        for module_seconds, module in imports[:args.top]:
+            print("    {:<28} {:6.1f} ms".format(module, module_seconds * 1e3))
+
+
+if __name__ == "__main__":
+    run()
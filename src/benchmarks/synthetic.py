@@ -0,0 +1,114 @@
+"Synthetic Redmine exports and rules for the benchmarks"
+
+import datetime
+import random
+from typing import List
+
+HEADER = "Project,User,Date,Activity,Issue,Comment,Hours"
+
+COMMENTS = ["", "daily standup", "review", "\"fix, then test\"", "meeting"]
+
+
+def category_name(idx: int) -> str:
+    return "Category{}".format(idx)
+
+
+def issue_id(idx: int) -> str:
+    return str(10000 + idx)
+
+
+def make_csv(
+        rows: int,
+        days: int = 365,
+        issues: int = 200,
+        categories: int = 8,
+        seed: int = 0,
+        start: datetime.date = datetime.date(2017, 1, 1),
+) -> str:
+    "Return a Redmine C{time_entries.csv} export with C{rows} entries"
+    rnd = random.Random(seed)
+    lines = [HEADER]
+    for _ in range(rows):
+        issue = rnd.randrange(issues)
+        lines.append("Project,User,{:%Y-%m-%d},{},"
+                     "Task #{}: Subject {},{},{:.2f}"
+                     .format(start + datetime.timedelta(rnd.randrange(days)),
+                             category_name(rnd.randrange(categories)),
+                             issue_id(issue),
+                             issue,
+                             rnd.choice(COMMENTS),
+                             rnd.randrange(1, 33) / 4.0))
+    lines.append("")
+    return "\n".join(lines)
+
+
+def make_rules(
+        count: int,
+        issues: int = 200,
+        categories: int = 8,
+        category_share: float = 0.2,
+        seed: int = 0,
+) -> List[dict]:
+    """Return the C{rules} list of a configuration with C{count} rules
+
+    About C{category_share} of them match a category, the others an issue
+    ID, and the last one is a catch-all rule."""
+    rnd = random.Random(seed)
+    result = []
+    for _ in range(count - 1):
+        weight = rnd.choice((0.0, 0.5, 1.0))
+        if rnd.random() < category_share:
+            category = category_name(rnd.randrange(categories))
+            result.append({"category": category, "weight": weight})
+        else:
+            result.append({"issue_id": issue_id(rnd.randrange(issues)),
+                           "weight": weight})
+    result.append({"weight": 0.0})
+    return result
+
+
+def make_rich_rules(
+        count: int,
+        issues: int = 200,
+        categories: int = 8,
+        seed: int = 0,
+        start: datetime.date = datetime.date(2017, 1, 1),
+        days: int = 365,
+) -> List[dict]:
+    """Like L{make_rules} with all the kinds of rules
+
+    Issue ranges and sets, projects, comment patterns and date ranges are
+    mixed with the issue and category rules."""
+    rnd = random.Random(seed)
+    result = []
+    for _ in range(count - 1):
+        weight = rnd.choice((0.0, 0.5, 1.0))
+        kind = rnd.randrange(7)
+        issue = rnd.randrange(issues)
+        if kind == 0:
+            result.append({"issue_id": issue_id(issue), "weight": weight})
+        elif kind == 1:
+            result.append({"issue_ids": [issue_id(rnd.randrange(issues))
+                                         for _ in range(5)],
+                           "weight": weight})
+        elif kind == 2:
+            result.append({"issue_range": [int(issue_id(issue)),
+                                           int(issue_id(issue)) + 10],
+                           "weight": weight})
+        elif kind == 3:
+            result.append({"category": category_name(
+                rnd.randrange(categories)), "weight": weight})
+        elif kind == 4:
+            result.append({"project": "Project{}".format(rnd.randrange(20)),
+                           "weight": weight})
+        elif kind == 5:
+            result.append({"comment": "{}{}".format(
+                rnd.choice(COMMENTS[1:]).strip('"'), rnd.randrange(1000)),
+                           "weight": weight})
+        else:
+            first = start + datetime.timedelta(rnd.randrange(days))
+            result.append({"date_range": [str(first), str(
+                first + datetime.timedelta(rnd.randrange(1, 7)))],
+                           "weight": weight})
+    result.append({"weight": 0.0})
+    return result
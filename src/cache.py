@@ -0,0 +1,127 @@
+"Local SQLite cache of L{entries.TimeEntry} keyed by host, user and date"
+
+import contextlib
+import datetime
+import sqlite3
+from typing import Iterable, Iterator, List, Set, Tuple
+
+import entries
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fetched_days (
+    host TEXT NOT NULL,
+    user TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    PRIMARY KEY (host, user, day));
+CREATE TABLE IF NOT EXISTS time_entries (
+    host TEXT NOT NULL,
+    user TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    issue_id TEXT NOT NULL,
+    duration REAL NOT NULL,
+    category TEXT NOT NULL,
+    comment TEXT NOT NULL,
+    project TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS time_entries_by_day
+    ON time_entries (host, user, day);
+"""
+"@var: days are stored as proleptic Gregorian ordinals"
+
+_SCHEMA_VERSION = 1
+"@var: caches of other versions are emptied (C{PRAGMA user_version})"
+
+
+@contextlib.contextmanager
+def open_cache(filename: str) -> Iterator[sqlite3.Connection]:
+    """Open (creating it if needed) the cache database
+
+    The changes are committed when leaving the context without error."""
+    conn = sqlite3.connect(filename)
+    try:
+        (version,) = conn.execute("PRAGMA user_version").fetchone()
+        if version != _SCHEMA_VERSION:
+            # Only a cache: start over rather than migrate
+            conn.executescript("DROP TABLE IF EXISTS fetched_days;"
+                               " DROP TABLE IF EXISTS time_entries;"
+                               " PRAGMA user_version = {};".format(
+                                   _SCHEMA_VERSION))
+        conn.executescript(_SCHEMA)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def load(
+        conn: sqlite3.Connection,
+        host: str,
+        user: str,
+        start: datetime.date,
+        end: datetime.date,
+) -> Tuple[Set[datetime.date], List[entries.TimeEntry]]:
+    """Return the days of [start, end] already fetched and their entries"""
+    bounds = (host, user, start.toordinal(), end.toordinal())
+    days = {datetime.date.fromordinal(day) for (day,) in conn.execute(
+        "SELECT day FROM fetched_days"
+        " WHERE host = ? AND user = ? AND day BETWEEN ? AND ?",
+        bounds)}
+    # These values were validated before being stored
+    result = [entries.TimeEntry.trusted(issue_id,
+                                        duration,
+                                        category,
+                                        comment,
+                                        datetime.date.fromordinal(day),
+                                        project)
+              for (issue_id, duration, category, comment, day, project)
+              in conn.execute(
+                  "SELECT issue_id, duration, category, comment, day, project"
+                  " FROM time_entries"
+                  " WHERE host = ? AND user = ? AND day BETWEEN ? AND ?"
+                  " ORDER BY rowid",
+                  bounds)]
+    return days, result
+
+
+def store(
+        conn: sqlite3.Connection,
+        host: str,
+        user: str,
+        start: datetime.date,
+        end: datetime.date,
+        new_entries: Iterable[entries.TimeEntry],
+) -> None:
+    """Replace whatever is cached for [start, end] by C{new_entries}
+
+    All days of the range are marked as fetched, even those without entry."""
+    first, last = start.toordinal(), end.toordinal()
+    conn.execute("DELETE FROM time_entries"
+                 " WHERE host = ? AND user = ? AND day BETWEEN ? AND ?",
+                 (host, user, first, last))
+    conn.executemany("INSERT INTO time_entries"
+                     " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                     ((host, user, e.date.toordinal(), e.issue_id,
+                       e.duration, e.category, e.comment, e.project)
+                      for e in new_entries))
+    conn.executemany("INSERT OR IGNORE INTO fetched_days VALUES (?, ?, ?)",
+                     ((host, user, day) for day in range(first, last + 1)))
+
+
+def ranges_to_fetch(
+        cached_days: Set[datetime.date],
+        start: datetime.date,
+        end: datetime.date,
+) -> List[Tuple[datetime.date, datetime.date]]:
+    """Group the days of [start, end] missing from C{cached_days} in ranges
+
+    Both bounds of each range are included."""
+    result: List[Tuple[datetime.date, datetime.date]] = []
+    one_day = datetime.timedelta(1)
+    day = start
+    while day <= end:
+        if day not in cached_days:
+            if result and result[-1][1] + one_day == day:
+                result[-1] = (result[-1][0], day)
+            else:
+                result.append((day, day))
+        day += one_day
+    return result
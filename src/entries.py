@@ -1,19 +1,30 @@
 "Time entries are represented by the L{TimeEntry} class"
 
+import codecs
 import csv
 import datetime
 import re
-from typing import Iterator
+import sys
+from typing import Dict, Iterable, Iterator, Optional, Union
 
 import attr
 
+def _parse_date(x: str) -> datetime.date:
+    "Parse YYYY-MM-DD, much faster than C{strptime} for this one format"
+    if (len(x) == 10 and x[4] == "-" and x[7] == "-"
+            and x[:4].isdigit() and x[5:7].isdigit() and x[8:].isdigit()):
+        return datetime.date(int(x[:4]), int(x[5:7]), int(x[8:]))
+    else:
+        # Other spellings strptime accepts, e.g. without leading zeroes
+        return datetime.datetime.strptime(x, "%Y-%m-%d").date()
+
 def _convert_date(x):
     try:
-        return datetime.datetime.strptime(x, "%Y-%m-%d").date()
+        return _parse_date(x)
     except Exception:
         return x
 
-@attr.s
+@attr.s(slots=True)
 class TimeEntry(object):
     def _validate_string_and_not_blank(self, attribute, value):
         attr.validators.instance_of(str)(self, attribute, value)
@@ -32,14 +43,134 @@ class TimeEntry(object):
     comment = attr.ib(validator=attr.validators.instance_of(str))
     date = attr.ib(convert=_convert_date,
                    validator=attr.validators.instance_of(datetime.date))
+    project = attr.ib(default="", validator=attr.validators.instance_of(str))
+
+    @classmethod
+    def trusted(cls, issue_id, duration, category, comment, date, project=""):
+        """Create a L{TimeEntry} without running the validators
+
+        Only for callers that already validated (and converted) the values:
+        no check is made at all."""
+        result = cls.__new__(cls)
+        result.issue_id = issue_id
+        result.duration = duration
+        result.category = category
+        result.comment = comment
+        result.date = date
+        result.project = project
+        return result
+
+
+def intern_str(value):
+    """C{sys.intern} strings, return other values unchanged
+
+    Used for the values taking few distinct values, in entries and rules
+    alike, so that comparing them (e.g. looking an entry's category up in a
+    dict keyed by the rules' categories) usually succeeds on identity."""
+    return sys.intern(value) if type(value) is str else value
+
+
+class ValuePool(object):
+    """Values of the fields of time entries, shared between entries
+
+    L{parse_chunks} creates one per parse unless it is given one, e.g. to
+    share values between the exports of several windows.  Issue IDs,
+    categories and projects are interned with L{intern_str}.  Comments are
+    free text but often repeat (e.g. C{daily standup}): up to
+    C{max_comments} distinct comments are shared.
+
+    @ivar dates: date of each C{Date} cell
+    @ivar issues: issue ID of each C{Issue} cell
+    @ivar names: interned value of each C{Activity} or C{Project} cell
+    @ivar comments: the shared comments"""
+    def __init__(self, max_comments: int = 1 << 16) -> None:
+        self.max_comments = max_comments
+        self.dates: Dict[str, datetime.date] = {}
+        self.issues: Dict[str, str] = {}
+        self.names: Dict[str, str] = {}
+        self.comments: Dict[str, str] = {}
 
 
 _EXTRACT_ISSUE_ID = re.compile("[^#]* #([0-9]+): .*")
 "@var: Extract issue number from Redmine `issue' column"
 
-def parse_from(s: str) -> Iterator[TimeEntry]:
-    lines = csv.reader(x for x in s.split("\n"))
-    header = next(lin for lin in lines if lin)  # skip leading empty lines
+def _split_lines(chunks: Iterable[Union[str, bytes]],
+                 encoding: str) -> Iterator[str]:
+    """Re-assemble C{chunks} of text into lines (without their separator)
+
+    Chunks may be C{str} or C{bytes}: the latter are decoded incrementally so
+    that a multi-byte character split between two chunks is handled
+    correctly.  Only the current (incomplete) line is ever kept in memory."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ""
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        if "\n" not in chunk:
+            pending += chunk
+            continue
+        lines = (pending + chunk).split("\n")
+        pending = lines.pop()
+        yield from lines
+    pending += decoder.decode(b"", final=True)
+    yield pending
+
+
+def _extract_issue_id(cell: str) -> str:
+    """Return the issue number of an C{Issue} cell, e.g. C{Task #12: Title}
+
+    Same result as L{_EXTRACT_ISSUE_ID} with a scan for the first C{#}
+    instead of a backtracking regex: the regex is only used (to fail the
+    same way) when the cell doesn't have the expected form."""
+    hash_idx = cell.find("#")
+    if hash_idx > 0 and cell[hash_idx - 1] == " ":
+        rest = cell[hash_idx + 1:]
+        digit_count = len(rest) - len(rest.lstrip("0123456789"))
+        if digit_count and rest.startswith(": ", digit_count):
+            return rest[:digit_count]
+    return _EXTRACT_ISSUE_ID.match(cell).group(1)
+
+
+class _PushbackLines(object):
+    """Iterator over C{lines} giving L{pending} first, if set
+
+    The C{csv.reader} of L{parse_chunks} reads the quoted rows from it: the
+    row's first line is pushed back and the reader pulls the following lines
+    itself if a quoted field spans several lines."""
+    def __init__(self, lines: Iterator[str]) -> None:
+        self.lines = lines
+        self.pending: Optional[str] = None
+
+    def __iter__(self) -> "_PushbackLines":
+        return self
+
+    def __next__(self) -> str:
+        line = self.pending
+        if line is None:
+            return next(self.lines)
+        self.pending = None
+        return line
+
+
+def parse_chunks(chunks: Union[str, bytes, Iterable[Union[str, bytes]]],
+                 encoding: str = "utf-8",
+                 pool: Optional[ValuePool] = None) -> Iterator[TimeEntry]:
+    """Parse Redmine CSV export arriving in C{chunks} of text or bytes
+
+    This is a generator: entries are yielded as soon as their row is complete,
+    e.g. while iterating over a streamed HTTP response body.  A single C{str}
+    or C{bytes} object is accepted as well and treated as one chunk.
+
+    Rows without quotes nor carriage returns, most of an export, are split
+    with C{str.split} and only up to the last column used; the others are
+    left to C{csv.reader}, as their fields may hold commas or span several
+    lines.  Both give the same fields.  Equal values are shared between the
+    entries, see L{ValuePool}."""
+    if isinstance(chunks, (str, bytes)):
+        chunks = (chunks,)
+    lines = _split_lines(chunks, encoding)
+    # skip leading empty lines
+    header = next(lin for lin in csv.reader(lines) if lin)
     # Looking for the column indexes with header.index will raise ValueError
     # if the column isn't found
     issue_idx = header.index("Issue")
@@ -47,13 +178,79 @@ def parse_from(s: str) -> Iterator[TimeEntry]:
     category_idx = header.index("Activity")
     comment_idx = header.index("Comment")
     date_idx = header.index("Date")
-    for row in lines:
-        if len(row) < len(header):
-            continue  # ignore incomplete lines
-        issue = _EXTRACT_ISSUE_ID.match(row[issue_idx]).group(1)
-        yield TimeEntry(issue,
-                        float(row[duration_idx]),
-                        row[category_idx],
-                        row[comment_idx],
-                        row[date_idx],
-        )
+    # Optional: exports configured without this column still parse
+    project_idx = header.index("Project") if "Project" in header else None
+    column_count = len(header)
+    commas = column_count - 1
+    last_idx = max(issue_idx, duration_idx, category_idx, comment_idx,
+                   date_idx, -1 if project_idx is None else project_idx)
+    # Columns after the last one used are left unsplit
+    maxsplit = last_idx + 1 if last_idx + 1 < commas else -1
+    quoted_lines = _PushbackLines(lines)
+    quoted_rows = csv.reader(quoted_lines)
+    if pool is None:
+        pool = ValuePool()
+    dates = pool.dates
+    issues = pool.issues
+    names = pool.names
+    comments = pool.comments
+    max_comments = pool.max_comments
+    for line in lines:
+        if '"' in line or "\r" in line:
+            quoted_lines.pending = line
+            row = next(quoted_rows)
+            if len(row) < column_count:
+                continue  # ignore incomplete lines
+        elif maxsplit < 0:
+            row = line.split(",")
+            if len(row) < column_count:
+                continue
+        elif line.count(",") >= commas:
+            row = line.split(",", maxsplit)
+        else:
+            continue
+        issue_cell = row[issue_idx]
+        try:
+            issue = issues[issue_cell]
+        except KeyError:
+            issue = issues[issue_cell] = sys.intern(
+                _extract_issue_id(issue_cell))
+        duration = float(row[duration_idx])
+        category = row[category_idx]
+        try:
+            category = names[category]
+        except KeyError:
+            category = names[category] = sys.intern(category)
+        if project_idx is None:
+            project = ""
+        else:
+            project = row[project_idx]
+            try:
+                project = names[project]
+            except KeyError:
+                project = names[project] = sys.intern(project)
+        comment = row[comment_idx]
+        try:
+            comment = comments[comment]
+        except KeyError:
+            if len(comments) < max_comments:
+                comments[comment] = comment
+        date_str = row[date_idx]
+        try:
+            date = dates[date_str]
+        except KeyError:
+            date = dates[date_str] = _convert_date(date_str)
+        # The regex guarantees a valid issue and csv only returns str:
+        # checking the rest here is cheaper than running the validators.
+        if (duration >= 0
+                and category.strip()
+                and isinstance(date, datetime.date)):
+            yield TimeEntry.trusted(
+                issue, duration, category, comment, date, project)
+        else:
+            # Let the validators raise the appropriate exception
+            yield TimeEntry(issue, duration, category, comment, date, project)
+
+
+def parse_from(s: str) -> Iterator[TimeEntry]:
+    return parse_chunks((s,))
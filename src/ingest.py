@@ -0,0 +1,121 @@
+"""Time entries read from local files instead of Redmine
+
+Each file is either a CSV export of Redmine, plain or compressed with gzip,
+or an L{archive}: the format is recognized by the first bytes of the file.
+Large exports are memory-mapped and gzip files decompressed as they are
+parsed, so that only the entries are kept in memory.  Several files are
+read in parallel by worker processes, see L{read_files}.  For the
+L{batch} engine, archives are read straight into columns, see
+L{read_file_columns}."""
+
+import concurrent.futures
+import functools
+import gzip
+import mmap
+import os
+from typing import Callable, Iterator, List, Sequence, TypeVar
+
+import archive
+import batch
+import entries
+import rules
+
+CHUNK_SIZE = 1 << 20
+"@var: bytes parsed at a time from a memory map or a gzip stream"
+MMAP_THRESHOLD = 1 << 24
+"@var: smaller exports are read at once instead of being memory-mapped"
+SUFFIXES = (".csv", ".csv.gz", ".rste")
+"@var: files read from the directories given to L{expand_paths}"
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+def expand_paths(paths: Sequence[str]) -> List[str]:
+    """Replace the directories of C{paths} by their files with L{SUFFIXES}
+
+    Files of a directory are sorted by name, other paths are kept as is."""
+    result = []
+    for path in paths:
+        if os.path.isdir(path):
+            result.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.endswith(SUFFIXES)
+                and os.path.isfile(os.path.join(path, name))))
+        else:
+            result.append(path)
+    return result
+
+
+def _mapped_chunks(mapped: mmap.mmap) -> Iterator[bytes]:
+    for start in range(0, len(mapped), CHUNK_SIZE):
+        yield mapped[start:start + CHUNK_SIZE]
+
+
+def read_file(filename: str) -> List[entries.TimeEntry]:
+    "Return the entries of export or archive C{filename}"
+    with open(filename, "rb") as fp:
+        magic = fp.read(len(archive.MAGIC))
+        if magic == archive.MAGIC:
+            return archive.load(filename)
+        if magic.startswith(_GZIP_MAGIC):
+            fp.seek(0)
+            with gzip.GzipFile(fileobj=fp) as gz:
+                return list(entries.parse_chunks(
+                    iter(lambda: gz.read(CHUNK_SIZE), b"")))
+        size = os.fstat(fp.fileno()).st_size
+        if size == 0:
+            return []
+        if size < MMAP_THRESHOLD:
+            fp.seek(0)
+            return list(entries.parse_chunks(fp.read()))
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return list(entries.parse_chunks(_mapped_chunks(mapped)))
+
+
+def read_file_columns(filename: str, rule_list: Sequence[rules.Rule]
+) -> batch.Columns:
+    """Return the L{batch.Columns} of the entries of C{filename}
+
+    Archives are read without creating their entries, see
+    L{archive.Archive.columns}; exports are parsed by L{read_file}."""
+    selector = rules.SelectRuleUsingCompiledRules()
+    with open(filename, "rb") as fp:
+        is_archive = fp.read(len(archive.MAGIC)) == archive.MAGIC
+    if is_archive:
+        with archive.open_archive(filename) as a:
+            return a.columns(rule_list, selector)
+    return batch.Columns.from_entries(rule_list, read_file(filename), selector)
+
+
+_T = TypeVar("_T")
+
+
+def _map_files(read: Callable[[str], _T], filenames: Sequence[str],
+               max_workers: int) -> List[_T]:
+    if max_workers < 1:
+        raise ValueError("'max_workers' must be >= 1 and {!r} isn't".format(
+            max_workers))
+    if max_workers == 1 or len(filenames) < 2:
+        return [read(f) for f in filenames]
+    with concurrent.futures.ProcessPoolExecutor(
+            min(max_workers, len(filenames))) as executor:
+        return list(executor.map(read, filenames))
+
+
+def read_files(filenames: Sequence[str], max_workers: int = 1
+) -> List[List[entries.TimeEntry]]:
+    """Return the entries of each of C{filenames}, in order
+
+    With C{max_workers} > 1, files are read by as many processes."""
+    return _map_files(read_file, filenames, max_workers)
+
+
+def read_files_columns(
+        filenames: Sequence[str],
+        rule_list: Sequence[rules.Rule],
+        max_workers: int = 1,
+) -> List[batch.Columns]:
+    "Like L{read_files}, returning the L{read_file_columns} of each file"
+    return _map_files(
+        functools.partial(read_file_columns, rule_list=rule_list),
+        filenames, max_workers)
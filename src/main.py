@@ -1,18 +1,31 @@
 import argparse
 import datetime
 import hashlib
-from typing import Any, Dict, List, Optional, Sequence
+import itertools
+import sys
+from typing import (
+    TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Sequence,
+    Tuple)
 
-from effect import sync_perform
+from effect import parallel, sync_perform
 from effect.do import do
 
 import actions
 import entries
+import profiling
+import rollups
 import rules
 import sparkline
 
+# Only needed by some options: imported by the functions using them to keep
+# the startup short, see benchmarks.startup
+if TYPE_CHECKING:
+    import batch
+
 
 class HoursAccumulator(rules.Accumulator):
+    __slots__ = ("good", "total")
+
     def __init__(self, good: float, total: float) -> None:
         self.good = good
         self.total = total
@@ -29,16 +42,79 @@ class HoursAccumulator(rules.Accumulator):
     def from_rule_and_entry(cls, rule, entry):
         return cls(rule.weight * entry.duration, entry.duration)
 
+    def add_entry(self, rule, entry):
+        duration = entry.duration
+        self.good += rule.weight * duration
+        self.total += duration
+
+    def negated(self) -> "HoursAccumulator":
+        "Return the inverse element: C{x.update(x.negated())} is neutral"
+        return HoursAccumulator(-self.good, -self.total)
+
     def satisfaction(self) -> float:
         return self.good / self.total
     
 
 class StampedHoursAccumulator(rules.Accumulator):
+    """Good and total hours of each day
+
+    The hours are stored in two lists indexed by the day ordinal minus
+    C{base}, so that merging, the bounds of the period and L{period_data} do
+    not need hashing nor sorting dates.  C{seen} flags the days with data
+    and C{lo} and C{hi} are the ordinals of the first and last of them (None
+    if there is no data).  C{index} caches the position of the dates seen by
+    L{add_entry}."""
+    __slots__ = ("base", "good", "total", "seen", "lo", "hi", "index")
+
     def __init__(self, when: datetime.date, good: float, total: float) -> None:
-        if good == 0.0 and total == 0.0:
-            self.cal : Dict[datetime.date, HoursAccumulator] = dict()
-        else:
-            self.cal = {when: HoursAccumulator(good, total)}
+        self.base = when.toordinal()
+        # Lists rather than array("d"): reading an array item allocates
+        self.good: List[float] = []
+        self.total: List[float] = []
+        self.seen = bytearray()
+        self.lo: Optional[int] = None
+        self.hi: Optional[int] = None
+        self.index: Dict[datetime.date, int] = {}
+        if not (good == 0.0 and total == 0.0):
+            self._reserve(self.base, self.base)
+            self.good[0] = good
+            self.total[0] = total
+            self._mark(self.base)
+
+    def _reserve(self, lo: int, hi: int) -> None:
+        "Make room for the days of ordinals C{lo} to C{hi} (included)"
+        size = len(self.seen)
+        if size == 0:
+            self.base = lo
+            size = hi - lo + 1
+            self.good = [0.0] * size
+            self.total = [0.0] * size
+            self.seen = bytearray(size)
+            return
+        if lo < self.base:
+            # Grow by at least the current size to amortize the copies
+            extra = max(self.base - lo, size)
+            self.good[:0] = [0.0] * extra
+            self.total[:0] = [0.0] * extra
+            self.seen[:0] = bytes(extra)
+            self.base -= extra
+            self.index.clear()
+            size += extra
+        if hi >= self.base + size:
+            extra = max(hi - self.base - size + 1, size)
+            self.good.extend([0.0] * extra)
+            self.total.extend([0.0] * extra)
+            self.seen.extend(bytes(extra))
+
+    def _mark(self, day: int) -> None:
+        "Flag day ordinal C{day} as having data"
+        self.seen[day - self.base] = 1
+        if self.lo is None or self.hi is None:
+            self.lo = self.hi = day
+        elif day < self.lo:
+            self.lo = day
+        elif day > self.hi:
+            self.hi = day
 
     @classmethod
     def neutral(cls):
@@ -46,59 +122,143 @@ class StampedHoursAccumulator(rules.Accumulator):
         return cls(datetime.date(2017, 1, 1), 0, 0)
 
     def update(self, other: "StampedHoursAccumulator") -> None:
-        for when, hours_acc in other.cal.items():
-            # This creates potentially unused HoursAccumulator instances that
-            # will be garbage collected but this is a script to work on small
-            # data sets, so I don't care.
-            self.cal.setdefault(when, HoursAccumulator.neutral()).update(
-                hours_acc)
+        if other.lo is None or other.hi is None:
+            return
+        self._reserve(other.lo, other.hi)
+        offset = other.base - self.base
+        good, total, seen = self.good, self.total, self.seen
+        for idx in range(other.lo - other.base, other.hi - other.base + 1):
+            if other.seen[idx]:
+                good[idx + offset] += other.good[idx]
+                total[idx + offset] += other.total[idx]
+                seen[idx + offset] = 1
+        self.lo = other.lo if self.lo is None else min(self.lo, other.lo)
+        self.hi = other.hi if self.hi is None else max(self.hi, other.hi)
 
     @classmethod
     def from_rule_and_entry(cls, rule, entry):
         return cls(entry.date, rule.weight * entry.duration, entry.duration)
 
+    def add_entry(self, rule, entry):
+        duration = entry.duration
+        if duration == 0.0:
+            # Like from_rule_and_entry: the day gets no data
+            return
+        # The entries of a day share their date object, whose hash is cached
+        when = entry.date
+        try:
+            idx = self.index[when]
+        except KeyError:
+            day = when.toordinal()
+            if not 0 <= day - self.base < len(self.seen):
+                self._reserve(day, day)
+            self._mark(day)
+            idx = self.index[when] = day - self.base
+        self.good[idx] += rule.weight * duration
+        self.total[idx] += duration
+
+    @classmethod
+    def from_daily_sums(
+            cls, sums: "batch.DailySums") -> "StampedHoursAccumulator":
+        result = cls.neutral()
+        result.base = sums.first_day
+        result.good = sums.good.tolist()
+        result.total = sums.total.tolist()
+        result.seen = bytearray(sums.seen)
+        result._find_bounds()
+        return result
+
+    def _find_bounds(self) -> None:
+        first = self.seen.find(1)
+        if first < 0:
+            self.lo = self.hi = None
+        else:
+            self.lo = self.base + first
+            self.hi = self.base + self.seen.rfind(1)
+
+    def days(self) -> Iterator[Tuple[datetime.date, HoursAccumulator]]:
+        "Iterate over the days with data, in order, and their hours"
+        if self.lo is None or self.hi is None:
+            return
+        for day in range(self.lo, self.hi + 1):
+            idx = day - self.base
+            if self.seen[idx]:
+                yield (datetime.date.fromordinal(day),
+                       HoursAccumulator(self.good[idx], self.total[idx]))
+
+    def negated(self) -> "StampedHoursAccumulator":
+        "Return the inverse element: C{x.update(x.negated())} is neutral"
+        result = self.neutral()
+        result.base = self.base
+        result.good = [-x for x in self.good]
+        result.total = [-x for x in self.total]
+        result.seen = bytearray(self.seen)
+        result.lo = self.lo
+        result.hi = self.hi
+        return result
+
+    def forget(self, when: datetime.date) -> None:
+        "Drop all data of day C{when}"
+        idx = when.toordinal() - self.base
+        if 0 <= idx < len(self.seen) and self.seen[idx]:
+            self.good[idx] = 0.0
+            self.total[idx] = 0.0
+            self.seen[idx] = 0
+            self.index.pop(when, None)
+            self._find_bounds()
+
+    def to_json(self) -> Dict[str, List[float]]:
+        return {str(when): [hours_acc.good, hours_acc.total]
+                for when, hours_acc in self.days()}
+
+    @classmethod
+    def from_json(cls, d: Dict[str, List[float]]) -> "StampedHoursAccumulator":
+        result = cls.neutral()
+        for when, (good, total) in d.items():
+            day = datetime.datetime.strptime(when, "%Y-%m-%d").date()
+            result.update(cls(day, good, total))
+        return result
+
     def period_start(self) -> Optional[datetime.date]:
-        first = None
-        for x in self.cal:
-            if first is None or x < first:
-                first = x
-        return first
+        return None if self.lo is None else datetime.date.fromordinal(self.lo)
 
     def period_end(self) -> Optional[datetime.date]:
-        last = None
-        for x in self.cal:
-            if last is None or x > last:
-                last = x
-        return last
+        return None if self.hi is None else datetime.date.fromordinal(self.hi)
 
     def period_hours_accumulator(self) -> HoursAccumulator:
-        result = HoursAccumulator.neutral()
-        for val in self.cal.values():
-            result.update(val)
-        return result
+        if self.lo is None or self.hi is None:
+            return HoursAccumulator.neutral()
+        # Days without data hold zeros
+        first, last = self.lo - self.base, self.hi - self.base + 1
+        return HoursAccumulator(sum(self.good[first:last]),
+                                sum(self.total[first:last]))
+
+    def period_data(
+            self,
+            start: Optional[datetime.date] = None,
+            stop: Optional[datetime.date] = None,
+    ) -> List[float]:
+        """Return the satisfaction of each day from C{start} to C{stop}
 
-    def period_data(self) -> List[float]:
-        t = self.period_start()
-        stop = self.period_end()
-        if t is None or stop is None:
+        Both bounds default to the first and last day with data (e.g. pass
+        those of another accumulator to align graphs).  Days without data
+        get an invalid satisfaction, see L{sparkline.format_data}."""
+        first = self.lo if start is None else start.toordinal()
+        last = self.hi if stop is None else stop.toordinal()
+        if first is None or last is None or first > last:
             return []
-        else:
-            result = []
-            NO_DATA = -1.0  # will be interpreted as missing data
-            one_day = datetime.timedelta(1)  # step for iterator
-            while t <= stop:
-                try:
-                    acc = self.cal[t]
-                except KeyError:
-                    val = NO_DATA
-                else:
-                    try:
-                        val = acc.satisfaction()
-                    except ZeroDivisionError:
-                        val = NO_DATA
-                result.append(val)
-                t = one_day + t
-            return result
+        NO_DATA = -1.0  # will be interpreted as missing data
+        result = [NO_DATA] * (last - first + 1)
+        # Days both requested and stored
+        lo = max(first, self.base)
+        hi = min(last, self.base + len(self.seen) - 1)
+        if lo <= hi:
+            a, b = lo - self.base, hi - self.base + 1
+            result[lo - first:hi - first + 1] = [
+                good / total if seen and total else NO_DATA
+                for good, total, seen in zip(
+                    self.good[a:b], self.total[a:b], self.seen[a:b])]
+        return result
 
 
 class RuntimeInfo(object):
@@ -119,6 +279,13 @@ class RuntimeInfo(object):
         self.base_url = base_url
 
 
+def rollup_spec(spec: str) -> rollups.Rollup:
+    "Type of the C{--rollup} option"
+    try:
+        return rollups.Rollup.parse(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
 def make_command_line_parser():
     parser = argparse.ArgumentParser(
         description="Query Redmine for time entries and report satisfaction")
@@ -127,6 +294,93 @@ def make_command_line_parser():
                         const=True,
                         default=False,
                         help="Use last week's instead of last month's data")
+    parser.add_argument("--window-days",
+                        type=int,
+                        default=None,
+                        metavar="N",
+                        help="Fetch the time entries with one request per N "
+                        "days, several requests running in parallel")
+    parser.add_argument("--input",
+                        action="append",
+                        default=[],
+                        metavar="PATH",
+                        help="Read the time entries from CSV exports (plain "
+                        "or gzip) or archives instead of querying Redmine.  "
+                        "PATH is a file or a directory of such files, all "
+                        "their entries are evaluated.  May be repeated")
+    parser.add_argument("--cache",
+                        default=None,
+                        metavar="FILE",
+                        help="SQLite file caching the time entries: only "
+                        "days missing from it or still open are fetched")
+    parser.add_argument("--cache-open-days",
+                        type=int,
+                        default=7,
+                        metavar="N",
+                        help="Always fetch the last N days again because "
+                        "they may still be edited (default: %(default)s)")
+    parser.add_argument("--snapshot",
+                        default=None,
+                        metavar="FILE",
+                        help="JSON file keeping the satisfaction computed by "
+                        "the previous run: only recent days are fetched and "
+                        "only the entries that changed are evaluated")
+    parser.add_argument("--snapshot-refresh-days",
+                        type=int,
+                        default=7,
+                        metavar="N",
+                        help="Fetch at least the last N days again when "
+                        "refreshing the snapshot because they may still be "
+                        "edited, like --cache-open-days (default: "
+                        "%(default)s)")
+    parser.add_argument("--save-archive",
+                        default=None,
+                        metavar="FILE",
+                        help="Also save the fetched time entries in binary "
+                        "archive FILE, which loads without parsing")
+    parser.add_argument("--engine",
+                        choices=("entries", "columns"),
+                        default="entries",
+                        help="Accumulate hours entry by entry or read the "
+                        "--input files straight into columns and sum their "
+                        "hours per day, which spares creating the entries of "
+                        "archives (default: %(default)s)")
+    parser.add_argument("-j", "--jobs",
+                        type=int,
+                        default=1,
+                        metavar="N",
+                        help="Evaluate the time entries in N processes "
+                        "(only with --engine entries) and read the --input "
+                        "files with N processes (default: %(default)s)")
+    parser.add_argument("--rollup",
+                        type=rollup_spec,
+                        action="append",
+                        default=[],
+                        metavar="RESOLUTION[:KEY]",
+                        help="Also print the satisfaction per RESOLUTION "
+                        "({}), broken down by KEY ({}) if given.  May be "
+                        "repeated: all rollups are computed in the same "
+                        "pass".format(", ".join(rollups.RESOLUTIONS),
+                                      ", ".join(rollups.KEYS)))
+    parser.add_argument("--profile",
+                        choices=("table", "json"),
+                        default=None,
+                        help="Print timings and counters of the run on "
+                        "stderr")
+    parser.add_argument("--cprofile",
+                        default=None,
+                        metavar="FILE",
+                        help="Save cProfile statistics of the run in FILE")
+    parser.add_argument("--team",
+                        action="store_true",
+                        default=False,
+                        help="Report on each user listed in the \"team\" "
+                        "key of config_json and on the whole team")
+    parser.add_argument("--asyncio",
+                        action="store_true",
+                        default=False,
+                        help="Perform the effects with asyncio so that "
+                        "parallel fetches overlap in an event loop")
     parser.add_argument("config_json",
                         help="JSON config file (api_key, host, rules list)")
     parser.add_argument("api_key_xor",
@@ -151,10 +405,254 @@ def get_runtime_info(
                        d["host"] + "/time_entries.csv",
     )
 
+def _cache_user_key(run_info: RuntimeInfo, user: str) -> str:
+    if user == "me":
+        # The API key identifies the user but shouldn't be stored as is
+        digest = hashlib.sha256(run_info.api_key.encode("ascii"))
+        return digest.hexdigest()[:16]
+    else:
+        return user
+
 @do
-def do_main(args_list: Sequence[str]) -> Any:
-    args = make_command_line_parser().parse_args(args_list)
+def fetch_entries_with_cache(
+        cache_file: str,
+        open_days: int,
+        run_info: RuntimeInfo,
+        user: str = "me",
+) -> Any:
+    """Fetch only days missing from C{cache_file} or younger than open_days
+
+    The result is an iterable of all time entries between run_info.start and
+    run_info.end."""
+    import cache
+    user_key = _cache_user_key(run_info, user)
+    one_day = datetime.timedelta(1)
+    refresh_from = max(run_info.start,
+                       run_info.end - (open_days - 1) * one_day)
+    cached_days, cached_entries = yield actions.read_cache(
+        cache_file, run_info.base_url, user_key, run_info.start,
+        refresh_from - one_day)
+    result = [cached_entries]
+    for start, end in cache.ranges_to_fetch(
+            cached_days, run_info.start, run_info.end):
+        redmine_info = yield actions.get_redmine_info(
+            run_info.base_url, user, start, end, run_info.api_key)
+        # Only keep entries of the days the cache will mark as fetched
+        fetched = [e for e in entries.parse_chunks(redmine_info)
+                   if start <= e.date <= end]
+        yield actions.write_cache(
+            cache_file, run_info.base_url, user_key, start, end, fetched)
+        result.append(fetched)
+    return itertools.chain.from_iterable(result)
+
+@do
+def fetch_entries(
+        args: argparse.Namespace,
+        run_info: RuntimeInfo,
+        user: str = "me", # actually the API key identifies User
+        stream: bool = True,
+) -> Any:
+    "Fetch the time entries of C{user} the way the command line asks"
+    redmine_entries: Iterable[entries.TimeEntry]
+    if args.input:
+        files_entries = yield actions.read_entry_files(args.input, args.jobs)
+        redmine_entries = itertools.chain.from_iterable(files_entries)
+    elif args.cache is not None:
+        redmine_entries = yield fetch_entries_with_cache(
+            args.cache, args.cache_open_days, run_info, user)
+    elif args.window_days is None:
+        redmine_info = yield actions.get_redmine_info(
+            run_info.base_url,
+            user,
+            run_info.start,
+            run_info.end,
+            run_info.api_key,
+            stream=stream)
+        # Keep this a generator: entries are consumed while the response
+        # streams
+        redmine_entries = entries.parse_chunks(redmine_info)
+    else:
+        redmine_infos = yield actions.get_redmine_info_by_windows(
+            run_info.base_url,
+            user,
+            run_info.start,
+            run_info.end,
+            run_info.api_key,
+            args.window_days)
+        # Windows share their values, e.g. the dates at their boundaries
+        pool = entries.ValuePool()
+        redmine_entries = itertools.chain.from_iterable(
+            entries.parse_chunks(x, pool=pool) for x in redmine_infos)
+    return redmine_entries
+
+def evaluate(
+        args: argparse.Namespace,
+        rule_list: List[rules.Rule],
+        redmine_entries: Iterable[entries.TimeEntry],
+        profile: profiling.NullProfile,
+        accumulator: Any = StampedHoursAccumulator,
+) -> Any:
+    "Evaluate the entries in C{args.jobs} processes"
+    redmine_entries = profile.count_rows(redmine_entries)
+    with profile.timed("evaluate (including parse)"):
+        evaluator: rules.RuleEvaluator
+        if args.jobs > 1:
+            evaluator = rules.ParallelRuleEvaluator(
+                rules.SelectRuleUsingCompiledRules(),
+                accumulator,
+                max_workers=args.jobs,
+                stats=profile.stats)
+        else:
+            evaluator = rules.RuleEvaluator(
+                rules.SelectRuleUsingCompiledRules(),
+                accumulator,
+                profile.stats)
+        return evaluator.satisfaction(rule_list, redmine_entries)
+
+@do
+def evaluate_input_columns(
+        args: argparse.Namespace,
+        rule_list: List[rules.Rule],
+        profile: profiling.NullProfile,
+) -> Any:
+    """Evaluate the C{--input} files with C{--engine columns}
+
+    The files are read straight into columns, which spares creating the
+    entries of archives, see L{ingest.read_file_columns}."""
+    import batch
+    files_columns = yield actions.read_entry_columns(
+        args.input, rule_list, args.jobs)
+    with profile.timed("evaluate"):
+        columns = batch.Columns()
+        for file_columns in files_columns:
+            columns.extend(file_columns)
+        if profile.stats is not None:
+            columns.count_rules(rule_list, profile.stats)
+        return StampedHoursAccumulator.from_daily_sums(
+            batch.daily_sums(columns, [r.weight for r in rule_list]))
+
+@do
+def refresh_snapshot(
+        args: argparse.Namespace,
+        run_info: RuntimeInfo,
+        profile: profiling.NullProfile,
+) -> Any:
+    """Update the snapshot saved in C{args.snapshot} and return its hours
+
+    Days before the period are dropped and the days since the last refresh
+    (at least the last C{args.snapshot_refresh_days}) are fetched again."""
+    import snapshot
+    saved = yield actions.read_snapshot(args.snapshot)
+    if saved is None:
+        snap = snapshot.Snapshot(StampedHoursAccumulator, run_info.rules)
+    else:
+        snap = snapshot.Snapshot.from_json(
+            saved, StampedHoursAccumulator, run_info.rules)
+    snap.drop_before(run_info.start)
+    start = snap.refresh_start(
+        run_info.start, run_info.end, args.snapshot_refresh_days)
+    recent_info = RuntimeInfo(run_info.api_key, run_info.rules, start,
+                              run_info.end, run_info.base_url)
+    recent_entries = yield fetch_entries(args, recent_info)
+    with profile.timed("evaluate (including parse)"):
+        snap.refresh(run_info.rules,
+                     rules.SelectRuleUsingCompiledRules(),
+                     start,
+                     run_info.end,
+                     profile.count_rows(recent_entries))
+    yield actions.write_snapshot(args.snapshot, snap.to_json())
+    return snap.acc
+
+def get_team(d: dict) -> List[str]:
+    "Return the user IDs listed in the C{team} key of the configuration"
+    # Numbers are parsed as float, see actions.perform_read_json
+    return ["{:.0f}".format(x) if isinstance(x, float) else x
+            for x in d["team"]]
+
+def format_satisfaction(acc: StampedHoursAccumulator) -> str:
+    try:
+        return "{:.1f}%".format(
+            acc.period_hours_accumulator().satisfaction() * 100.0)
+    except ZeroDivisionError:
+        return "no data"
+
+@do
+def do_team(
+        args: argparse.Namespace,
+        config_dict: dict,
+        run_info: RuntimeInfo,
+        profile: profiling.NullProfile,
+) -> Any:
+    """Print one graph per user of the team and one for the whole team
+
+    The users' time entries are fetched in parallel."""
+    users = get_team(config_dict)
+    users_entries = yield parallel([
+        fetch_entries(args, run_info, user, stream=False) for user in users])
+    team = StampedHoursAccumulator.neutral()
+    accumulators = []
+    for user_entries in users_entries:
+        acc = evaluate(args, run_info.rules, user_entries, profile)
+        team.update(acc)
+        accumulators.append(acc)
+    start = team.period_start()
+    stop = team.period_end()
+    width = max(len(x) for x in users + ["Team"])
+    with profile.timed("render"):
+        lines = ["{:<{}} {} {}".format(
+            label, width,
+            sparkline.format_data(
+                str(start), acc.period_data(start, stop), str(stop)),
+            format_satisfaction(acc))
+                 for label, acc in zip(users + ["Team"],
+                                       accumulators + [team])]
+    for line in lines:
+        yield actions.do_print("{}", line)
+
+@do
+def do_main(
+        args_list: Sequence[str],
+        profile: profiling.NullProfile = profiling.NullProfile(),
+) -> Any:
+    parser = make_command_line_parser()
+    args = parser.parse_args(args_list)
+    if args.team and args.window_days is not None:
+        # Windows are fetched in parallel too and the thread pool is shared
+        parser.error("--team and --window-days can't be combined")
+    if args.team and args.snapshot is not None:
+        parser.error("--team and --snapshot can't be combined")
+    if args.rollup and (args.team or args.snapshot is not None
+                        or args.engine != "entries"):
+        parser.error("--rollup needs --engine entries and can't be combined "
+                     "with --team or --snapshot")
+    if args.input and (args.team or args.snapshot is not None
+                       or args.cache is not None
+                       or args.window_days is not None):
+        parser.error("--input can't be combined with --team, --snapshot, "
+                     "--cache or --window-days")
+    if args.cache is not None and args.window_days is not None:
+        # Only the days missing from the cache are fetched, one request each
+        parser.error("--cache and --window-days can't be combined")
+    if args.save_archive is not None and (args.team
+                                          or args.snapshot is not None):
+        parser.error("--save-archive can't be combined with --team or "
+                     "--snapshot")
+    if args.engine == "columns" and (not args.input
+                                     or args.save_archive is not None):
+        # Columns are only faster when archives skip creating the entries
+        parser.error("--engine columns needs --input and can't be combined "
+                     "with --save-archive")
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.window_days is not None and args.window_days < 1:
+        parser.error("--window-days must be at least 1")
+    if args.snapshot_refresh_days < 1:
+        parser.error("--snapshot-refresh-days must be at least 1")
+    if args.cache_open_days < 0:
+        parser.error("--cache-open-days can't be negative")
     config_dict = yield actions.get_config_json(args.config_json)
+    if args.team and "team" not in config_dict:
+        parser.error("--team needs a team key in {}".format(args.config_json))
     now = yield actions.get_current_date()
     then = datetime.timedelta(-(7 if args.week else 31)) + now
     run_info = get_runtime_info(config_dict,
@@ -162,23 +660,35 @@ def do_main(args_list: Sequence[str]) -> Any:
                                 then,
                                 now,
     )
-    redmine_info = yield actions.get_redmine_info(
-        run_info.base_url,
-        "me", # actually the PI key identifies User
-        run_info.start,
-        run_info.end,
-        run_info.api_key)
-    redmine_entries = [x for x in entries.parse_from(redmine_info)]
-    evaluator = rules.RuleEvaluator(
-        rules.SelectRuleUsingTheirMatchMethod(),
-        StampedHoursAccumulator)
-    satisfaction = evaluator.satisfaction(run_info.rules, redmine_entries)
-    yield actions.do_print(
-        "{}",
-        sparkline.format_data(
+    if args.team:
+        yield do_team(args, config_dict, run_info, profile)
+        return
+    rollup_acc = None
+    read_columns = args.engine == "columns"
+    if args.snapshot is None and not read_columns:
+        redmine_entries = yield fetch_entries(args, run_info)
+        if args.save_archive is not None:
+            redmine_entries = list(redmine_entries)
+            yield actions.write_archive(args.save_archive, redmine_entries)
+    if read_columns:
+        satisfaction = yield evaluate_input_columns(
+            args, run_info.rules, profile)
+    elif args.rollup:
+        rollup_acc = evaluate(
+            args, run_info.rules, redmine_entries, profile,
+            rollups.RollupAccumulator.configure(args.rollup,
+                                               StampedHoursAccumulator))
+        satisfaction = rollup_acc.daily
+    elif args.snapshot is None:
+        satisfaction = evaluate(args, run_info.rules, redmine_entries, profile)
+    else:
+        satisfaction = yield refresh_snapshot(args, run_info, profile)
+    with profile.timed("render"):
+        graph = sparkline.format_data(
             str(satisfaction.period_start()),
             satisfaction.period_data(),
-            str(satisfaction.period_end())))
+            str(satisfaction.period_end()))
+    yield actions.do_print("{}", graph)
     try:
         global_satis = satisfaction.period_hours_accumulator().satisfaction()
     except ZeroDivisionError:
@@ -186,10 +696,58 @@ def do_main(args_list: Sequence[str]) -> Any:
     else:
         yield actions.do_print("Global satisfaction over this period: {:.1f}%",
                                global_satis * 100.0)
+    if rollup_acc is not None:
+        for rollup in args.rollup:
+            yield actions.do_print("Satisfaction per {}{}:",
+                                   rollup.resolution,
+                                   "" if rollup.key is None
+                                   else " and " + rollup.key)
+            for line in rollup_acc.format(rollup):
+                yield actions.do_print("{}", line)
 
 def main(args_list):
-    eff = do_main(args_list)
-    return sync_perform(actions.IO_DISPATCHER, eff)
+    args = make_command_line_parser().parse_args(args_list)
+    if args.asyncio:
+        import asyncio
+        import aio
+        dispatcher = aio.ASYNC_DISPATCHER
+    else:
+        dispatcher = actions.IO_DISPATCHER
+    if args.profile is None:
+        profile = profiling.NullProfile()
+    else:
+        profile = profiling.Profile()
+        dispatcher = profiling.instrument_dispatcher(dispatcher, profile)
+    eff = do_main(args_list, profile)
+    if args.cprofile is None:
+        profiler = None
+    else:
+        import cProfile
+        profiler = cProfile.Profile()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        if args.asyncio:
+            loop = asyncio.new_event_loop()
+            try:
+                result = loop.run_until_complete(
+                    aio.async_perform(dispatcher, eff))
+            finally:
+                loop.close()
+        else:
+            result = sync_perform(dispatcher, eff)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.cprofile)
+    if args.profile is not None:
+        print(profile.format(args.profile), file=sys.stderr)
+    return result
+
+async def async_main(args_list):
+    "Coroutine equivalent of L{main} (without --profile or --cprofile)"
+    import aio
+    return await aio.async_perform(aio.ASYNC_DISPATCHER, do_main(args_list))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,168 @@
+"""Timings and counters of a run, see the C{--profile} option
+
+A L{Profile} records the wall time spent performing each type of effect (by
+wrapping the dispatcher, see L{instrument_dispatcher}), the time of the
+stages of L{main.do_main}, the size of the downloaded text, the rows parsed
+and the L{rules.EvaluationStats} of the rule evaluation.
+L{NullProfile} has the same interface but records nothing."""
+
+import collections
+import contextlib
+import json
+import threading
+import time
+from typing import Any, DefaultDict, Dict, Iterable, Iterator, Optional
+
+import actions
+import rules
+
+
+class NullProfile(object):
+    "Used when no profile was requested: costs (next to) nothing"
+    stats: Optional[rules.EvaluationStats] = None
+
+    @contextlib.contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        yield
+
+    def count_rows(self, rows: Iterable) -> Iterable:
+        return rows
+
+
+class Profile(NullProfile):
+    def __init__(self) -> None:
+        # Effects may be performed in several threads (ParallelEffects)
+        self._lock = threading.Lock()
+        self.effect_counts: collections.Counter = collections.Counter()
+        self.effect_seconds: DefaultDict[str, float] = (
+            collections.defaultdict(float))
+        self.stage_seconds: DefaultDict[str, float] = (
+            collections.defaultdict(float))
+        self.text_bytes = 0
+        self.rows_parsed = 0
+        self.stats: rules.EvaluationStats = rules.EvaluationStats()
+
+    def add_effect(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.effect_counts[name] += 1
+            self.effect_seconds[name] += seconds
+
+    def add_text(self, size: int) -> None:
+        """Count C{size} bytes of downloaded text
+
+        Responses are decoded by the performers: the size is the one of
+        the text encoded in UTF-8, not of the (maybe compressed) body."""
+        with self._lock:
+            self.text_bytes += size
+
+    @contextlib.contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[stage] += time.perf_counter() - start
+
+    def count_rows(self, rows: Iterable) -> Iterator:
+        """Count the rows and the time spent producing them (stage C{parse})
+
+        For a streamed response, this includes the time of the download."""
+        rows = iter(rows)
+        while True:
+            start = time.perf_counter()
+            try:
+                row = next(rows)
+            except StopIteration:
+                return
+            finally:
+                self.stage_seconds["parse"] += time.perf_counter() - start
+            self.rows_parsed += 1
+            yield row
+
+    def count_chunks(self, chunks: Iterable) -> Iterator:
+        for chunk in chunks:
+            self.add_text(
+                len(chunk) if isinstance(chunk, bytes)
+                else len(chunk.encode("utf-8")))
+            yield chunk
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "effects": {name: {"count": self.effect_counts[name],
+                               "seconds": self.effect_seconds[name]}
+                        for name in self.effect_counts},
+            "stages": dict(self.stage_seconds),
+            "text_bytes": self.text_bytes,
+            "rows_parsed": self.rows_parsed,
+            "rule_selections": self.stats.selections,
+            "accumulator_merges": self.stats.merges,
+            "rule_matches": [{"rule": repr(rule), "matches": count}
+                             for rule, count in self.stats.matches()],
+        }
+
+    def format(self, fmt: str) -> str:
+        "Return the profile as C{json} or as a C{table} for humans"
+        d = self.as_dict()
+        if fmt == "json":
+            return json.dumps(d, indent=2, sort_keys=True)
+        lines = ["{:<32} {:>8} {:>10}".format("Effect", "count", "seconds")]
+        lines.extend("{:<32} {:>8} {:>10.4f}".format(
+            name, v["count"], v["seconds"])
+                     for name, v in sorted(d["effects"].items()))
+        lines.append("{:<32} {:>19}".format("Stage", "seconds"))
+        lines.extend("{:<32} {:>19.4f}".format(name, seconds)
+                     for name, seconds in sorted(d["stages"].items()))
+        for name in ("text_bytes", "rows_parsed", "rule_selections",
+                     "accumulator_merges"):
+            lines.append("{:<32} {:>19}".format(name, d[name]))
+        lines.append("{:<32} {:>19}".format("Rule", "matches"))
+        lines.extend("{:<32.32} {:>19}".format(m["rule"], m["matches"])
+                     for m in d["rule_matches"])
+        return "\n".join(lines)
+
+
+class _ProfilingBox(object):
+    """Record the time until the result is put in the box
+
+    This also works for asynchronous performers, which return before the
+    result is available.  The text of L{actions.HttpRequest} results is
+    counted as well, see L{Profile.add_text}."""
+    def __init__(self, box, profile: Profile, intent) -> None:
+        self.box = box
+        self.profile = profile
+        self.intent = intent
+        self.start = time.perf_counter()
+
+    def _done(self) -> None:
+        self.profile.add_effect(type(self.intent).__name__,
+                                time.perf_counter() - self.start)
+
+    def succeed(self, result):
+        self._done()
+        if isinstance(self.intent, actions.HttpRequest):
+            if isinstance(result, str):
+                self.profile.add_text(len(result.encode("utf-8")))
+            else:
+                # Streamed response: count the chunks as they are consumed
+                result = self.profile.count_chunks(result)
+        self.box.succeed(result)
+
+    def fail(self, exc_info):
+        self._done()
+        self.box.fail(exc_info)
+
+
+def instrument_dispatcher(dispatcher, profile: Profile):
+    """Wrap C{dispatcher} to record the time spent in each performer
+
+    Nested effects (e.g. the children of C{ParallelEffects}) are counted both
+    on their own and as part of their parent."""
+    def instrumented_dispatcher(intent):
+        performer = dispatcher(intent)
+        if performer is None:
+            return None
+        def timed_performer(dispatcher, intent, box):
+            return performer(dispatcher, intent,
+                             _ProfilingBox(box, profile, intent))
+        return timed_performer
+    return instrumented_dispatcher
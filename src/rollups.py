@@ -0,0 +1,201 @@
+"""Satisfaction per day, week or month, optionally broken down by a key
+
+A L{RollupAccumulator} computes several L{Rollup}s, and the hours per day of
+a wrapped accumulator, in a single pass over the time entries."""
+
+import copyreg
+import datetime
+import functools
+from abc import ABCMeta
+from typing import (
+    Any, Callable, Dict, List, Optional, Sequence, Tuple, Type, cast)
+
+import attr
+
+import entries
+import rules
+
+_PERIOD_STARTS: Dict[str, Callable[[datetime.date], datetime.date]] = {
+    "day": lambda d: d,
+    "week": lambda d: d - datetime.timedelta(d.weekday()),
+    "month": lambda d: d.replace(day=1),
+}
+"@var: first day of the period of each resolution containing a date"
+
+_PERIOD_LABELS: Dict[str, str] = {
+    "day": "{:%Y-%m-%d}",
+    "week": "{:%G-W%V}",
+    "month": "{:%Y-%m}",
+}
+
+_KEYS: Dict[Optional[str], Callable[[str, entries.TimeEntry], str]] = {
+    None: lambda rule_label, e: "",
+    "rule": lambda rule_label, e: rule_label,
+    "category": lambda rule_label, e: e.category,
+    "issue": lambda rule_label, e: e.issue_id,
+    "project": lambda rule_label, e: e.project,
+}
+
+RESOLUTIONS = tuple(_PERIOD_STARTS)
+KEYS = tuple(k for k in _KEYS if k is not None)
+
+
+@attr.s(frozen=True)
+class Rollup(object):
+    "Hours per C{resolution} and, unless it is None, per C{key} of the entry"
+    resolution = attr.ib(validator=attr.validators.in_(RESOLUTIONS))
+    key = attr.ib(default=None,
+                  validator=attr.validators.optional(
+                      attr.validators.in_(KEYS)))
+
+    @classmethod
+    def parse(cls, spec: str) -> "Rollup":
+        """Parse C{resolution[:key]}, e.g. C{week} or C{month:rule}
+
+        Raise ValueError if the resolution or the key is unknown."""
+        resolution, _, key = spec.partition(":")
+        if resolution not in RESOLUTIONS:
+            raise ValueError("Unknown rollup resolution {!r}, expected one of "
+                             "{}".format(resolution, ", ".join(RESOLUTIONS)))
+        if key and key not in KEYS:
+            raise ValueError("Unknown rollup key {!r}, expected one of "
+                             "{}".format(key, ", ".join(KEYS)))
+        return cls(resolution, key or None)
+
+    def __str__(self) -> str:
+        return self.resolution if self.key is None else "{}:{}".format(
+            self.resolution, self.key)
+
+
+Table = Dict[Tuple[datetime.date, str], List[float]]
+"@var: [good, total] hours by (first day of the period, key)"
+
+
+class _ConfiguredRollups(ABCMeta):
+    "Metaclass of the classes returned by L{RollupAccumulator.configure}"
+
+
+class RollupAccumulator(rules.Accumulator):
+    """Accumulate the hours of each of C{rollups} and of C{daily}
+
+    The rollups are class attributes, so that L{neutral} and
+    L{from_rule_and_entry} are class methods like those of the other
+    accumulators: give the class returned by L{configure}, e.g.
+    C{RollupAccumulator.configure(rollups, main.StampedHoursAccumulator)},
+    as the accumulator of a L{rules.RuleEvaluator}.
+
+    @cvar rollups: the rollups computed
+    @cvar daily_class: accumulator class of the hours per day
+    @ivar daily: accumulator of class C{daily_class} of all entries
+    @ivar tables: one L{Table} per rollup"""
+    __slots__ = ("daily", "tables", "_periods", "_rule_labels")
+    rollups: Tuple[Rollup, ...] = ()
+    daily_class: Any = None
+
+    def __init__(self) -> None:
+        if self.daily_class is None:
+            raise TypeError("Use RollupAccumulator.configure(rollups, daily) "
+                            "to choose the rollups")
+        self.daily = self.daily_class.neutral()
+        self.tables: List[Table] = [{} for _ in self.rollups]
+        # Caches of add_entry: entries of a day share their date object and
+        # rules repeat
+        self._periods: Dict[datetime.date, List[datetime.date]] = {}
+        self._rule_labels: Dict[int, str] = {}
+
+    @classmethod
+    def configure(cls, rollups: Sequence[Rollup], daily: Any
+    ) -> Type["RollupAccumulator"]:
+        """Return the subclass computing C{rollups} and accumulating the
+        hours per day with class C{daily}
+
+        The same arguments give the same class, which can be pickled (e.g.
+        for L{rules.ParallelRuleEvaluator})."""
+        return _configured(tuple(rollups), daily)
+
+    @classmethod
+    def neutral(cls) -> "RollupAccumulator":
+        return cls()
+
+    def update(self, other: "RollupAccumulator") -> None:
+        if other.rollups != self.rollups:
+            raise ValueError("Can't merge rollups {} into {}".format(
+                [str(r) for r in other.rollups],
+                [str(r) for r in self.rollups]))
+        self.daily.update(other.daily)
+        for mine, theirs in zip(self.tables, other.tables):
+            for k, (good, total) in theirs.items():
+                try:
+                    hours = mine[k]
+                except KeyError:
+                    mine[k] = [good, total]
+                else:
+                    hours[0] += good
+                    hours[1] += total
+
+    @classmethod
+    def from_rule_and_entry(cls, rule, entry) -> "RollupAccumulator":
+        result = cls()
+        result.add_entry(rule, entry)
+        return result
+
+    def add_entry(self, rule, entry):
+        self.daily.add_entry(rule, entry)
+        when = entry.date
+        try:
+            periods = self._periods[when]
+        except KeyError:
+            periods = self._periods[when] = [
+                _PERIOD_STARTS[r.resolution](when) for r in self.rollups]
+        try:
+            rule_label = self._rule_labels[id(rule)]
+        except KeyError:
+            rule_label = self._rule_labels[id(rule)] = repr(rule)
+        duration = entry.duration
+        good = rule.weight * duration
+        for rollup, period, table in zip(self.rollups, periods, self.tables):
+            k = (period, _KEYS[rollup.key](rule_label, entry))
+            try:
+                hours = table[k]
+            except KeyError:
+                table[k] = [good, duration]
+            else:
+                hours[0] += good
+                hours[1] += duration
+
+    def format(self, rollup: Rollup) -> List[str]:
+        """Return one line per period and key of C{rollup}, in order
+
+        Each line has the period, the key (if any), the satisfaction and the
+        total hours."""
+        table = self.tables[self.rollups.index(rollup)]
+        label = _PERIOD_LABELS[rollup.resolution]
+        width = max((len(key) for _, key in table), default=0)
+        lines = []
+        for (period, key), (good, total) in sorted(table.items()):
+            try:
+                satisfaction = "{:.1f}%".format(good / total * 100.0)
+            except ZeroDivisionError:
+                satisfaction = "no data"
+            lines.append(" ".join(x for x in (
+                "{:<10}".format(label.format(period)),
+                "{:<{}}".format(key, width) if rollup.key else "",
+                "{:>7}".format(satisfaction),
+                "{:>8.2f}h".format(total)) if x))
+        return lines
+
+
+@functools.lru_cache(maxsize=None)
+def _configured(rollups: Tuple[Rollup, ...], daily: Any
+) -> Type[RollupAccumulator]:
+    return cast(Type[RollupAccumulator], _ConfiguredRollups(
+        RollupAccumulator.__name__, (RollupAccumulator,),
+        {"__slots__": (), "rollups": rollups, "daily_class": daily}))
+
+
+def _reduce_configured(cls: Any) -> Any:
+    return _configured, (cls.rollups, cls.daily_class)
+
+
+# Classes are pickled by name: pickle the configured ones by their arguments
+copyreg.pickle(_ConfiguredRollups, _reduce_configured)
@@ -1,16 +1,33 @@
 """Interpret rules to compute satisfaction score of a given time entry"""
 
 from abc import ABCMeta, abstractmethod
+import bisect
+import collections
+import datetime
+import functools
+import hashlib
+import heapq
+import itertools
 import json
+import operator
+import os
+import re
 
 import attr
-from typing import Any, Callable, List, Optional, Sequence, Type, TypeVar
+from typing import (
+    Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple,
+    Type, TypeVar)
 
 import entries
 
 
 class Rule(metaclass=ABCMeta):
     "Abstract class for mypy type declaration purposes"
+    fields: Tuple[str, ...] = (
+        "issue_id", "duration", "category", "comment", "date", "project")
+    "@cvar: attributes of L{entries.TimeEntry} the rule looks at"
+    weight: float
+
     @abstractmethod
     def match(self, e: entries.TimeEntry) -> Optional[float]:
         pass
@@ -24,6 +41,7 @@ class Rule(metaclass=ABCMeta):
 
 @attr.s
 class MatchAny(Rule):
+    fields = ()
     weight = attr.ib(validator=Rule._validate_weight)
 
     def match(self, e: entries.TimeEntry) -> Optional[float]:
@@ -32,7 +50,9 @@ class MatchAny(Rule):
 
 @attr.s
 class MatchIssueID(Rule):
-    issue_id = attr.ib(validator=attr.validators.instance_of(str))
+    fields = ("issue_id",)
+    issue_id = attr.ib(convert=entries.intern_str,  # type: ignore
+                       validator=attr.validators.instance_of(str))
     weight = attr.ib(validator=Rule._validate_weight)
 
     def match(self, e: entries.TimeEntry) -> Optional[float]:
@@ -44,7 +64,9 @@ class MatchIssueID(Rule):
 
 @attr.s
 class MatchCategory(Rule):
-    category = attr.ib(validator=attr.validators.instance_of(str))
+    fields = ("category",)
+    category = attr.ib(convert=entries.intern_str,  # type: ignore
+                       validator=attr.validators.instance_of(str))
     weight = attr.ib(validator=Rule._validate_weight)
 
     def match(self, e: entries.TimeEntry) -> Optional[float]:
@@ -54,6 +76,158 @@ class MatchCategory(Rule):
             return None
 
 
+def _validate_regex(instance, attribute, value):
+    attr.validators.instance_of(str)(instance, attribute, value)
+    try:
+        re.compile(value)
+    except re.error as e:
+        raise ValueError("'{name}' must be a regular expression and {value!r} "
+                         "isn't: {e}".format(name=attribute.name, value=value,
+                                             e=e))
+
+
+@attr.s
+class MatchComment(Rule):
+    "Match entries whose comment contains a match of regular expression"
+    fields = ("comment",)
+    comment = attr.ib(validator=_validate_regex)
+    weight = attr.ib(validator=Rule._validate_weight)
+
+    def match(self, e: entries.TimeEntry) -> Optional[float]:
+        if re.search(self.comment, e.comment) is not None:
+            return self.weight
+        else:
+            return None
+
+
+def _to_tuple(x):
+    return tuple(x) if isinstance(x, (list, tuple)) else x
+
+
+def _validate_pair(item_type):
+    "Validate a (first, last) pair of C{item_type} items with first <= last"
+    def validate(instance, attribute, value):
+        if (not isinstance(value, tuple) or len(value) != 2
+                or not all(isinstance(x, item_type) for x in value)
+                or value[0] > value[1]):
+            raise ValueError(
+                "'{name}' must be [first, last] with first <= last and "
+                "{value!r} isn't".format(name=attribute.name, value=value))
+    return validate
+
+
+def _to_issue_number(x):
+    "Convert an issue number given as str, int or (integral) float"
+    if isinstance(x, float) and not x.is_integer():
+        raise ValueError(x)
+    return int(x)
+
+def _issue_range(x):
+    "Convert [first, last] issue numbers"
+    x = _to_tuple(x)
+    try:
+        return tuple(_to_issue_number(i) for i in x)
+    except (TypeError, ValueError):
+        return x
+
+
+@attr.s
+class MatchIssueRange(Rule):
+    "Match issue numbers from C{issue_range[0]} to C{issue_range[1]}"
+    fields = ("issue_id",)
+    # attrs 17.2 has no converter argument
+    issue_range = attr.ib(convert=_issue_range,  # type: ignore
+                          validator=_validate_pair(int))
+    weight = attr.ib(validator=Rule._validate_weight)
+
+    def match(self, e: entries.TimeEntry) -> Optional[float]:
+        try:
+            number = int(e.issue_id)
+        except ValueError:
+            return None
+        first, last = self.issue_range
+        if first <= number <= last:
+            return self.weight
+        else:
+            return None
+
+
+def _issue_set(x):
+    # Sorted so that the repr, hence rules_key, is stable
+    return (tuple(sorted(set(map(entries.intern_str, x))))
+            if isinstance(x, (list, tuple)) else x)
+
+
+def _validate_issue_set(instance, attribute, value):
+    if (not isinstance(value, tuple)
+            or not all(isinstance(x, str) for x in value)):
+        raise ValueError("'{name}' must be a list of str and {value!r} isn't"
+                         .format(name=attribute.name, value=value))
+
+
+@attr.s
+class MatchIssueSet(Rule):
+    fields = ("issue_id",)
+    issue_ids = attr.ib(convert=_issue_set,  # type: ignore
+                        validator=_validate_issue_set)
+    weight = attr.ib(validator=Rule._validate_weight)
+
+    def match(self, e: entries.TimeEntry) -> Optional[float]:
+        if e.issue_id in self.issue_ids:
+            return self.weight
+        else:
+            return None
+
+
+@attr.s
+class MatchProject(Rule):
+    fields = ("project",)
+    project = attr.ib(convert=entries.intern_str,  # type: ignore
+                      validator=attr.validators.instance_of(str))
+    weight = attr.ib(validator=Rule._validate_weight)
+
+    def match(self, e: entries.TimeEntry) -> Optional[float]:
+        if e.project == self.project:
+            return self.weight
+        else:
+            return None
+
+
+def _date_range(x):
+    "Convert [first, last] dates given as YYYY-MM-DD"
+    x = _to_tuple(x)
+    try:
+        return tuple(d if isinstance(d, datetime.date)
+                     else datetime.datetime.strptime(d, "%Y-%m-%d").date()
+                     for d in x)
+    except (TypeError, ValueError):
+        return x
+
+
+@attr.s
+class MatchDateRange(Rule):
+    "Match entries from C{date_range[0]} to C{date_range[1]} (included)"
+    fields = ("date",)
+    date_range = attr.ib(convert=_date_range,  # type: ignore
+                         validator=_validate_pair(datetime.date))
+    weight = attr.ib(validator=Rule._validate_weight)
+
+    def match(self, e: entries.TimeEntry) -> Optional[float]:
+        first, last = self.date_range
+        if first <= e.date <= last:
+            return self.weight
+        else:
+            return None
+
+
+def rule_fields(rules: Sequence[Rule]) -> Tuple[str, ...]:
+    "Attributes of L{entries.TimeEntry} at least one of C{rules} looks at"
+    result: Set[str] = set()
+    for rule in rules:
+        result.update(getattr(rule, "fields", Rule.fields))
+    return tuple(sorted(result))
+
+
 class Selector(metaclass=ABCMeta):
     """Search the sequence of rules for the rule matching the L{TimeEntry}
 
@@ -64,11 +238,33 @@ class Selector(metaclass=ABCMeta):
     def select(self, rules: Sequence[Rule], entry: entries.TimeEntry) -> Rule:
         pass
 
+    def bind(self, rules: Sequence[Rule]
+    ) -> Callable[[entries.TimeEntry], Rule]:
+        """Return a function selecting a rule of C{rules} for an entry
+
+        Used by the evaluators to select the rules of many entries: override
+        it when part of the work of L{select} only depends on C{rules}."""
+        return functools.partial(self.select, rules)
+
+
+def bind_selector(selector: Any, rules: Sequence[Rule]
+) -> Callable[[entries.TimeEntry], Rule]:
+    """Return C{selector.bind(rules)}
+
+    Selectors only need a C{select} method: for those not deriving from
+    L{Selector}, C{rules} are bound to C{select}."""
+    bind = getattr(selector, "bind", None)
+    if bind is None:
+        return functools.partial(selector.select, rules)
+    return bind(rules)
+
 
 class Accumulator(metaclass=ABCMeta):
     """Represent data with a neutral element and associative operation
 
     Example: (0, +) or (1, *)"""
+    # Let subclasses define __slots__ without getting a __dict__ anyway
+    __slots__ = ()
     _C = TypeVar("_C", bound="Accumulator")
     # The abstractmethod stuff is to help mypy
     @classmethod
@@ -86,6 +282,14 @@ class Accumulator(metaclass=ABCMeta):
     def from_rule_and_entry(cls, rule: Rule, entry: entries.TimeEntry) -> "Accumulator":
         pass
 
+    def add_entry(self, rule: Rule, entry: entries.TimeEntry) -> None:
+        """Update in place with the contribution of C{entry}
+
+        Equivalent to C{self.update(self.from_rule_and_entry(rule, entry))}:
+        override it to avoid allocating an intermediate accumulator for each
+        entry.  L{RuleEvaluator} uses it when it is available."""
+        self.update(self.from_rule_and_entry(rule, entry))
+
 
 class Convertor(metaclass=ABCMeta):
     """Convert a L{TimeEntry} into an L{Accumulator}
@@ -103,9 +307,468 @@ class SelectRuleUsingTheirMatchMethod(Selector):
         return next(r for r in rules if r.match(entry) is not None)
 
 
+class _RuleIndex(object):
+    """Dict indexes of a sequence of rules, see L{SelectRuleUsingIndex}
+
+    Each index maps a value to the (position, rule) pair of the first rule
+    matching that value so that first-match-wins semantics are preserved by
+    picking the lowest position among the candidates."""
+    def __init__(self, rules: Sequence[Rule]) -> None:
+        self.no_match: Tuple[int, Optional[Rule]] = (len(rules), None)
+        self.by_issue_id: Dict[str, Tuple[int, Rule]] = {}
+        self.by_category: Dict[str, Tuple[int, Rule]] = {}
+        self.first_any: Tuple[int, Optional[Rule]] = self.no_match
+        # Rules of unknown types: only their match method can tell
+        self.others: List[Tuple[int, Rule]] = []
+        for position, rule in enumerate(rules):
+            # Subclasses may override match, hence the exact type checks
+            if type(rule) is MatchIssueID:
+                self.by_issue_id.setdefault(rule.issue_id, (position, rule))
+            elif type(rule) is MatchCategory:
+                self.by_category.setdefault(rule.category, (position, rule))
+            elif type(rule) is MatchAny:
+                self.first_any = (position, rule)
+                break  # no rule after this one can ever be selected
+            else:
+                self.others.append((position, rule))
+
+    def select(self, entry: entries.TimeEntry) -> Rule:
+        best = min(self.by_issue_id.get(entry.issue_id, self.no_match),
+                   self.by_category.get(entry.category, self.no_match),
+                   self.first_any)
+        for candidate in self.others:
+            if candidate[0] > best[0]:
+                break
+            if candidate[1].match(entry) is not None:
+                best = candidate
+                break
+        if best[1] is None:
+            # Same exception as SelectRuleUsingTheirMatchMethod
+            raise StopIteration("No rule matches {!r}".format(entry))
+        return best[1]
+
+
+class SelectRuleUsingIndex(Selector):
+    """Drop-in replacement for L{SelectRuleUsingTheirMatchMethod}
+
+    Instead of calling each rule's match method, the rules are indexed by
+    issue ID and category so that selecting a rule costs a few dict lookups.
+    The index is rebuilt whenever a different sequence of rules is passed to
+    L{select} (the sequence should not be modified in place)."""
+    def __init__(self) -> None:
+        self._rules: Optional[Sequence[Rule]] = None
+        self._index: Optional[_RuleIndex] = None
+
+    def select(self, rules, entry):
+        if rules is not self._rules:
+            self._index = _RuleIndex(rules)
+            self._rules = rules
+        return self._index.select(entry)
+
+
+def rules_key(rules: Sequence[Rule]) -> str:
+    "Fingerprint of rules, e.g. as parsed from a configuration file"
+    return hashlib.sha256(repr(list(rules)).encode("utf-8")).hexdigest()
+
+
+_Lookup = Callable[[entries.TimeEntry], int]
+"@var: return the position of the first rule of a kind matching an entry"
+
+
+def _dict_lookup(positions: Dict[Any, int], field: str, no_match: int
+) -> _Lookup:
+    get = positions.get
+    key = operator.attrgetter(field)
+    def lookup(entry):
+        return get(key(entry), no_match)
+    return lookup
+
+
+def _interval_lookup(
+        intervals: Sequence[Tuple[int, int, int]],
+        key: Callable[[entries.TimeEntry], Optional[int]],
+        no_match: int,
+) -> _Lookup:
+    """Find the first of (first, last, position) C{intervals} containing a key
+
+    The bounds of the intervals split the keys into segments covered by the
+    same intervals: the lowest position of each segment is computed with a
+    sweep and a segment is found by bisection."""
+    bounds = sorted({first for first, _, _ in intervals}
+                    | {last + 1 for _, last, _ in intervals})
+    by_first = sorted(intervals)
+    covering: List[Tuple[int, int]] = []  # heap of (position, last)
+    positions = []
+    idx = 0
+    for bound in bounds:
+        while idx < len(by_first) and by_first[idx][0] == bound:
+            heapq.heappush(covering, (by_first[idx][2], by_first[idx][1]))
+            idx += 1
+        while covering and covering[0][1] < bound:
+            heapq.heappop(covering)
+        positions.append(covering[0][0] if covering else no_match)
+    def lookup(entry):
+        k = key(entry)
+        if k is None:
+            return no_match
+        segment = bisect.bisect_right(bounds, k) - 1
+        return no_match if segment < 0 else positions[segment]
+    return lookup
+
+
+def _issue_number(entry: entries.TimeEntry) -> Optional[int]:
+    try:
+        return int(entry.issue_id)
+    except ValueError:
+        return None
+
+
+def _date_ordinal(entry: entries.TimeEntry) -> int:
+    return entry.date.toordinal()
+
+
+_COMMENT_MEMO_SIZE = 4096
+
+
+def _regex_lookup(patterns: Sequence[Tuple[str, int]], no_match: int
+) -> _Lookup:
+    """Find the first of (pattern, position) C{patterns} found in the comment
+
+    The patterns are combined into a single regular expression: one
+    alternative per pattern, in order, each looking ahead for its pattern
+    anywhere in the comment and then matching an empty group naming it.
+    Patterns with groups (their numbers would change) or flags fall back to
+    searching one pattern after the other.  As comments repeat a lot (or
+    are empty), the results are memoized."""
+    compiled = [(re.compile(pattern), position)
+                for pattern, position in patterns]
+    group_positions = {"_rule{}".format(idx): position
+                       for idx, (_, position) in enumerate(patterns)}
+    combined = None
+    if not any(regex.groups or regex.flags != re.UNICODE
+               for regex, _ in compiled):
+        try:
+            combined = re.compile("|".join(
+                "(?=[\\s\\S]*?(?:{}))(?P<_rule{}>)".format(pattern, idx)
+                for idx, (pattern, _) in enumerate(patterns)))
+        except re.error:
+            pass
+    if combined is None:
+        searches = [(regex.search, position) for regex, position in compiled]
+        def find(comment):
+            for search, position in searches:
+                if search(comment) is not None:
+                    return position
+            return no_match
+    else:
+        match = combined.match
+        def find(comment):
+            m = match(comment)
+            return no_match if m is None else group_positions[m.lastgroup]
+    memo: Dict[str, int] = {}
+    def lookup(entry):
+        comment = entry.comment
+        try:
+            return memo[comment]
+        except KeyError:
+            if len(memo) >= _COMMENT_MEMO_SIZE:
+                memo.clear()
+            position = memo[comment] = find(comment)
+            return position
+    return lookup
+
+
+class _RuleEngine(object):
+    """Lookup structures for all the known types of rules, see L{compile_rules}
+
+    Each kind of rule gets its own structure returning the position of the
+    first rule of that kind matching an entry: dicts for issue IDs (single
+    or sets), categories and projects, bisection for issue and date ranges
+    and a single regular expression for comments.  The rule with the lowest
+    of these positions is selected."""
+    def __init__(self, rules: Sequence[Rule]) -> None:
+        no_match = len(rules)
+        self.default = no_match
+        issue_ids: Dict[str, int] = {}
+        categories: Dict[str, int] = {}
+        projects: Dict[str, int] = {}
+        issue_ranges: List[Tuple[int, int, int]] = []
+        date_ranges: List[Tuple[int, int, int]] = []
+        comments: List[Tuple[str, int]] = []
+        for position, rule in enumerate(rules):
+            if type(rule) is MatchIssueID:
+                issue_ids.setdefault(rule.issue_id, position)
+            elif type(rule) is MatchIssueSet:
+                for issue_id in rule.issue_ids:
+                    issue_ids.setdefault(issue_id, position)
+            elif type(rule) is MatchCategory:
+                categories.setdefault(rule.category, position)
+            elif type(rule) is MatchProject:
+                projects.setdefault(rule.project, position)
+            elif type(rule) is MatchIssueRange:
+                issue_ranges.append(rule.issue_range + (position,))
+            elif type(rule) is MatchDateRange:
+                first, last = rule.date_range
+                date_ranges.append(
+                    (first.toordinal(), last.toordinal(), position))
+            elif type(rule) is MatchComment:
+                comments.append((rule.comment, position))
+            elif type(rule) is MatchAny:
+                self.default = position
+                break
+        self.lookups: List[_Lookup] = []
+        for positions, field in ((issue_ids, "issue_id"),
+                                 (categories, "category"),
+                                 (projects, "project")):
+            if positions:
+                self.lookups.append(_dict_lookup(positions, field, no_match))
+        for intervals, key in ((issue_ranges, _issue_number),
+                               (date_ranges, _date_ordinal)):
+            if intervals:
+                self.lookups.append(
+                    _interval_lookup(intervals, key, no_match))
+        # The most expensive: only used when a comment rule may win
+        self.first_comment = comments[0][1] if comments else no_match
+        self.comment_lookup: _Lookup = (
+            _regex_lookup(comments, no_match) if comments
+            else lambda entry: no_match)
+        self.rules: List[Optional[Rule]] = list(rules) + [None]
+
+    def select(self, entry: entries.TimeEntry) -> Rule:
+        position = self.default
+        for lookup in self.lookups:
+            p = lookup(entry)
+            if p < position:
+                position = p
+        if position > self.first_comment:
+            p = self.comment_lookup(entry)
+            if p < position:
+                position = p
+        rule = self.rules[position]
+        if rule is None:
+            return _no_match(entry)
+        return rule
+
+
+_ENGINE_TYPES = (MatchAny, MatchIssueID, MatchIssueSet, MatchIssueRange,
+                 MatchCategory, MatchProject, MatchDateRange, MatchComment)
+
+
+def _no_match(entry: entries.TimeEntry) -> Rule:
+    # Same exception as SelectRuleUsingTheirMatchMethod
+    raise StopIteration("No rule matches {!r}".format(entry))
+
+
+def _compile(rules: Sequence[Rule]) -> Callable[[entries.TimeEntry], Rule]:
+    "Do the work of L{compile_rules}"
+    by_issue_id: Dict[str, Tuple[Rule, Dict[str, Rule]]] = {}
+    by_category: Dict[str, Rule] = {}
+    # Category rules before the current position, shared between the issue
+    # rules without category rule between them
+    earlier_categories: Dict[str, Rule] = {}
+    default: Optional[Rule] = None
+    for rule in rules:
+        # Subclasses may override match, hence the exact type checks
+        if type(rule) is MatchIssueID:
+            if rule.issue_id not in by_issue_id:
+                by_issue_id[rule.issue_id] = (rule, earlier_categories)
+        elif type(rule) is MatchCategory:
+            if rule.category not in by_category:
+                by_category[rule.category] = rule
+                earlier_categories = dict(by_category)
+        elif type(rule) is MatchAny:
+            default = rule
+            break  # no rule after this one can ever be selected
+        elif all(type(r) in _ENGINE_TYPES for r in rules):
+            return _RuleEngine(rules).select
+        else:
+            # Only their match method can tell: no specialization
+            return _RuleIndex(rules).select
+    issue_get = by_issue_id.get
+    category_get = by_category.get
+    if default is None:
+        def select(entry: entries.TimeEntry) -> Rule:
+            found = issue_get(entry.issue_id)
+            if found is None:
+                rule = category_get(entry.category)
+                return _no_match(entry) if rule is None else rule
+            return found[1].get(entry.category, found[0])
+    elif not by_category:
+        issue_rule_get = {k: v[0] for k, v in by_issue_id.items()}.get
+        def select(entry: entries.TimeEntry) -> Rule:
+            return issue_rule_get(entry.issue_id, default)
+    elif not by_issue_id:
+        def select(entry: entries.TimeEntry) -> Rule:
+            return category_get(entry.category, default)
+    else:
+        def select(entry: entries.TimeEntry) -> Rule:
+            found = issue_get(entry.issue_id)
+            if found is None:
+                return category_get(entry.category, default)
+            return found[1].get(entry.category, found[0])
+    return select
+
+
+_COMPILED: collections.OrderedDict = collections.OrderedDict()
+_COMPILED_MAXSIZE = 16
+
+
+def compile_rules(rules: Sequence[Rule]
+) -> Callable[[entries.TimeEntry], Rule]:
+    """Return a function selecting the first rule of C{rules} matching an entry
+
+    The rules are turned into dicts so that a selection costs at most two
+    dict lookups in a single call.  An issue rule maps to the category rules
+    before it, which win when the category of the entry matches.  The
+    functions are cached by the identities of C{rules}, which is cheaper than
+    L{rules_key}: the functions return the very rule objects given anyway
+    (the rules should not be modified in place)."""
+    key = tuple(id(r) for r in rules)
+    try:
+        _, select = _COMPILED[key]
+    except KeyError:
+        # Keep all the rules alive so that their ids are not reused: select
+        # only refers to the rules it can return
+        select = _compile(rules)
+        _COMPILED[key] = (tuple(rules), select)
+        if len(_COMPILED) > _COMPILED_MAXSIZE:
+            _COMPILED.popitem(last=False)
+    else:
+        _COMPILED.move_to_end(key)
+    return select
+
+
+class SelectRuleUsingCompiledRules(Selector):
+    """Drop-in replacement for L{SelectRuleUsingIndex}, see L{compile_rules}
+
+    L{bind} returns the compiled function itself: the evaluators select the
+    rule of an entry with a single call."""
+    def __init__(self) -> None:
+        self._rules: Optional[Sequence[Rule]] = None
+        self._select: Optional[Callable[[entries.TimeEntry], Rule]] = None
+
+    def select(self, rules, entry):
+        if rules is not self._rules:
+            self._select = compile_rules(rules)
+            self._rules = rules
+        return self._select(entry)
+
+    def bind(self, rules):
+        return compile_rules(rules)
+
+
+CacheInfo = collections.namedtuple(
+    "CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+def _no_key(entry: entries.TimeEntry) -> tuple:
+    "Key of all entries for rules looking at no field"
+    return ()
+
+
+class CachingSelector(Selector):
+    """Memoize the rule another L{Selector} picks for a L{TimeEntry}
+
+    Entries with equal values for all of C{key_fields} are assumed to match
+    the same rule: C{key_fields} must list every L{TimeEntry} attribute the
+    rules look at, which is what the default (None) does, see
+    L{rule_fields}.  At most C{maxsize} keys are remembered, the least
+    recently used key being evicted first.  The cache is cleared whenever a
+    different sequence of rules is passed to L{select}."""
+    def __init__(
+            self,
+            selector: Selector,
+            key_fields: Optional[Sequence[str]] = None,
+            maxsize: int = 4096,
+    ) -> None:
+        if maxsize < 1:
+            raise ValueError("'maxsize' must be >= 1 and {!r} isn't".format(
+                maxsize))
+        self.selector = selector
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.key_fields = key_fields
+        # Replaced by select for each sequence of rules
+        self._key: Callable[[entries.TimeEntry], Any] = _no_key
+        self._cache: collections.OrderedDict = collections.OrderedDict()
+        self._rules: Optional[Sequence[Rule]] = None
+
+    def select(self, rules, entry):
+        if rules is not self._rules:
+            self._cache.clear()
+            self._rules = rules
+            fields = (rule_fields(rules) if self.key_fields is None
+                      else self.key_fields)
+            # attrgetter needs at least one field: a constant key otherwise
+            self._key = (operator.attrgetter(*fields) if fields
+                         else _no_key)
+        key = self._key(entry)
+        try:
+            rule = self._cache[key]
+        except KeyError:
+            self.misses += 1
+            rule = self.selector.select(rules, entry)
+            self._cache[key] = rule
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        else:
+            self.hits += 1
+            self._cache.move_to_end(key)
+        return rule
+
+    def cache_info(self) -> CacheInfo:
+        "Statistics in the same format as C{functools.lru_cache}"
+        return CacheInfo(self.hits, self.misses, self.maxsize,
+                         len(self._cache))
+
+
+class EvaluationStats(object):
+    "Counters filled by L{RuleEvaluator} when it is given an instance"
+    def __init__(self) -> None:
+        self.rule_matches: collections.Counter = collections.Counter()
+        "@ivar: number of entries each rule was selected for"
+        self.selections = 0
+        "@ivar: number of rules selected, one per entry"
+        self.merges = 0
+        "@ivar: number of partial accumulators merged with C{update}"
+        self.rules: Sequence[Rule] = ()
+        "@ivar: rules of the last evaluation"
+
+    def counting(self, select: Callable[[entries.TimeEntry], Rule]
+    ) -> Callable[[entries.TimeEntry], Rule]:
+        "Wrap a function returned by L{Selector.bind} to count its results"
+        rule_matches = self.rule_matches
+        def counting_select(entry):
+            rule = select(entry)
+            rule_matches[id(rule)] += 1
+            self.selections += 1
+            return rule
+        return counting_select
+
+    def add_counts(self, counts: Sequence[int]) -> None:
+        """Add the number of entries each of L{rules} was selected for
+
+        This records selections counted elsewhere, e.g. in another
+        process."""
+        for rule, count in zip(self.rules, counts):
+            self.rule_matches[id(rule)] += count
+        self.selections += sum(counts)
+
+    def matches(self) -> List[Tuple[Rule, int]]:
+        "Return each rule with the number of entries it was selected for"
+        return [(r, self.rule_matches[id(r)]) for r in self.rules]
+
+
 class RuleEvaluator(object):
     AccumulatorType = TypeVar("AccumulatorType", bound=Accumulator)
-    def __init__(self, selector: Selector, accumulator: Type[AccumulatorType]) -> None:
+    def __init__(
+            self,
+            selector: Selector,
+            accumulator: Type[AccumulatorType],
+            stats: Optional[EvaluationStats] = None,
+    ) -> None:
+        self.stats = stats
         if hasattr(selector, "select"):
             self.selector = selector
         else:
@@ -121,12 +784,92 @@ class RuleEvaluator(object):
     def satisfaction(
             self,
             rules: Sequence[Rule],
-            entries: Sequence[entries.TimeEntry]
+            entries: Iterable[entries.TimeEntry]
     ) -> AccumulatorType:
         acc = self.accumulator.neutral()
-        for entry in entries:
-            r = self.selector.select(rules, entry)
-            acc.update(self.accumulator.from_rule_and_entry(r, entry))
+        select = bind_selector(self.selector, rules)
+        if self.stats is not None:
+            self.stats.rules = rules
+            select = self.stats.counting(select)
+        add_entry = getattr(acc, "add_entry", None)
+        if add_entry is None:
+            for entry in entries:
+                r = select(entry)
+                acc.update(self.accumulator.from_rule_and_entry(r, entry))
+        else:
+            for entry in entries:
+                add_entry(select(entry), entry)
+        return acc
+
+
+def _evaluate_chunk(selector, accumulator, counting, rules, chunk):
+    """Run in worker processes by L{ParallelRuleEvaluator}
+
+    Return the accumulator and, if C{counting}, the number of entries each
+    rule was selected for (rules are copies, their IDs are meaningless in
+    the parent process)."""
+    stats = EvaluationStats() if counting else None
+    acc = RuleEvaluator(selector, accumulator, stats).satisfaction(
+        rules, chunk)
+    return acc, None if stats is None else [n for _, n in stats.matches()]
+
+
+class ParallelRuleEvaluator(RuleEvaluator):
+    """Evaluate chunks of entries in worker processes
+
+    The partial accumulators are merged in the order of the chunks with
+    C{update}, which is correct because an L{Accumulator} is a monoid.  The
+    selector, accumulator class, rules and entries are sent to the workers,
+    so they must be picklable.  At most twice as many chunks as there are
+    workers are read ahead of the merge."""
+    def __init__(
+            self,
+            selector: Selector,
+            accumulator: Type[Accumulator],
+            *,
+            max_workers: Optional[int] = None,
+            chunk_size: int = 10000,
+            stats: Optional[EvaluationStats] = None,
+    ) -> None:
+        super().__init__(selector, accumulator, stats)
+        if chunk_size < 1:
+            raise ValueError("'chunk_size' must be >= 1 and {!r} isn't".format(
+                chunk_size))
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+    def satisfaction(
+            self,
+            rules: Sequence[Rule],
+            entries: Iterable[entries.TimeEntry]
+    ) -> Any:
+        # Slow to import and only needed here
+        import concurrent.futures
+        acc = self.accumulator.neutral()
+        stats = self.stats
+        if stats is not None:
+            stats.rules = rules
+        evaluate = functools.partial(
+            _evaluate_chunk, self.selector, self.accumulator,
+            stats is not None, rules)
+        def merge(future):
+            chunk_acc, counts = future.result()
+            acc.update(chunk_acc)
+            if stats is not None:
+                stats.add_counts(counts)
+                stats.merges += 1
+        entries = iter(entries)
+        chunks = iter(lambda: list(itertools.islice(entries, self.chunk_size)),
+                      [])
+        pending: collections.deque = collections.deque()
+        with concurrent.futures.ProcessPoolExecutor(
+                self.max_workers) as executor:
+            for chunk in chunks:
+                if len(pending) >= 2 * self.max_workers:
+                    merge(pending.popleft())
+                pending.append(executor.submit(evaluate, chunk))
+            while pending:
+                merge(pending.popleft())
         return acc
 
 
@@ -148,7 +891,12 @@ def parse_rules(d: dict) -> List[Rule]:
     return [next(x
                  for x in (_extract_keys_and_construct(elt, keys, ctor)
                            for (keys, ctor) in ((["issue_id", "weight"], MatchIssueID),
+                                                (["issue_ids", "weight"], MatchIssueSet),
+                                                (["issue_range", "weight"], MatchIssueRange),
                                                 (["category", "weight"], MatchCategory),
+                                                (["project", "weight"], MatchProject),
+                                                (["comment", "weight"], MatchComment),
+                                                (["date_range", "weight"], MatchDateRange),
                                                 (["weight"], MatchAny),
                            ))
                  if x is not None)
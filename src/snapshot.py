@@ -0,0 +1,173 @@
+"""Satisfaction state that can be saved and refreshed with few entries
+
+A wallboard re-evaluating a whole period every few minutes mostly sees the
+same entries.  A L{Snapshot} keeps the accumulated hours together with the
+(multi)set of entries of each day, so that a refresh only accumulates the
+entries that appeared and retracts those that disappeared (because they were
+deleted or edited) using the inverse of the accumulator monoid."""
+
+import collections
+import datetime
+import json
+import os
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+import entries
+import rules
+
+EntryKey = Tuple[str, float, str, str, str]
+"@var: what identifies an entry of a given day"
+
+_VERSION = 2
+
+
+def _entry_key(e: entries.TimeEntry) -> EntryKey:
+    return (e.issue_id, e.duration, e.category, e.comment, e.project)
+
+
+class Snapshot(object):
+    """Accumulator of type C{accumulator} and the entries it was built from
+
+    C{accumulator} must be an L{rules.Accumulator} of dated entries with
+    C{negated}, C{forget(day)}, C{to_json} and C{from_json} methods, like
+    L{main.StampedHoursAccumulator}."""
+    def __init__(self, accumulator, rule_list: Sequence[rules.Rule]) -> None:
+        self.accumulator = accumulator
+        self.rules_key = rules.rules_key(rule_list)
+        self.acc = accumulator.neutral()
+        self.days: Dict[datetime.date, collections.Counter] = {}
+        "@ivar: multiset of the L{EntryKey}s of each day"
+        self.refreshed_until: Optional[datetime.date] = None
+        "@ivar: last day of the last refresh"
+
+    def refresh(
+            self,
+            rule_list: Sequence[rules.Rule],
+            selector: rules.Selector,
+            start: datetime.date,
+            end: datetime.date,
+            current_entries: Iterable[entries.TimeEntry],
+    ) -> int:
+        """Bring days [start, end] in line with C{current_entries}
+
+        C{current_entries} must be all entries of these days.  Return the
+        number of entries added or retracted."""
+        if rules.rules_key(rule_list) != self.rules_key:
+            raise ValueError("Snapshot was computed with other rules")
+        by_day: Dict[datetime.date, list] = collections.defaultdict(list)
+        for e in current_entries:
+            if start <= e.date <= end:
+                by_day[e.date].append(e)
+        select = rules.bind_selector(selector, rule_list)
+        added = self.accumulator.neutral()
+        retracted = self.accumulator.neutral()
+        changes = 0
+        stale_days = [day for day in self.days
+                      if start <= day <= end and day not in by_day]
+        for day in stale_days:
+            changes += sum(self.days.pop(day).values())
+            self.acc.forget(day)
+        for day, day_entries in by_day.items():
+            old = self.days.get(day, collections.Counter())
+            new = collections.Counter(_entry_key(e) for e in day_entries)
+            if new == old:
+                continue
+            gone = old - new
+            for e in day_entries:
+                key = _entry_key(e)
+                if new[key] > old[key]:
+                    # Only as many copies as were added
+                    new[key] -= 1
+                    added.add_entry(select(e), e)
+                    changes += 1
+            for (issue_id, duration, category, comment, project), count \
+                    in gone.items():
+                e = entries.TimeEntry.trusted(
+                    issue_id, duration, category, comment, day, project)
+                for _ in range(count):
+                    retracted.add_entry(select(e), e)
+                    changes += 1
+            self.days[day] = collections.Counter(
+                _entry_key(e) for e in day_entries)
+        self.acc.update(added)
+        self.acc.update(retracted.negated())
+        if self.refreshed_until is None or end > self.refreshed_until:
+            self.refreshed_until = end
+        return changes
+
+    def drop_before(self, day: datetime.date) -> None:
+        "Forget the days before C{day}, e.g. when they leave the window"
+        for old in [x for x in self.days if x < day]:
+            del self.days[old]
+            self.acc.forget(old)
+
+    def refresh_start(
+            self,
+            start: datetime.date,
+            end: datetime.date,
+            refresh_days: int,
+    ) -> datetime.date:
+        """First day to fetch again to refresh the snapshot up to C{end}
+
+        The last C{refresh_days} days and everything since the last refresh
+        (included, as it may have changed afterwards) are fetched again."""
+        first = end - datetime.timedelta(refresh_days - 1)
+        if self.refreshed_until is None:
+            return start
+        return max(start, min(first, self.refreshed_until))
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "version": _VERSION,
+            "rules": self.rules_key,
+            "refreshed_until": (None if self.refreshed_until is None
+                                else str(self.refreshed_until)),
+            "accumulator": self.acc.to_json(),
+            "days": {str(day): [list(key) + [count]
+                                for key, count in keys.items()]
+                     for day, keys in self.days.items()},
+        }
+
+    @classmethod
+    def from_json(
+            cls,
+            d: Dict[str, Any],
+            accumulator,
+            rule_list: Sequence[rules.Rule],
+    ) -> "Snapshot":
+        """Load a snapshot saved with L{to_json}
+
+        An empty snapshot is returned if C{d} is from another version or for
+        other rules."""
+        result = cls(accumulator, rule_list)
+        if d.get("version") != _VERSION or d.get("rules") != result.rules_key:
+            return result
+        def parse_date(x):
+            return datetime.datetime.strptime(x, "%Y-%m-%d").date()
+        result.acc = accumulator.from_json(d["accumulator"])
+        result.days = {
+            parse_date(day): collections.Counter(
+                {(issue_id, duration, category, comment, project): int(count)
+                 for (issue_id, duration, category, comment, project, count)
+                 in keys})
+            for day, keys in d["days"].items()}
+        if d["refreshed_until"] is not None:
+            result.refreshed_until = parse_date(d["refreshed_until"])
+        return result
+
+
+def load(filename: str) -> Optional[Dict[str, Any]]:
+    "Return the JSON saved in C{filename} or None if there is no such file"
+    try:
+        with open(filename) as fp:
+            return json.load(fp)
+    except FileNotFoundError:
+        return None
+
+
+def save(filename: str, d: Dict[str, Any]) -> None:
+    "Write JSON C{d} in C{filename} atomically"
+    tmp_name = filename + ".tmp"
+    with open(tmp_name, "w") as fp:
+        json.dump(d, fp)
+    os.replace(tmp_name, filename)
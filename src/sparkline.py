@@ -2,7 +2,7 @@
 
 import datetime
 import itertools
-from typing import Iterator
+from typing import Iterable
 
 HEIGTHS : str = (
     " "
@@ -23,7 +23,7 @@ RIGHT_SEPARATOR : str = "\u258F" # LEFT ONE EIGHTH BLOCK
 def _valid(x: float) -> bool:
     return 0 <= x <= 1
 
-def format_data(start: str, data: Iterator[float], stop: str) -> str:
+def format_data(start: str, data: Iterable[float], stop: str) -> str:
     """Create a `graph' representing data in the [0.0, 1.0] range
 
     The graph is made up by one line of unicode characters.
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+import datetime
+import gzip
+import http.server
+import socketserver
+import threading
+import time
+import unittest
+import urllib.parse
+
+from effect import (
+    ComposedDispatcher, TypeDispatcher, base_dispatcher, sync_perform)
+import requests
+
+import actions
+import entries
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class StubRedmineServer:
+    """Serve a fake C{time_entries.csv} on localhost in a background thread
+
+    Each day of the requested C{spent_on} range gets one 1 hour entry.  The
+    queries are recorded in L{queries}, their headers in L{headers}, the
+    client ports in L{client_ports} and the highest number of requests served
+    at the same time in L{max_concurrent}.  The first C{failures} requests
+    get a 503 status.  Bodies are gzip compressed if the client accepts it.
+    Connections are kept alive (HTTP/1.1)."""
+    def __init__(self, delay=0.0, failures=0):
+        self.delay = delay
+        self.failures = failures
+        self.queries = []
+        self.headers = []
+        self.client_ports = []
+        self.concurrent = 0
+        self.max_concurrent = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = _ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:{}/time_entries.csv".format(
+            self.server.server_address[1])
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def make_body(self, query):
+        start, end = (datetime.datetime.strptime(x, "%Y-%m-%d").date()
+                      for x in query["v[spent_on][]"])
+        lines = ["Date,Comment,Hours,Activity,Issue"]
+        while start <= end:
+            lines.append("{:%Y-%m-%d},,1.00,Other,Task #1: One".format(start))
+            start += datetime.timedelta(1)
+        return "\n".join(lines) + "\n"
+
+    def handle(self, request):
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(request.path).query)
+        with self.lock:
+            self.queries.append(query)
+            self.headers.append(request.headers)
+            self.client_ports.append(request.client_address[1])
+            self.concurrent += 1
+            self.max_concurrent = max(self.max_concurrent, self.concurrent)
+            fail = self.failures > 0
+            self.failures -= 1
+        try:
+            time.sleep(self.delay)
+            if fail:
+                request.send_response(503)
+                request.send_header("Content-Length", "0")
+                request.end_headers()
+                return
+            body = self.make_body(query).encode("utf-8")
+            request.send_response(200)
+            request.send_header("Content-Type", "text/csv; charset=utf-8")
+            if "gzip" in request.headers.get("Accept-Encoding", ""):
+                body = gzip.compress(body)
+                request.send_header("Content-Encoding", "gzip")
+            request.send_header("Content-Length", str(len(body)))
+            request.end_headers()
+            request.wfile.write(body)
+        finally:
+            with self.lock:
+                self.concurrent -= 1
+
+
+class TestSplitDateRange(unittest.TestCase):
+    def test_001_one_window(self):
+        d = datetime.date(2017, 6, 1)
+        self.assertEqual(actions.split_date_range(d, d, 7), [(d, d)])
+
+    def test_002_windows_cover_range(self):
+        start = datetime.date(2017, 6, 1)
+        end = datetime.date(2017, 7, 2)
+        windows = actions.split_date_range(start, end, 10)
+        self.assertEqual(
+            windows,
+            [(datetime.date(2017, 6, 1), datetime.date(2017, 6, 10)),
+             (datetime.date(2017, 6, 11), datetime.date(2017, 6, 20)),
+             (datetime.date(2017, 6, 21), datetime.date(2017, 6, 30)),
+             (datetime.date(2017, 7, 1), datetime.date(2017, 7, 2))])
+
+    def test_003_empty_range(self):
+        self.assertEqual(actions.split_date_range(
+            datetime.date(2017, 6, 2), datetime.date(2017, 6, 1), 1), [])
+
+    def test_004_invalid_window(self):
+        with self.assertRaisesRegex(ValueError, "window_days"):
+            actions.split_date_range(
+                datetime.date(2017, 6, 1), datetime.date(2017, 6, 2), 0)
+
+
+class TestGetRedmineInfoByWindows(unittest.TestCase):
+    def test_001_fetch_in_parallel(self):
+        start = datetime.date(2017, 6, 1)
+        end = datetime.date(2017, 6, 30)
+        with StubRedmineServer(delay=0.1) as server:
+            bodies = sync_perform(
+                actions.IO_DISPATCHER,
+                actions.get_redmine_info_by_windows(
+                    server.url, "me", start, end, "key", 5))
+        self.assertEqual(len(server.queries), 6)
+        self.assertGreater(server.max_concurrent, 1)
+        self.assertLessEqual(server.max_concurrent,
+                             actions.MAX_PARALLEL_EFFECTS)
+        dates = [e.date
+                 for body in bodies
+                 for e in entries.parse_chunks(body)]
+        self.assertEqual(dates,
+                         [start + datetime.timedelta(x) for x in range(30)])
+
+
+class TestHttpPerformer(unittest.TestCase):
+    start = datetime.date(2017, 6, 1)
+    end = datetime.date(2017, 6, 3)
+
+    def get(self, performer, server, stream=False):
+        return sync_perform(
+            ComposedDispatcher([
+                TypeDispatcher({actions.HttpRequest: performer.perform}),
+                base_dispatcher]),
+            actions.get_redmine_info(server.url, "me", self.start, self.end,
+                                     "key", stream=stream))
+
+    def assert_three_days(self, body):
+        self.assertEqual([e.date for e in entries.parse_chunks(body)],
+                         [datetime.date(2017, 6, x) for x in (1, 2, 3)])
+
+    def test_001_keep_alive_and_gzip(self):
+        performer = actions.HttpPerformer()
+        with StubRedmineServer() as server:
+            for _ in range(3):
+                self.assert_three_days(self.get(performer, server))
+        self.assertEqual(len(set(server.client_ports)), 1)
+        self.assertTrue(all("gzip" in h["Accept-Encoding"]
+                            for h in server.headers))
+
+    def test_002_stream(self):
+        performer = actions.HttpPerformer()
+        with StubRedmineServer() as server:
+            chunks = self.get(performer, server, stream=True)
+            self.assertNotIsInstance(chunks, str)
+            self.assert_three_days(chunks)
+
+    def test_003_retry_5xx(self):
+        performer = actions.HttpPerformer(backoff_factor=0.0)
+        with StubRedmineServer(failures=2) as server:
+            self.assert_three_days(self.get(performer, server))
+        self.assertEqual(len(server.queries), 3)
+
+    def test_004_give_up(self):
+        performer = actions.HttpPerformer(retries=1, backoff_factor=0.0)
+        with StubRedmineServer(failures=5) as server:
+            with self.assertRaises(requests.RequestException):
+                self.get(performer, server)
+        self.assertEqual(len(server.queries), 2)
+
+    def test_005_close_stream(self):
+        "Streamed responses are closed, even if their body isn't read"
+        performer = actions.HttpPerformer()
+        session = performer.session()
+        closed = []
+        def get(*args, **kwargs):
+            response = requests.Session.get(session, *args, **kwargs)
+            close = response.close
+            def recording_close():
+                closed.append(response)
+                close()
+            response.close = recording_close
+            return response
+        session.get = get
+        with StubRedmineServer() as server:
+            chunks = self.get(performer, server, stream=True)
+            next(chunks)
+            self.assertEqual(closed, [])
+            chunks.close()
+            self.assertEqual(len(closed), 1)
+            self.assert_three_days(self.get(performer, server, stream=True))
+            self.assertEqual(len(closed), 2)
+
+
+if __name__ == "__main__":
+    import sys
+    unittest.main(verbosity=2, exit=not hasattr(sys, "ps1"))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+import asyncio
+import contextlib
+import datetime
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from effect import Constant, Effect, Error, parallel
+
+import actions
+import aio
+import main
+from test_actions import StubRedmineServer
+
+
+def _run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class TestAsyncPerform(unittest.TestCase):
+    def test_001_result(self):
+        self.assertEqual(
+            _run(aio.async_perform(aio.ASYNC_DISPATCHER,
+                                   Effect(Constant(42)))),
+            42)
+
+    def test_002_error(self):
+        with self.assertRaisesRegex(ValueError, "oops"):
+            _run(aio.async_perform(aio.ASYNC_DISPATCHER,
+                                   Effect(Error(ValueError("oops")))))
+
+    def test_003_error_in_executor(self):
+        with self.assertRaises(FileNotFoundError):
+            _run(aio.async_perform(
+                aio.ASYNC_DISPATCHER,
+                actions.get_config_json("/does/not/exist.json")))
+
+    def test_004_parallel_requests_overlap(self):
+        start = datetime.date(2017, 6, 1)
+        with StubRedmineServer(delay=0.1) as server:
+            bodies = _run(aio.async_perform(
+                aio.ASYNC_DISPATCHER,
+                parallel([actions.get_redmine_info(
+                    server.url, "me", start, start, "key")] * 3)))
+        self.assertEqual(len(bodies), 3)
+        self.assertGreater(server.max_concurrent, 1)
+
+
+class TestAsyncMain(unittest.TestCase):
+    def test_001_team(self):
+        "End to end: read config, fetch from a stub server, print"
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+             StubRedmineServer(delay=0.05) as server:
+            config_json = os.path.join(tmp_dir, "config.json")
+            with open(config_json, "w") as fp:
+                json.dump({"api_key": "00" * 20,
+                           "host": server.url.rsplit("/", 1)[0],
+                           "team": ["1", "2", "3"],
+                           "rules": [{"weight": 0.5}]}, fp)
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                result = _run(main.async_main(
+                    ["--team", "--week", config_json, "pw"]))
+        self.assertIsNone(result)
+        self.assertGreater(server.max_concurrent, 1)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([x.split()[0] for x in lines],
+                         ["1", "2", "3", "Team"])
+        self.assertTrue(all(x.endswith(" 50.0%") for x in lines))
+
+
+if __name__ == "__main__":
+    import sys
+    unittest.main(verbosity=2, exit=not hasattr(sys, "ps1"))
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+import datetime
+import os
+import tempfile
+import unittest
+
+import archive
+import batch
+import entries
+import rules
+
+
+def _d(day):
+    return datetime.date(2017, 6, 1) + datetime.timedelta(day)
+
+
+ENTRIES = [
+    entries.TimeEntry("1234", 1.5, "Automation", "", _d(0), "ProjX"),
+    entries.TimeEntry("1234", 0.25, "Other", "stand up", _d(0), "ProjX"),
+    entries.TimeEntry("5", 2.0, "Other", "réunion ☕", _d(3)),
+    # Not sorted by date: negative delta
+    entries.TimeEntry("7", 4.0, "Automation", "x" * 300, _d(1), "ProjY"),
+    entries.TimeEntry("8", 1.0, "Automation", "", _d(400)),
+]
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, "entries.rste")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_001_round_trip(self):
+        self.assertEqual(archive.write(self.filename, iter(ENTRIES)), 5)
+        self.assertEqual(archive.load(self.filename), ENTRIES)
+        self.assertFalse(os.path.exists(self.filename + ".tmp"))
+
+    def test_002_empty(self):
+        archive.write(self.filename, [])
+        self.assertEqual(archive.load(self.filename), [])
+
+    def test_003_dictionaries(self):
+        archive.write(self.filename, ENTRIES)
+        with archive.open_archive(self.filename) as a:
+            self.assertEqual(len(a), 5)
+            self.assertEqual(a.categories, ["Automation", "Other"])
+            self.assertEqual(a.issue_ids, ["1234", "5", "7", "8"])
+            self.assertEqual(a.projects, ["ProjX", "", "ProjY"])
+            self.assertEqual(list(a.category_codes), [0, 1, 1, 0, 0])
+            self.assertEqual(list(a.day_deltas), [0, 0, 3, -2, 399])
+            # Dates of a day are shared
+            loaded = list(a.entries())
+            self.assertIs(loaded[0].date, loaded[1].date)
+
+    def test_004_many_distinct_values(self):
+        time_entries = [entries.TimeEntry(str(x), 1.0, "C{}".format(x % 300),
+                                          "", _d(x % 3 * 40000))
+                        for x in range(70000)]
+        archive.write(self.filename, time_entries)
+        with archive.open_archive(self.filename) as a:
+            self.assertEqual(a.issue_codes.format, "I")
+            self.assertEqual(a.category_codes.format, "H")
+            self.assertEqual(a.day_deltas.format, "i")
+            self.assertEqual(list(a.entries()), time_entries)
+
+    def test_005_size(self):
+        archive.write(self.filename, ENTRIES * 1000)
+        with archive.open_archive(self.filename) as a:
+            self.assertEqual(a.day_deltas.format, "h")
+            self.assertEqual(a.issue_codes.format, "B")
+        # 17 bytes per entry (2 for the delta, 8 for the duration, 3 for
+        # the codes and 4 for the comment's offset) and the comments
+        comments_size = 1000 * sum(len(e.comment.encode("utf-8"))
+                                   for e in ENTRIES)
+        self.assertLess(os.path.getsize(self.filename),
+                        5000 * 17 + comments_size + 400)
+
+    def test_006_columns(self):
+        archive.write(self.filename, ENTRIES)
+        for rule_list in (
+                rules.parse_rules({"rules": [{"issue_id": "7", "weight": 1.0},
+                                             {"project": "ProjX", "weight": 1.0},
+                                             {"weight": 0.0}]}),
+                rules.parse_rules({"rules": [{"comment": "up", "weight": 1.0},
+                                             {"weight": 0.0}]})):
+            selector = rules.SelectRuleUsingCompiledRules()
+            expected = batch.Columns.from_entries(rule_list, ENTRIES, selector)
+            with archive.open_archive(self.filename) as a:
+                actual = a.columns(rule_list, selector)
+            self.assertEqual(actual.day, expected.day)
+            self.assertEqual(actual.duration, expected.duration)
+            self.assertEqual(actual.rule_index, expected.rule_index)
+
+    def test_007_not_an_archive(self):
+        for content in (b"", b"Date,Issue\n", b"RSTE\x02\x00" + bytes(26)):
+            with open(self.filename, "wb") as fp:
+                fp.write(content)
+            with self.assertRaises(archive.ArchiveError):
+                archive.load(self.filename)
+
+    def test_008_truncated(self):
+        archive.write(self.filename, ENTRIES)
+        with open(self.filename, "rb") as fp:
+            content = fp.read()
+        with open(self.filename, "wb") as fp:
+            fp.write(content[:-40])
+        with self.assertRaises(archive.ArchiveError):
+            archive.load(self.filename)
+
+
+if __name__ == "__main__":
+    import sys
+    unittest.main(verbosity=2, exit=not hasattr(sys, "ps1"))
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+import datetime
+import random
+import unittest
+
+import batch
+import entries
+import main
+import rules
+
+
+def _random_entries(rnd, count):
+    start = datetime.date(2016, 2, 20)
+    return [entries.TimeEntry(rnd.choice(("1", "2", "3")),
+                              rnd.randrange(0, 17) / 2.0,
+                              rnd.choice(("Automation", "Other")),
+                              "",
+                              start + datetime.timedelta(rnd.randrange(20)))
+            for _ in range(count)]
+
+
+class TestColumns(unittest.TestCase):
+    def test_001_from_entries(self):
+        rulz = [rules.MatchIssueID("1", 1.0), rules.MatchAny(0.5)]
+        entrz = [entries.TimeEntry("1", 2.0, "Other", "", "2017-07-29"),
+                 entries.TimeEntry("2", 3.0, "Other", "", "2017-07-30")]
+        columns = batch.Columns.from_entries(
+            rulz, entrz, rules.SelectRuleUsingIndex())
+        self.assertEqual(len(columns), 2)
+        self.assertEqual(list(columns.day),
+                         [datetime.date(2017, 7, 29).toordinal(),
+                          datetime.date(2017, 7, 30).toordinal()])
+        self.assertEqual(list(columns.duration), [2.0, 3.0])
+        self.assertEqual(list(columns.rule_index), [0, 1])
+
+
+class TestEvaluate(unittest.TestCase):
+    def assert_same_as_RuleEvaluator(self, rulz, entrz):
+        expected = rules.RuleEvaluator(
+            rules.SelectRuleUsingTheirMatchMethod(),
+            main.StampedHoursAccumulator).satisfaction(rulz, entrz)
+        actual = main.StampedHoursAccumulator.from_daily_sums(
+            batch.evaluate(rulz, entrz, rules.SelectRuleUsingIndex()))
+        self.assertEqual(actual.period_start(), expected.period_start())
+        self.assertEqual(actual.period_end(), expected.period_end())
+        for a, b in zip(actual.period_data(), expected.period_data()):
+            self.assertAlmostEqual(a, b)
+        self.assertEqual(len(actual.period_data()),
+                         len(expected.period_data()))
+        self.assertAlmostEqual(actual.period_hours_accumulator().good,
+                               expected.period_hours_accumulator().good)
+        self.assertAlmostEqual(actual.period_hours_accumulator().total,
+                               expected.period_hours_accumulator().total)
+
+    def test_001_no_entries(self):
+        sums = batch.evaluate([rules.MatchAny(1.0)], [],
+                              rules.SelectRuleUsingIndex())
+        self.assertEqual(len(sums.seen), 0)
+        self.assert_same_as_RuleEvaluator([rules.MatchAny(1.0)], [])
+
+    def test_002_random_entries(self):
+        rnd = random.Random(6)
+        rulz = [rules.MatchIssueID("1", 1.0),
+                rules.MatchCategory("Automation", 0.75),
+                rules.MatchAny(0.0)]
+        for count in (1, 5, 50):
+            self.assert_same_as_RuleEvaluator(rulz,
+                                              _random_entries(rnd, count))
+
+    def test_003_without_numpy(self):
+        "The Python loop computes the same sums as numpy.bincount"
+        rnd = random.Random(8)
+        rulz = [rules.MatchIssueID("1", 1.0),
+                rules.MatchCategory("Automation", 0.75),
+                rules.MatchAny(0.0)]
+        columns = batch.Columns.from_entries(
+            rulz, _random_entries(rnd, 200), rules.SelectRuleUsingIndex())
+        weights = [r.weight for r in rulz]
+        expected = batch._daily_sums_loop(columns, weights)
+        actual = batch.daily_sums(columns, weights)
+        self.assertEqual(actual.first_day, expected.first_day)
+        self.assertEqual(actual.seen, expected.seen)
+        for a, b in ((actual.good, expected.good),
+                     (actual.total, expected.total)):
+            self.assertEqual(len(a), len(b))
+            for x, y in zip(a, b):
+                self.assertAlmostEqual(x, y)
+
+    def test_004_stats(self):
+        rnd = random.Random(7)
+        rulz = [rules.MatchIssueID("1", 1.0), rules.MatchAny(0.0)]
+        entrz = _random_entries(rnd, 30)
+        expected = rules.EvaluationStats()
+        rules.RuleEvaluator(rules.SelectRuleUsingIndex(),
+                            main.StampedHoursAccumulator,
+                            expected).satisfaction(rulz, entrz)
+        stats = rules.EvaluationStats()
+        batch.evaluate(rulz, entrz, rules.SelectRuleUsingIndex(), stats)
+        self.assertEqual(stats.selections, 30)
+        self.assertEqual(stats.matches(), expected.matches())
+
+
+if __name__ == "__main__":
+    import sys
+    unittest.main(verbosity=2, exit=not hasattr(sys, "ps1"))
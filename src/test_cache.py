@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+import datetime
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import cache
+import entries
+
+
+def _d(day):
+    return datetime.date(2017, 6, day)
+
+
+class TestRangesToFetch(unittest.TestCase):
+    def test_001_nothing_cached(self):
+        self.assertEqual(cache.ranges_to_fetch(set(), _d(1), _d(30)),
+                         [(_d(1), _d(30))])
+
+    def test_002_everything_cached(self):
+        self.assertEqual(cache.ranges_to_fetch(
+            {_d(x) for x in range(1, 31)}, _d(1), _d(30)), [])
+
+    def test_003_holes(self):
+        cached = {_d(x) for x in range(1, 31) if x not in (2, 3, 10, 30)}
+        self.assertEqual(cache.ranges_to_fetch(cached, _d(1), _d(30)),
+                         [(_d(2), _d(3)), (_d(10), _d(10)), (_d(30), _d(30))])
+
+
+class TestLoadStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, "cache.sqlite")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def make_entries(self, *days):
+        return [entries.TimeEntry(str(day), day / 2.0, "Other", "c", _d(day),
+                                  "P{}".format(day % 2))
+                for day in days]
+
+    def test_001_empty(self):
+        with cache.open_cache(self.filename) as conn:
+            self.assertEqual(cache.load(conn, "h", "u", _d(1), _d(30)),
+                             (set(), []))
+
+    def test_002_round_trip(self):
+        with cache.open_cache(self.filename) as conn:
+            cache.store(conn, "h", "u", _d(1), _d(5),
+                        self.make_entries(1, 2, 2, 4))
+        with cache.open_cache(self.filename) as conn:
+            days, cached = cache.load(conn, "h", "u", _d(2), _d(10))
+        self.assertEqual(days, {_d(x) for x in range(2, 6)})
+        self.assertEqual(cached, self.make_entries(2, 2, 4))
+
+    def test_003_store_replaces_range(self):
+        with cache.open_cache(self.filename) as conn:
+            cache.store(conn, "h", "u", _d(1), _d(5),
+                        self.make_entries(1, 2, 4))
+            cache.store(conn, "h", "u", _d(4), _d(6), self.make_entries(6))
+            days, cached = cache.load(conn, "h", "u", _d(1), _d(30))
+        self.assertEqual(days, {_d(x) for x in range(1, 7)})
+        self.assertEqual(cached, self.make_entries(1, 2, 6))
+
+    def test_004_keyed_by_host_and_user(self):
+        with cache.open_cache(self.filename) as conn:
+            cache.store(conn, "h", "u", _d(1), _d(1), self.make_entries(1))
+            self.assertEqual(cache.load(conn, "h", "v", _d(1), _d(1)),
+                             (set(), []))
+            self.assertEqual(cache.load(conn, "g", "u", _d(1), _d(1)),
+                             (set(), []))
+
+    def test_005_older_schema_is_dropped(self):
+        conn = sqlite3.connect(self.filename)
+        conn.executescript(
+            "CREATE TABLE fetched_days (host, user, day);"
+            "INSERT INTO fetched_days VALUES ('h', 'u', {});".format(
+                _d(1).toordinal()))
+        conn.close()
+        with cache.open_cache(self.filename) as conn:
+            self.assertEqual(cache.load(conn, "h", "u", _d(1), _d(1)),
+                             (set(), []))
+            cache.store(conn, "h", "u", _d(1), _d(1), self.make_entries(1))
+        with cache.open_cache(self.filename) as conn:
+            self.assertEqual(cache.load(conn, "h", "u", _d(1), _d(1)),
+                             ({_d(1)}, self.make_entries(1)))
+
+
+if __name__ == "__main__":
+    import sys
+    unittest.main(verbosity=2, exit=not hasattr(sys, "ps1"))
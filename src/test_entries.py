@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
+import csv
 import datetime
+import sys
 import unittest
 
 import entries
@@ -72,6 +74,35 @@ class TestTimeEntry(unittest.TestCase):
     def test_100_create_valid_TimeEntry(self):
         entries.TimeEntry("12345", 8.0, "Automation", "comment", "2017-07-24")
 
+    def test_101_slots(self):
+        e = entries.TimeEntry("12345", 8.0, "Automation", "", "2017-07-24")
+        self.assertFalse(hasattr(e, "__dict__"))
+
+    def test_102_trusted(self):
+        "The trusted constructor skips validation but builds equal entries"
+        self.assertEqual(
+            entries.TimeEntry.trusted("12345", 8.0, "Automation", "c",
+                                      datetime.date(2017, 7, 24)),
+            entries.TimeEntry("12345", 8.0, "Automation", "c", "2017-07-24"))
+        # No validation at all
+        self.assertEqual(entries.TimeEntry.trusted(1, 2, 3, 4, 5).date, 5)
+
+
+class TestParseDate(unittest.TestCase):
+    def test_001_iso_date(self):
+        self.assertEqual(entries._parse_date("2017-07-03"),
+                         datetime.date(2017, 7, 3))
+
+    def test_002_like_strptime(self):
+        "Formats strptime accepts are still accepted"
+        self.assertEqual(entries._parse_date("2017-7-3"),
+                         datetime.date(2017, 7, 3))
+
+    def test_003_invalid(self):
+        for x in ("1234", "1234-56-78", "2017-+7-03", "2017/07/03"):
+            with self.assertRaises(ValueError):
+                entries._parse_date(x)
+
 
 class TestParseFrom(unittest.TestCase):
     def assert_missing_column(self, s, col):
@@ -108,7 +139,147 @@ class TestParseFrom(unittest.TestCase):
                 2.0,
                 "Design",
                 "Done that",
-                datetime.date(2017, 7, 31)))
+                datetime.date(2017, 7, 31),
+                "project"))
+
+    def test_008_dates_are_shared(self):
+        e1, e2 = entries.parse_from(
+            'Project,User,Activity,Hours,Date,Issue,Comment\n'
+            'p,u,Design,2.00,2017-07-31,Task #1: Do,\n'
+            'p,u,Design,1.00,2017-07-31,Task #2: Do,\n')
+        self.assertIs(e1.date, e2.date)
+
+    def test_009_invalid_rows(self):
+        "Rows failing validation raise the TimeEntry validators' errors"
+        header = 'Project,User,Activity,Hours,Date,Issue,Comment\n'
+        for row, param in (
+                ('p,u,Design,-2.00,2017-07-31,Task #1: Do,\n', "duration"),
+                ('p,u, ,2.00,2017-07-31,Task #1: Do,\n', "category"),
+                ('p,u,Design,2.00,2017-31-07,Task #1: Do,\n', "date")):
+            with self.assertRaisesRegex((TypeError, ValueError), param):
+                next(entries.parse_from(header + row))
+
+
+    def test_010_project_is_optional(self):
+        e, = entries.parse_from(
+            'User,Activity,Hours,Date,Issue,Comment\n'
+            'u,Design,2.00,2017-07-31,Task #1: Do,\n')
+        self.assertEqual(e.project, "")
+
+    def test_011_line_endings_and_quotes(self):
+        "Quoted fields and CRLF line endings parse as with csv.reader"
+        text = ('Project,User,Activity,Hours,Date,Issue,Comment\n'
+                'p,u,Design,2.00,2017-07-31,Task #1: Do,\n'
+                '"p, q",u,Design,1.00,2017-07-31,"Task #2: A, B","x\ny"\n')
+        crlf = text.replace("\n", "\r\n")
+        self.assertEqual(list(entries.parse_from(crlf))[0],
+                         list(entries.parse_from(text))[0])
+        # Like csv.reader given lines without their separator
+        self.assertEqual(list(entries.parse_from(crlf))[1].comment, "x\ry")
+        self.assertEqual(
+            [(e.issue_id, e.project, e.comment)
+             for e in entries.parse_from(text)],
+            [("1", "p", ""), ("2", "p, q", "xy")])
+
+
+class TestValuePool(unittest.TestCase):
+    CSV = ('Project,User,Activity,Hours,Date,Issue,Comment\n'
+           'p,u,Design,2.00,2017-07-31,Task #1: Do,standup\n'
+           'p,u,Design,1.00,2017-07-31,Task #1: Do it,standup\n')
+
+    def test_001_shared_values(self):
+        e1, e2 = entries.parse_from(self.CSV)
+        for field in ("issue_id", "category", "project", "comment", "date"):
+            self.assertIs(getattr(e1, field), getattr(e2, field))
+        # Interned: the same objects as the rules' values
+        self.assertIs(e1.category, sys.intern("".join(["Des", "ign"])))
+
+    def test_002_shared_between_parses(self):
+        pool = entries.ValuePool()
+        e1, _ = entries.parse_chunks(self.CSV, pool=pool)
+        e2, _ = entries.parse_chunks(self.CSV, pool=pool)
+        self.assertIs(e1.date, e2.date)
+        self.assertIs(e1.comment, e2.comment)
+
+    def test_003_max_comments(self):
+        pool = entries.ValuePool(max_comments=0)
+        e1, e2 = entries.parse_chunks(self.CSV, pool=pool)
+        self.assertEqual(e1.comment, e2.comment)
+        self.assertIsNot(e1.comment, e2.comment)
+        self.assertEqual(pool.comments, {})
+
+
+class TestTokenizer(unittest.TestCase):
+    "Rows split without csv.reader give the same entries"
+    def test_001_same_as_csv_reader(self):
+        lines = ["Activity,Issue,Hours,Date,Comment,Project,Custom,Other",
+                 "Design,Task #1: Do,1.00,2017-07-31,c,p,x,y",
+                 "Design,Task #1: Do,1.00,2017-07-31,c,p,x",
+                 "Design,Task #1: Do,1.00,2017-07-31,c,p",
+                 "",
+                 'Design,"Task #2: A, B",2.00,2017-07-31,"""q""",p,x,y',
+                 'Design,Task #3: C,3.00,2017-08-01,"multi',
+                 'line",p,"x,y",z',
+                 "Design,Task #4: D,4.00,2017-08-01,c,p,x,y\r",
+                 "Design,Task #5: E,5.00,2017-08-01,,,,",
+                 'Design,Task #6: F,6.00,2017-08-01,x"y,p,x,y,z']
+        expected = [
+            entries.TimeEntry(entries._EXTRACT_ISSUE_ID.match(row[1]).group(1),
+                              float(row[2]), row[0], row[4], row[3], row[5])
+            for row in csv.reader(lines[1:]) if len(row) >= 8]
+        self.assertEqual(len(expected), 6)
+        self.assertEqual(list(entries.parse_from("\n".join(lines))),
+                         expected)
+
+    def test_002_extract_issue_id(self):
+        "Same issue numbers as the regex, and the same errors"
+        for cell in ("Task #12: Title", "Bug #3: C", "Task #12: ",
+                     "A b #77: c #8: d", "Task #1: two\nlines", " #5: x"):
+            self.assertEqual(entries._extract_issue_id(cell),
+                             entries._EXTRACT_ISSUE_ID.match(cell).group(1))
+        for cell in ("", "Task 12", "Task#12: x", "Task #12:x", "Task #: x",
+                     "#12: x", "Task #\u0661: x", "Task #12 : x",
+                     "A#1 #2: x"):
+            self.assertIsNone(entries._EXTRACT_ISSUE_ID.match(cell))
+            with self.assertRaises(AttributeError):
+                entries._extract_issue_id(cell)
+
+
+class TestParseChunks(unittest.TestCase):
+    CSV = ('Project,User,Activity,Hours,Date,Issue,Comment\n'
+           'project,user,Design,2.00,2017-07-31,Task #71869: Do this,Done that\n'
+           'project,user,Other,1.50,2017-08-01,"Task #12: A, B",Caf\u00e9\n'
+           'project,user,Design,0.50,2017-08-02,Bug #3: C,"two\nlines"\n')
+
+    def assert_same_as_parse_from(self, chunks):
+        self.assertEqual(list(entries.parse_chunks(chunks)),
+                         list(entries.parse_from(self.CSV)))
+
+    def test_001_single_str(self):
+        self.assertEqual(len(list(entries.parse_chunks(self.CSV))), 3)
+        self.assert_same_as_parse_from(self.CSV)
+
+    def test_002_str_chunks(self):
+        for size in (1, 2, 7, 64):
+            self.assert_same_as_parse_from(
+                self.CSV[idx:idx + size]
+                for idx in range(0, len(self.CSV), size))
+
+    def test_003_bytes_chunks(self):
+        "Multi-byte characters may be split across chunks"
+        data = self.CSV.encode("utf-8")
+        for size in (1, 3, 64):
+            self.assert_same_as_parse_from(
+                data[idx:idx + size] for idx in range(0, len(data), size))
+
+    def test_004_lazy(self):
+        "Entries are yielded before the following chunks are read"
+        def chunks():
+            yield self.CSV.split("\n", 2)[0] + "\n"
+            yield self.CSV.split("\n", 2)[1] + "\n"
+            raise AssertionError("read too far")
+        self.assertEqual(next(entries.parse_chunks(chunks())).issue_id,
+                         "71869")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+import datetime
+import gzip
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import archive
+import batch
+import entries
+import ingest
+import rules
+
+CSV = """Date,Comment,Hours,Activity,Issue,Project
+2017-06-20,,1.00,Other,Task #280: Automation ProjX,P1
+2017-06-21,réunion,2.50,Automation,Task #318: User Story 1,P2
+2017-06-22,,8.00,Other,Task #295: TRAINING,P1
+"""
+ENTRIES = list(entries.parse_from(CSV))
+
+
+class TestIngest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir.name, name)
+
+    def write(self, name, content, opener=open):
+        with opener(self.path(name), "wb") as fp:
+            fp.write(content)
+        return self.path(name)
+
+    def test_001_plain_gzip_and_archive(self):
+        plain = self.write("a.csv", CSV.encode("utf-8"))
+        compressed = self.write("b.csv.gz", CSV.encode("utf-8"), gzip.open)
+        archived = self.path("c.rste")
+        archive.write(archived, ENTRIES)
+        for filename in (plain, compressed, archived):
+            self.assertEqual(ingest.read_file(filename), ENTRIES)
+
+    def test_002_memory_mapped(self):
+        content = CSV.encode("utf-8") + b"".join(
+            "2017-07-{:02},,1.00,Other,Task #{}: x,P3\n".format(
+                x % 28 + 1, x).encode("utf-8")
+            for x in range(2000))
+        filename = self.write("big.csv", content)
+        with mock.patch.object(ingest, "MMAP_THRESHOLD", 1000), \
+             mock.patch.object(ingest, "CHUNK_SIZE", 333):
+            mapped = ingest.read_file(filename)
+        self.assertEqual(mapped, list(entries.parse_from(content)))
+        self.assertEqual(len(mapped), 2003)
+
+    def test_003_empty_file(self):
+        self.assertEqual(ingest.read_file(self.write("empty.csv", b"")), [])
+
+    def test_004_expand_paths(self):
+        for name in ("b.csv", "a.csv.gz", "c.rste", "notes.txt"):
+            self.write(name, b"")
+        os.mkdir(self.path("sub.csv"))
+        self.assertEqual(
+            ingest.expand_paths([self.tmp_dir.name, "other.csv"]),
+            [self.path("a.csv.gz"), self.path("b.csv"), self.path("c.rste"),
+             "other.csv"])
+
+    def test_005_read_files_in_processes(self):
+        filenames = [self.write("{}.csv".format(x), CSV.encode("utf-8"))
+                     for x in range(3)]
+        self.assertEqual(ingest.read_files(filenames, 2), [ENTRIES] * 3)
+        self.assertEqual(ingest.read_files(filenames), [ENTRIES] * 3)
+        with self.assertRaises(ValueError):
+            ingest.read_files(filenames, 0)
+
+    def test_006_read_files_columns(self):
+        "Archives and exports give the same columns"
+        rule_list = rules.parse_rules({"rules": [
+            {"project": "P2", "weight": 1.0}, {"weight": 0.5}]})
+        plain = self.write("a.csv", CSV.encode("utf-8"))
+        archived = self.path("b.rste")
+        archive.write(archived, ENTRIES)
+        expected = batch.Columns.from_entries(
+            rule_list, ENTRIES, rules.SelectRuleUsingIndex())
+        for jobs in (1, 2):
+            for columns in ingest.read_files_columns([plain, archived],
+                                                     rule_list, jobs):
+                self.assertEqual(columns.day, expected.day)
+                self.assertEqual(columns.duration, expected.duration)
+                self.assertEqual(columns.rule_index, expected.rule_index)
+
+
+if __name__ == "__main__":
+    import sys
+    unittest.main(verbosity=2, exit=not hasattr(sys, "ps1"))
@@ -1,14 +1,22 @@
 import datetime
 import io
+import os
 import sys
+import tempfile
+import tracemalloc
 import unittest
 
 from typing import Any
 
-from effect import sync_perform, sync_performer, ComposedDispatcher, base_dispatcher, TypeDispatcher
+from effect import sync_perform, sync_performer, ComposedDispatcher, base_dispatcher, TypeDispatcher, ParallelEffects
 
 import actions
+import archive
+import batch
+import entries
 import main
+import profiling
+import rules
 
 class BaseAccumulatorTestMixin():
     """Add this class to your C{TestCase}: easily define Accumulator unittests
@@ -93,6 +101,9 @@ class TestHoursAccumulator(unittest.TestCase, BaseAccumulatorTestMixin):
         self.assertAlmostEqual(self.make_data_2().satisfaction(), 0.75)
         self.assertAlmostEqual(self.make_data_3().satisfaction(), 0.833333333)
 
+    def test_011_slots(self):
+        self.assertFalse(hasattr(self.make_data_1(), "__dict__"))
+
 
 class TestStampedHoursAccumulator(unittest.TestCase, BaseAccumulatorTestMixin):
     Acc = main.StampedHoursAccumulator
@@ -113,9 +124,10 @@ class TestStampedHoursAccumulator(unittest.TestCase, BaseAccumulatorTestMixin):
         return result
 
     def assert_accumulator_equal(self, a, b):
-        self.assertEqual(len(a.cal), len(b.cal))
-        for when, hours_acc in a.cal.items():
-            _assert_accumulator_equal(self, hours_acc, b.cal[when])
+        a_days, b_days = dict(a.days()), dict(b.days())
+        self.assertEqual(len(a_days), len(b_days))
+        for when, hours_acc in a_days.items():
+            _assert_accumulator_equal(self, hours_acc, b_days[when])
 
     def test_010_period_start(self):
         self.assertEqual(self.make_data_1().period_start(),
@@ -172,6 +184,121 @@ class TestStampedHoursAccumulator(unittest.TestCase, BaseAccumulatorTestMixin):
         self.assertTrue(data[5] < 0.0 or data[5] > 1.0)  #  3 Mar
         self.assertAlmostEqual(data[6], 0.4)             #  4 Mar
 
+    def test_014_period_data_bounds(self):
+        acc = self.make_data_3()
+        self.assertEqual(
+            acc.period_data(datetime.date(2016, 12, 30),
+                            datetime.date(2017, 1, 3)),
+            [-1.0, -1.0, 7.0 / 8.0, 5.0 / 6.0, -1.0])
+        self.assertEqual(acc.period_data(datetime.date(2017, 2, 1),
+                                         datetime.date(2017, 2, 2)),
+                         [-1.0, -1.0])
+        self.assertEqual(self.Acc.neutral().period_data(), [])
+
+    def test_015_grow_both_ways(self):
+        "Days may be added before and after the period, years apart"
+        acc = self.Acc.neutral()
+        rule = rules.MatchAny(0.5)
+        dates = ["2017-06-01", "2017-05-01", "2027-06-01", "2007-06-01",
+                 "2017-06-01"]
+        for when in dates:
+            acc.add_entry(rule, entries.TimeEntry("1", 2.0, "Other", "", when))
+        self.assertEqual(acc.period_start(), datetime.date(2007, 6, 1))
+        self.assertEqual(acc.period_end(), datetime.date(2027, 6, 1))
+        self.assertEqual([str(when) for when, _ in acc.days()],
+                         sorted(set(dates)))
+        _assert_accumulator_equal(self, main.HoursAccumulator(5.0, 10.0),
+                                  acc.period_hours_accumulator())
+        _assert_accumulator_equal(self, main.HoursAccumulator(2.0, 4.0),
+                                  dict(acc.days())[datetime.date(2017, 6, 1)])
+
+    def test_016_forget(self):
+        acc = self.make_data_2()
+        acc.forget(datetime.date(2016, 1, 2))
+        acc.forget(datetime.date(2017, 2, 1))
+        acc.forget(datetime.date(2020, 1, 1))
+        self.assertEqual(acc.period_start(), datetime.date(2017, 1, 1))
+        self.assertEqual(acc.period_end(), datetime.date(2017, 1, 2))
+        _assert_accumulator_equal(self, main.HoursAccumulator(6.75, 9.25),
+                                  acc.period_hours_accumulator())
+        acc.forget(datetime.date(2017, 1, 1))
+        acc.forget(datetime.date(2017, 1, 2))
+        self.assertIsNone(acc.period_start())
+        self.assertEqual(acc.period_data(), [])
+
+    def test_017_negated_and_json(self):
+        acc = self.make_data_2()
+        self.assert_accumulator_equal(
+            acc, self.Acc.from_json(acc.to_json()))
+        acc.update(acc.negated())
+        _assert_accumulator_equal(self, main.HoursAccumulator.neutral(),
+                                  acc.period_hours_accumulator())
+
+
+class TestAddEntry(unittest.TestCase):
+    rule = rules.MatchAny(0.25)
+    entrz = [entries.TimeEntry("1", 2.0, "Other", "", "2017-07-29"),
+             entries.TimeEntry("2", 4.0, "Other", "", "2017-07-30"),
+             entries.TimeEntry("3", 8.0, "Other", "", "2017-07-29")]
+
+    def accumulate_both_ways(self, Acc):
+        in_place = Acc.neutral()
+        merged = Acc.neutral()
+        for entry in self.entrz:
+            in_place.add_entry(self.rule, entry)
+            merged.update(Acc.from_rule_and_entry(self.rule, entry))
+        return in_place, merged
+
+    def test_001_HoursAccumulator(self):
+        _assert_accumulator_equal(
+            self, *self.accumulate_both_ways(main.HoursAccumulator))
+
+    def test_002_StampedHoursAccumulator(self):
+        a, b = self.accumulate_both_ways(main.StampedHoursAccumulator)
+        a_days, b_days = dict(a.days()), dict(b.days())
+        self.assertEqual(sorted(a_days), sorted(b_days))
+        for when in a_days:
+            _assert_accumulator_equal(self, a_days[when], b_days[when])
+
+    def test_003_allocations_do_not_grow_with_input(self):
+        "Peak memory while evaluating doesn't depend on the entry count"
+        rulz = [rules.MatchIssueID("2", 1.0), rules.MatchAny(0.5)]
+        evaluator = rules.RuleEvaluator(rules.SelectRuleUsingIndex(),
+                                        main.StampedHoursAccumulator)
+
+        def peak(count):
+            entrz = self.entrz * count
+            tracemalloc.start()
+            try:
+                evaluator.satisfaction(rulz, entrz)
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        peak(1)  # warm up any lazily initialized state
+        self.assertLess(peak(10000) - peak(100), 1024)
+
+    def test_004_zero_hours(self):
+        """A day with only 0 hour entries has no data
+
+        add_entry and the columns engine behave like merging
+        from_rule_and_entry results."""
+        entrz = [entries.TimeEntry("1", 0.0, "Other", "", "2017-06-01"),
+                 entries.TimeEntry("2", 2.0, "Other", "", "2017-06-03"),
+                 entries.TimeEntry("3", 0.0, "Other", "", "2017-06-03")]
+        rulz = [rules.MatchAny(1.0)]
+        in_place = main.StampedHoursAccumulator.neutral()
+        merged = main.StampedHoursAccumulator.neutral()
+        for entry in entrz:
+            in_place.add_entry(rulz[0], entry)
+            merged.update(main.StampedHoursAccumulator.from_rule_and_entry(
+                rulz[0], entry))
+        columns = main.StampedHoursAccumulator.from_daily_sums(
+            batch.evaluate(rulz, entrz, rules.SelectRuleUsingIndex()))
+        for acc in (in_place, merged, columns):
+            self.assertEqual(acc.period_start(), datetime.date(2017, 6, 3))
+            self.assertEqual(acc.period_data(), [1.0])
+
 
 class SilenceStdoutStderrMixin:
     def setUp(self):
@@ -230,6 +357,20 @@ class TestArgParse(SilenceStdoutStderrMixin, unittest.TestCase):
                     ["dummy", "xor", "extra"] + ["extra"] * n)
 
 
+class TestTeam(unittest.TestCase):
+    def test_001_get_team(self):
+        self.assertEqual(main.get_team({"team": [12.0, "34"]}), ["12", "34"])
+
+    def test_002_aligned_period_data(self):
+        acc = main.StampedHoursAccumulator(datetime.date(2017, 1, 2), 1.0, 2.0)
+        data = acc.period_data(datetime.date(2017, 1, 1),
+                               datetime.date(2017, 1, 3))
+        self.assertEqual(len(data), 3)
+        self.assertTrue(data[0] < 0.0 or data[0] > 1.0)
+        self.assertAlmostEqual(data[1], 0.5)
+        self.assertTrue(data[2] < 0.0 or data[2] > 1.0)
+
+
 class TestMain(SilenceStdoutStderrMixin, unittest.TestCase):
     class MockIO:
         today = datetime.date(2017, 6, 30)
@@ -310,6 +451,7 @@ class TestMain(SilenceStdoutStderrMixin, unittest.TestCase):
         self.assertIs(result, None)
         self.assertEqual(mock_io.get_today_calls, 1)
         self.assertEqual(len(mock_io.http_requests), 1)
+        self.assertTrue(mock_io.http_requests[0].stream)
         self.assertEqual(len(mock_io.lines_printed), 2)
         self.assertEqual(
             mock_io.lines_printed[0],
@@ -320,6 +462,287 @@ class TestMain(SilenceStdoutStderrMixin, unittest.TestCase):
             "Global satisfaction over this period: [0-9][0-9]\\.[0-9]%",
         )
 
+    def test_profiled_run(self):
+        mock_io = self.MockIO()
+        profile = profiling.Profile()
+        sync_perform(
+            profiling.instrument_dispatcher(mock_io.dispatcher, profile),
+            main.do_main(["config.json", "pw"], profile))
+        self.assertEqual(profile.effect_counts["HttpRequest"], 1)
+        self.assertEqual(profile.effect_counts["Print"], 2)
+        self.assertEqual(profile.text_bytes, len(self.MockIO.req_res))
+        self.assertEqual(profile.rows_parsed, 25)
+        self.assertEqual(profile.stats.selections, 25)
+        self.assertEqual([count for _, count in profile.stats.matches()],
+                         [13, 1, 11])
+        self.assertEqual(
+            set(profile.stage_seconds),
+            {"parse", "evaluate (including parse)", "render"})
+
+    def test_team_run(self):
+        mock_io = self.MockIO()
+        mock_io.config = dict(mock_io.config, team=[12.0, "34", "me"])
+        dispatcher = ComposedDispatcher([
+            mock_io.dispatcher,
+            TypeDispatcher({
+                ParallelEffects: actions.perform_parallel_effects})])
+        result = sync_perform(
+            dispatcher, main.do_main(["--team", "config.json", "password"]))
+        self.assertIs(result, None)
+        self.assertEqual(
+            sorted(r.params["v[user_id][]"] for r in mock_io.http_requests),
+            ["12", "34", "me"])
+        self.assertEqual(len(mock_io.lines_printed), 4)
+        graph = ('2017-06-17\u2595\u2581   \u2584\u2586\u2588\u2588'
+                 '\u2591\u2591\u2587\u2588\u2588\u2588\u258f2017-06-30')
+        for label, line in zip(["12  ", "34  ", "me  ", "Team"],
+                               mock_io.lines_printed):
+            self.assertRegex(line, "^{} {} [0-9][0-9]\\.[0-9]%$".format(
+                label, graph))
+
+    def test_team_without_team_key(self):
+        "A configuration without team is a usage error, not a KeyError"
+        with self.assertRaises(SystemExit):
+            sync_perform(self.MockIO().dispatcher, main.do_main(
+                ["--team", "config.json", "pw"]))
+
+    def test_team_and_windows(self):
+        with self.assertRaises(SystemExit):
+            sync_perform(self.MockIO().dispatcher, main.do_main(
+                ["--team", "--window-days", "3", "config.json", "pw"]))
+
+    def test_columns_engine_errors(self):
+        "The columns engine only reads --input files"
+        for args in (["--engine", "columns"],
+                     ["--engine", "columns", "--input", "x.csv",
+                      "--save-archive", "x.rste"]):
+            with self.assertRaises(SystemExit):
+                sync_perform(self.MockIO().dispatcher,
+                             main.do_main(args + ["config.json", "pw"]))
+
+    def test_parallel_evaluation(self):
+        mock_io = self.MockIO()
+        sync_perform(mock_io.dispatcher, main.do_main(["config.json", "pw"]))
+        parallel_io = self.MockIO()
+        sync_perform(parallel_io.dispatcher, main.do_main(
+            ["--jobs", "2", "config.json", "pw"]))
+        self.assertEqual(parallel_io.lines_printed, mock_io.lines_printed)
+
+    def test_windowed_run(self):
+        "Each window returns the same entries: ratios are unchanged"
+        eff = main.do_main(["--window-days", "10", "config.json", "password"])
+        mock_io = self.MockIO()
+        dispatcher = ComposedDispatcher([
+            mock_io.dispatcher,
+            TypeDispatcher({
+                ParallelEffects: actions.perform_parallel_effects})])
+        result = sync_perform(dispatcher, eff)
+        self.assertIs(result, None)
+        # 2017-05-30 .. 2017-06-30 is 32 days
+        self.assertEqual(len(mock_io.http_requests), 4)
+        self.assertFalse(any(r.stream for r in mock_io.http_requests))
+        self.assertEqual(
+            mock_io.lines_printed[0],
+            '2017-06-17\u2595\u2581   \u2584\u2586\u2588\u2588\u2591\u2591\u2587\u2588\u2588\u2588\u258f2017-06-30',
+        )
+        for window_days in ("0", "-1"):
+            with self.assertRaises(SystemExit):
+                sync_perform(self.MockIO().dispatcher, main.do_main(
+                    ["--window-days", window_days, "config.json", "pw"]))
+
+    def test_rollup_run(self):
+        "Rollups are printed after the graph"
+        mock_io = self.MockIO()
+        sync_perform(mock_io.dispatcher, main.do_main(
+            ["--rollup", "week", "--rollup", "month:rule", "config.json",
+             "pw"]))
+        self.assertEqual(len(mock_io.http_requests), 1)
+        self.assertEqual(mock_io.lines_printed[2:], [
+            "Satisfaction per week:",
+            "2017-W24      6.7%    15.00h",
+            "2017-W25     54.4%    45.00h",
+            "2017-W26     96.9%    32.00h",
+            "Satisfaction per month and rule:",
+            "2017-06    MatchAny(weight=0.0)                                0.0%    35.50h",
+            "2017-06    MatchCategory(category='Automation', weight=1.0)  100.0%    48.50h",
+            "2017-06    MatchIssueID(issue_id='295', weight=1.0)          100.0%     8.00h",
+        ])
+        plain = self.MockIO()
+        sync_perform(plain.dispatcher, main.do_main(["config.json", "pw"]))
+        self.assertEqual(mock_io.lines_printed[:2], plain.lines_printed)
+
+    def test_rollup_errors(self):
+        for args in (["--rollup", "year"],
+                     ["--rollup", "week", "--team"],
+                     ["--rollup", "week", "--engine", "columns", "--input",
+                      "x.csv"]):
+            with self.assertRaises(SystemExit):
+                sync_perform(self.MockIO().dispatcher,
+                             main.do_main(args + ["config.json", "pw"]))
+
+    def test_save_archive(self):
+        "The fetched entries are archived and the output is unchanged"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            archive_file = os.path.join(tmp_dir, "entries.rste")
+            mock_io = self.MockIO()
+            dispatcher = ComposedDispatcher([
+                mock_io.dispatcher,
+                TypeDispatcher({
+                    actions.WriteArchive: actions.perform_write_archive})])
+            sync_perform(dispatcher, main.do_main(
+                ["--save-archive", archive_file, "config.json", "pw"]))
+            archived = archive.load(archive_file)
+        plain = self.MockIO()
+        sync_perform(plain.dispatcher, main.do_main(["config.json", "pw"]))
+        self.assertEqual(mock_io.lines_printed, plain.lines_printed)
+        self.assertEqual(archived,
+                         list(entries.parse_from(self.MockIO.req_res)))
+        for args in (["--team"], ["--snapshot", "snapshot.json"]):
+            with self.assertRaises(SystemExit):
+                sync_perform(self.MockIO().dispatcher, main.do_main(
+                    args + ["--save-archive", "x.rste", "config.json", "pw"]))
+
+    def test_input_run(self):
+        "Entries are read from the files, Redmine isn't queried"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for name in ("1.csv", "2.csv"):
+                with open(os.path.join(tmp_dir, name), "w",
+                          encoding="utf-8") as fp:
+                    fp.write(self.MockIO.req_res)
+            mock_io = self.MockIO()
+            dispatcher = ComposedDispatcher([
+                mock_io.dispatcher,
+                TypeDispatcher({
+                    actions.ReadEntryFiles: actions.perform_read_entry_files,
+                })])
+            sync_perform(dispatcher, main.do_main(
+                ["--input", tmp_dir, "--jobs", "2", "config.json", "pw"]))
+        self.assertEqual(mock_io.http_requests, [])
+        # Every entry twice: the ratios are unchanged
+        plain = self.MockIO()
+        sync_perform(plain.dispatcher, main.do_main(["config.json", "pw"]))
+        self.assertEqual(mock_io.lines_printed, plain.lines_printed)
+        for args in (["--team"], ["--cache", "cache.sqlite"],
+                     ["--jobs", "0"]):
+            with self.assertRaises(SystemExit):
+                sync_perform(self.MockIO().dispatcher, main.do_main(
+                    args + ["--input", "x.csv", "config.json", "pw"]))
+
+    def test_input_columns_run(self):
+        "With --engine columns, the files are read straight into columns"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with open(os.path.join(tmp_dir, "1.csv"), "w",
+                      encoding="utf-8") as fp:
+                fp.write(self.MockIO.req_res)
+            archive.write(os.path.join(tmp_dir, "2.rste"),
+                          entries.parse_from(self.MockIO.req_res))
+            mock_io = self.MockIO()
+            profile = profiling.Profile()
+            dispatcher = ComposedDispatcher([
+                mock_io.dispatcher,
+                TypeDispatcher({
+                    actions.ReadEntryColumns:
+                    actions.perform_read_entry_columns,
+                })])
+            sync_perform(
+                profiling.instrument_dispatcher(dispatcher, profile),
+                main.do_main(["--input", tmp_dir, "--engine", "columns",
+                              "config.json", "pw"], profile))
+        self.assertEqual(mock_io.http_requests, [])
+        self.assertEqual(profile.effect_counts["ReadEntryColumns"], 1)
+        self.assertEqual(profile.stats.selections, 50)
+        plain = self.MockIO()
+        sync_perform(plain.dispatcher, main.do_main(["config.json", "pw"]))
+        self.assertEqual(mock_io.lines_printed, plain.lines_printed)
+
+    def test_cached_run(self):
+        "The second run only fetches the days still open"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_file = os.path.join(tmp_dir, "cache.sqlite")
+            args = ["--cache", cache_file, "--cache-open-days", "3",
+                    "config.json", "password"]
+            runs = []
+            for _ in range(2):
+                mock_io = self.MockIO()
+                dispatcher = ComposedDispatcher([
+                    mock_io.dispatcher,
+                    TypeDispatcher({
+                        actions.ReadCache: actions.perform_read_cache,
+                        actions.WriteCache: actions.perform_write_cache})])
+                sync_perform(dispatcher, main.do_main(args))
+                runs.append(mock_io)
+        first, second = runs
+        self.assertEqual(
+            [r.params["v[spent_on][]"] for r in first.http_requests],
+            [["2017-05-30", "2017-06-30"]])
+        self.assertEqual(
+            [r.params["v[spent_on][]"] for r in second.http_requests],
+            [["2017-06-28", "2017-06-30"]])
+        # The mock ignores the date range of the request: entries of other
+        # days are dropped and read from the cache instead, so the output is
+        # unchanged.
+        self.assertEqual(first.lines_printed, second.lines_printed)
+        for args in (["--window-days", "3"], ["--cache-open-days", "-1"]):
+            with self.assertRaises(SystemExit):
+                sync_perform(self.MockIO().dispatcher, main.do_main(
+                    args + ["--cache", "cache.sqlite", "config.json", "pw"]))
+
+    def test_snapshot_run(self):
+        "The second run only refreshes the last days of the snapshot"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            snapshot_file = os.path.join(tmp_dir, "snapshot.json")
+            args = ["--snapshot", snapshot_file, "config.json", "password"]
+            runs = []
+            for _ in range(2):
+                mock_io = self.MockIO()
+                dispatcher = ComposedDispatcher([
+                    mock_io.dispatcher,
+                    TypeDispatcher({
+                        actions.ReadSnapshot: actions.perform_read_snapshot,
+                        actions.WriteSnapshot: actions.perform_write_snapshot,
+                    })])
+                sync_perform(dispatcher, main.do_main(args))
+                runs.append(mock_io)
+        first, second = runs
+        self.assertEqual(
+            [r.params["v[spent_on][]"] for r in first.http_requests],
+            [["2017-05-30", "2017-06-30"]])
+        self.assertEqual(
+            [r.params["v[spent_on][]"] for r in second.http_requests],
+            [["2017-06-24", "2017-06-30"]])
+        self.assertEqual(first.lines_printed, second.lines_printed)
+        plain = self.MockIO()
+        sync_perform(plain.dispatcher, main.do_main(["config.json", "pw"]))
+        self.assertEqual(first.lines_printed, plain.lines_printed)
+
+    def test_snapshot_backdated_entries(self):
+        "Entries added or edited on the previous days reach the snapshot"
+        backdated = self.MockIO.req_res.replace(
+            "2017-06-28,,1.00,Automation,Task #781: Integrate awesome lib\n",
+            "2017-06-28,,1.00,Other,Task #781: Integrate awesome lib\n"
+            "2017-06-29,,4.00,Other,Task #442: Scope\n")
+        self.assertNotEqual(backdated, self.MockIO.req_res)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            snapshot_file = os.path.join(tmp_dir, "snapshot.json")
+            runs = []
+            for req_res in (self.MockIO.req_res, backdated):
+                mock_io = self.MockIO()
+                mock_io.req_res = req_res
+                dispatcher = ComposedDispatcher([
+                    mock_io.dispatcher,
+                    TypeDispatcher({
+                        actions.ReadSnapshot: actions.perform_read_snapshot,
+                        actions.WriteSnapshot: actions.perform_write_snapshot,
+                    })])
+                sync_perform(dispatcher, main.do_main(
+                    ["--snapshot", snapshot_file, "config.json", "pw"]))
+                runs.append(mock_io.lines_printed)
+        plain = self.MockIO()
+        plain.req_res = backdated
+        sync_perform(plain.dispatcher, main.do_main(["config.json", "pw"]))
+        self.assertNotEqual(runs[0], runs[1])
+        self.assertEqual(runs[1], plain.lines_printed)
+
 
 if __name__ == "__main__":
     import sys
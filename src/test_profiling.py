@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+import json
+import unittest
+
+from effect import (
+    ComposedDispatcher, Effect, TypeDispatcher, base_dispatcher, sync_perform,
+    sync_performer)
+
+import actions
+import profiling
+import rules
+
+
+@sync_performer
+def _perform_http_request(dispatcher, req):
+    if req.stream:
+        return iter([b"abc", "déf"])
+    else:
+        return "abc"
+
+
+_DISPATCHER = ComposedDispatcher([
+    TypeDispatcher({actions.HttpRequest: _perform_http_request}),
+    base_dispatcher])
+
+
+class TestInstrumentDispatcher(unittest.TestCase):
+    def test_001_unknown_intent(self):
+        dispatcher = profiling.instrument_dispatcher(
+            _DISPATCHER, profiling.Profile())
+        self.assertIsNone(dispatcher(object()))
+
+    def test_002_count_effects_and_bytes(self):
+        profile = profiling.Profile()
+        dispatcher = profiling.instrument_dispatcher(_DISPATCHER, profile)
+        self.assertEqual(
+            sync_perform(dispatcher, Effect(actions.HttpRequest("url"))),
+            "abc")
+        chunks = sync_perform(
+            dispatcher, Effect(actions.HttpRequest("url", stream=True)))
+        self.assertEqual(profile.text_bytes, 3)
+        self.assertEqual(list(chunks), [b"abc", "déf"])
+        self.assertEqual(profile.text_bytes, 3 + 3 + 4)
+        self.assertEqual(profile.effect_counts["HttpRequest"], 2)
+        self.assertGreaterEqual(profile.effect_seconds["HttpRequest"], 0.0)
+
+
+class TestProfile(unittest.TestCase):
+    def test_001_count_rows(self):
+        profile = profiling.Profile()
+        self.assertEqual(list(profile.count_rows(range(5))), list(range(5)))
+        self.assertEqual(profile.rows_parsed, 5)
+        self.assertIn("parse", profile.stage_seconds)
+
+    def test_002_null_profile(self):
+        profile = profiling.NullProfile()
+        rows = [1, 2]
+        self.assertIs(profile.count_rows(rows), rows)
+        self.assertIsNone(profile.stats)
+        with profile.timed("stage"):
+            pass
+
+    def test_003_format(self):
+        profile = profiling.Profile()
+        rulz = [rules.MatchAny(1.0)]
+        profile.stats.rules = rulz
+        profile.stats.rule_matches[id(rulz[0])] = 3
+        profile.stats.merges = 2
+        with profile.timed("render"):
+            pass
+        d = json.loads(profile.format("json"))
+        self.assertEqual(d["rule_matches"],
+                         [{"rule": repr(rulz[0]), "matches": 3}])
+        self.assertEqual(d["accumulator_merges"], 2)
+        self.assertIn("render", d["stages"])
+        table = profile.format("table")
+        self.assertIn("render", table)
+        self.assertIn("MatchAny", table)
+
+
+if __name__ == "__main__":
+    import sys
+    unittest.main(verbosity=2, exit=not hasattr(sys, "ps1"))
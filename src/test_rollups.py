@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+import datetime
+import pickle
+import unittest
+
+import entries
+import main
+import rollups
+import rules
+
+RULES = rules.parse_rules({"rules": [{"category": "Automation", "weight": 1.0},
+                                     {"issue_id": "295", "weight": 0.5},
+                                     {"weight": 0.0}]})
+
+ENTRIES = [entries.TimeEntry(issue_id, duration, category, "", when)
+           for (issue_id, duration, category, when) in (
+                   ("1", 2.0, "Automation", "2015-12-31"),
+                   ("295", 4.0, "Other", "2016-01-01"),
+                   ("2", 1.0, "Other", "2016-01-03"),
+                   ("1", 3.0, "Automation", "2016-01-04"),
+                   ("295", 2.0, "Automation", "2016-02-01"))]
+
+
+def _d(*args):
+    return datetime.date(*args)
+
+
+class TestRollup(unittest.TestCase):
+    def test_001_parse(self):
+        self.assertEqual(rollups.Rollup.parse("week"),
+                         rollups.Rollup("week", None))
+        self.assertEqual(rollups.Rollup.parse("month:rule"),
+                         rollups.Rollup("month", "rule"))
+        self.assertEqual(str(rollups.Rollup.parse("day:issue")), "day:issue")
+
+    def test_002_parse_errors(self):
+        with self.assertRaisesRegex(ValueError, "resolution 'year'"):
+            rollups.Rollup.parse("year")
+        with self.assertRaisesRegex(ValueError, "key 'user'"):
+            rollups.Rollup.parse("week:user")
+
+
+class TestRollupAccumulator(unittest.TestCase):
+    ROLLUPS = [rollups.Rollup("week"),
+               rollups.Rollup("month", "rule"),
+               rollups.Rollup("day", "category"),
+               rollups.Rollup("month", "issue")]
+
+    def evaluate(self, time_entries):
+        return rules.RuleEvaluator(
+            rules.SelectRuleUsingIndex(),
+            rollups.RollupAccumulator.configure(self.ROLLUPS,
+                                                main.StampedHoursAccumulator),
+        ).satisfaction(RULES, time_entries)
+
+    def test_001_tables(self):
+        acc = self.evaluate(ENTRIES)
+        week, month_rule, day_category, month_issue = acc.tables
+        self.assertEqual(week, {(_d(2015, 12, 28), ""): [4.0, 7.0],
+                                (_d(2016, 1, 4), ""): [3.0, 3.0],
+                                (_d(2016, 2, 1), ""): [2.0, 2.0]})
+        self.assertEqual(month_rule, {
+            (_d(2015, 12, 1), repr(RULES[0])): [2.0, 2.0],
+            (_d(2016, 1, 1), repr(RULES[1])): [2.0, 4.0],
+            (_d(2016, 1, 1), repr(RULES[2])): [0.0, 1.0],
+            (_d(2016, 1, 1), repr(RULES[0])): [3.0, 3.0],
+            (_d(2016, 2, 1), repr(RULES[0])): [2.0, 2.0]})
+        self.assertEqual(len(day_category), 5)
+        self.assertEqual(month_issue[(_d(2016, 1, 1), "295")], [2.0, 4.0])
+
+    def test_002_daily(self):
+        acc = self.evaluate(ENTRIES)
+        expected = rules.RuleEvaluator(
+            rules.SelectRuleUsingIndex(),
+            main.StampedHoursAccumulator).satisfaction(RULES, ENTRIES)
+        self.assertEqual(acc.daily.to_json(), expected.to_json())
+
+    def test_003_monoid(self):
+        "Merging the rollups of parts gives the rollups of the whole"
+        whole = self.evaluate(ENTRIES)
+        merged = self.evaluate(ENTRIES[3:])
+        merged.update(self.evaluate(ENTRIES[:3]))
+        self.assertEqual(merged.tables, whole.tables)
+        neutral = whole.neutral()
+        neutral.update(whole)
+        self.assertEqual(neutral.tables, whole.tables)
+        one = whole.from_rule_and_entry(RULES[2], ENTRIES[2])
+        self.assertEqual(one.tables[0], {(_d(2015, 12, 28), ""): [0.0, 1.0]})
+
+    def test_004_update_other_rollups(self):
+        acc = self.evaluate(ENTRIES)
+        other = rollups.RollupAccumulator.configure(
+            [rollups.Rollup("day")], main.StampedHoursAccumulator)()
+        with self.assertRaises(ValueError):
+            acc.update(other)
+
+    def test_005_format(self):
+        acc = self.evaluate(ENTRIES)
+        self.assertEqual(acc.format(self.ROLLUPS[0]),
+                         ["2015-W53     57.1%     7.00h",
+                          "2016-W01    100.0%     3.00h",
+                          "2016-W05    100.0%     2.00h"])
+        self.assertEqual(acc.format(self.ROLLUPS[3]),
+                         ["2015-12    1    100.0%     2.00h",
+                          "2016-01    1    100.0%     3.00h",
+                          "2016-01    2      0.0%     1.00h",
+                          "2016-01    295   50.0%     4.00h",
+                          "2016-02    295  100.0%     2.00h"])
+        empty = rollups.RollupAccumulator.configure(
+            [rollups.Rollup("day")], main.StampedHoursAccumulator)()
+        self.assertEqual(empty.format(rollups.Rollup("day")), [])
+
+    def test_006_configure(self):
+        "Configured classes are shared and survive pickling"
+        cls = rollups.RollupAccumulator.configure(
+            self.ROLLUPS, main.StampedHoursAccumulator)
+        self.assertIs(cls, rollups.RollupAccumulator.configure(
+            tuple(self.ROLLUPS), main.StampedHoursAccumulator))
+        self.assertIs(pickle.loads(pickle.dumps(cls)), cls)
+        acc = self.evaluate(ENTRIES)
+        self.assertEqual(pickle.loads(pickle.dumps(acc)).tables, acc.tables)
+        with self.assertRaisesRegex(TypeError, "configure"):
+            rollups.RollupAccumulator.neutral()
+
+    def test_007_parallel(self):
+        expected = self.evaluate(ENTRIES)
+        stats = rules.EvaluationStats()
+        acc = rules.ParallelRuleEvaluator(
+            rules.SelectRuleUsingIndex(),
+            rollups.RollupAccumulator.configure(self.ROLLUPS,
+                                                main.StampedHoursAccumulator),
+            max_workers=2, chunk_size=2,
+            stats=stats).satisfaction(RULES, ENTRIES)
+        self.assertEqual(acc.tables, expected.tables)
+        self.assertEqual(acc.daily.to_json(), expected.daily.to_json())
+        self.assertEqual(stats.merges, (len(ENTRIES) + 1) // 2)
+
+
+if __name__ == "__main__":
+    import sys
+    unittest.main(verbosity=2, exit=not hasattr(sys, "ps1"))
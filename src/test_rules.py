@@ -1,14 +1,19 @@
 #!/usr/bin/env python3
+import datetime
+import pickle
+import random
 import unittest
 
 import attr
 
+import batch
 import entries
 import rules
 
 def _make_TimeEntry(issue_id="12345", duration=1.0, category="Test",
-                    comment="", date="2017-07-26"):
-    return entries.TimeEntry(issue_id, duration, category, comment, date)
+                    comment="", date="2017-07-26", project=""):
+    return entries.TimeEntry(
+        issue_id, duration, category, comment, date, project)
 
 
 class TestMatchIssueID(unittest.TestCase):
@@ -98,6 +103,75 @@ class _DummyAccumulator(rules.Accumulator):
         return cls([(rule, entry)])
 
 
+class TestRicherRules(unittest.TestCase):
+    def test_001_comment(self):
+        rule = rules.MatchComment("stand ?up", 0.5)
+        self.assertEqual(rule.match(_make_TimeEntry(comment="daily standup")),
+                         0.5)
+        self.assertIsNone(rule.match(_make_TimeEntry(comment="review")))
+        with self.assertRaisesRegex(ValueError, "comment"):
+            rules.MatchComment("(unbalanced", 0.5)
+
+    def test_002_issue_range(self):
+        rule = rules.MatchIssueRange(["100", 199.0], 1.0)
+        self.assertEqual(rule.issue_range, (100, 199))
+        for issue_id, expected in (("99", None), ("100", 1.0), ("150", 1.0),
+                                   ("199", 1.0), ("200", None)):
+            self.assertEqual(rule.match(_make_TimeEntry(issue_id=issue_id)),
+                             expected)
+        for invalid in ([2, 1], [1], ["a", "b"], [1.5, 2], "1-2"):
+            with self.assertRaisesRegex(ValueError, "issue_range"):
+                rules.MatchIssueRange(invalid, 1.0)
+
+    def test_003_issue_set(self):
+        rule = rules.MatchIssueSet(["3", "1", "2", "1"], 1.0)
+        self.assertEqual(rule.issue_ids, ("1", "2", "3"))
+        self.assertEqual(rule.match(_make_TimeEntry(issue_id="2")), 1.0)
+        self.assertIsNone(rule.match(_make_TimeEntry(issue_id="4")))
+        with self.assertRaisesRegex(ValueError, "issue_ids"):
+            rules.MatchIssueSet([1, 2], 1.0)
+
+    def test_004_project(self):
+        rule = rules.MatchProject("ProjX", 1.0)
+        self.assertEqual(rule.match(_make_TimeEntry(project="ProjX")), 1.0)
+        self.assertIsNone(rule.match(_make_TimeEntry(project="ProjY")))
+
+    def test_005_date_range(self):
+        rule = rules.MatchDateRange(["2017-07-01", "2017-07-31"], 0.0)
+        self.assertEqual(rule.date_range, (datetime.date(2017, 7, 1),
+                                           datetime.date(2017, 7, 31)))
+        self.assertEqual(rule.match(_make_TimeEntry(date="2017-07-31")), 0.0)
+        self.assertIsNone(rule.match(_make_TimeEntry(date="2017-08-01")))
+        for invalid in (["2017-08-01", "2017-07-01"], ["2017-07-01"],
+                        ["2017-07-01", "tomorrow"]):
+            with self.assertRaisesRegex(ValueError, "date_range"):
+                rules.MatchDateRange(invalid, 1.0)
+
+    def test_006_rule_fields(self):
+        self.assertEqual(rules.rule_fields([]), ())
+        self.assertEqual(
+            rules.rule_fields([rules.MatchIssueRange([1, 2], 1.0),
+                               rules.MatchProject("P", 1.0),
+                               rules.MatchAny(0.0)]),
+            ("issue_id", "project"))
+        self.assertEqual(set(rules.rule_fields([_MatchComment("c", 1.0)])),
+                         set(rules.Rule.fields))
+
+    def test_007_values_are_interned(self):
+        "Rule values are the same objects as parsed entries' values"
+        e, = entries.parse_from("Project,Activity,Hours,Date,Issue,Comment\n"
+                                "ProjX,Design,1.0,2017-07-31,Task #71: A,\n")
+        rule_list = rules.parse_rules({"rules": [
+            {"issue_id": "".join(["7", "1"]), "weight": 1.0},
+            {"issue_ids": ["".join(["7", "1"])], "weight": 1.0},
+            {"category": "".join(["Des", "ign"]), "weight": 1.0},
+            {"project": "".join(["Proj", "X"]), "weight": 1.0}]})
+        self.assertIs(rule_list[0].issue_id, e.issue_id)
+        self.assertIs(rule_list[1].issue_ids[0], e.issue_id)
+        self.assertIs(rule_list[2].category, e.category)
+        self.assertIs(rule_list[3].project, e.project)
+
+
 class TestRuleEvaluator(unittest.TestCase):
     def test_001_create_RuleEvaluator(self):
         "RuleEvaluator validates its `selector' parameter"
@@ -146,6 +220,466 @@ class TestRuleEvaluator(unittest.TestCase):
         self.assertEqual([(rulz[0], entrz[0])],
                          evaluator.satisfaction(rulz, entrz).x)
 
+    def test_006_selector_without_bind(self):
+        "Selectors only need a `select' method"
+        class SelectFirst(object):
+            def select(self, rules, entry):
+                return rules[0]
+        rulz = [rules.MatchAny(1.0), rules.MatchAny(0.5)]
+        entrz = [entries.TimeEntry("12345", 1.0, "Other", "", "2017-07-29")]
+        evaluator = rules.RuleEvaluator(SelectFirst(), _DummyAccumulator)
+        self.assertEqual([(rulz[0], entrz[0])],
+                         evaluator.satisfaction(rulz, entrz).x)
+        columns = batch.Columns.from_entries(rulz, entrz, SelectFirst())
+        self.assertEqual(list(columns.rule_index), [0])
+
+
+class _MatchComment(rules.Rule):
+    "A rule type unknown to the index"
+    def __init__(self, comment, weight):
+        self.comment = comment
+        self.weight = weight
+
+    def match(self, e):
+        return self.weight if e.comment == self.comment else None
+
+
+def _random_rules(rnd, issue_ids, categories, comments):
+    result = []
+    for _ in range(rnd.randrange(1, 30)):
+        kind = rnd.random()
+        weight = rnd.choice((0.0, 0.5, 1.0))
+        if kind < 0.45:
+            result.append(rules.MatchIssueID(rnd.choice(issue_ids), weight))
+        elif kind < 0.85:
+            result.append(rules.MatchCategory(rnd.choice(categories), weight))
+        elif kind < 0.95:
+            result.append(_MatchComment(rnd.choice(comments), weight))
+        else:
+            result.append(rules.MatchAny(weight))
+    if rnd.random() < 0.9:
+        result.append(rules.MatchAny(rnd.choice((0.0, 1.0))))
+    return result
+
+
+class TestSelectRuleUsingIndex(unittest.TestCase):
+    def assert_same_selection(self, rulz, entry, selector):
+        try:
+            expected = rules.SelectRuleUsingTheirMatchMethod().select(
+                rulz, entry)
+        except StopIteration:
+            with self.assertRaises(StopIteration):
+                selector.select(rulz, entry)
+        else:
+            self.assertIs(selector.select(rulz, entry), expected)
+
+    def test_001_same_as_match_method(self):
+        "Property: both selectors pick the same rule for random inputs"
+        rnd = random.Random(20170729)
+        issue_ids = [str(x) for x in range(10)]
+        categories = ["Automation", "Design", "Other", "Planning"]
+        comments = ["", "standup", "review"]
+        for _ in range(300):
+            rulz = _random_rules(rnd, issue_ids, categories, comments)
+            selector = rules.SelectRuleUsingIndex()
+            for _ in range(20):
+                entry = _make_TimeEntry(issue_id=rnd.choice(issue_ids),
+                                        category=rnd.choice(categories),
+                                        comment=rnd.choice(comments))
+                self.assert_same_selection(rulz, entry, selector)
+
+    def test_002_rules_change(self):
+        "The index is rebuilt when other rules are passed"
+        selector = rules.SelectRuleUsingIndex()
+        entry = _make_TimeEntry(issue_id="1", category="Design")
+        first = [rules.MatchIssueID("1", 1.0), rules.MatchAny(0.0)]
+        second = [rules.MatchCategory("Design", 0.5), rules.MatchAny(0.0)]
+        self.assertIs(selector.select(first, entry), first[0])
+        self.assertIs(selector.select(second, entry), second[0])
+
+    def test_003_use_in_RuleEvaluator(self):
+        rulz = [rules.MatchIssueID("65432", 0.9),
+                rules.MatchCategory("Automation", 1.0),
+                rules.MatchAny(0.5)]
+        entrz = [_make_TimeEntry(issue_id="65432", category="Automation"),
+                 _make_TimeEntry(issue_id="1", category="Automation"),
+                 _make_TimeEntry(issue_id="1", category="Other")]
+        evaluator = rules.RuleEvaluator(rules.SelectRuleUsingIndex(),
+                                        _DummyAccumulator)
+        self.assertEqual(list(zip(rulz, entrz)),
+                         evaluator.satisfaction(rulz, entrz).x)
+
+
+class TestSelectRuleUsingCompiledRules(TestSelectRuleUsingIndex):
+    def test_001_same_as_match_method(self):
+        "Property: compiled rules pick the same rule for random inputs"
+        rnd = random.Random(20171018)
+        issue_ids = [str(x) for x in range(10)]
+        categories = ["Automation", "Design", "Other", "Planning"]
+        comments = ["", "standup", "review"]
+        for n in range(400):
+            rulz = _random_rules(rnd, issue_ids, categories, comments)
+            if n % 4:
+                # Rules of known types only get specialized functions
+                rulz = [r for r in rulz if not isinstance(r, _MatchComment)]
+            if n % 4 == 2:
+                rulz = [r for r in rulz if not isinstance(r, rules.MatchCategory)]
+            if n % 4 == 3:
+                rulz = [r for r in rulz if not isinstance(r, rules.MatchIssueID)]
+            selector = rules.SelectRuleUsingCompiledRules()
+            for _ in range(20):
+                entry = _make_TimeEntry(issue_id=rnd.choice(issue_ids),
+                                        category=rnd.choice(categories),
+                                        comment=rnd.choice(comments))
+                self.assert_same_selection(rulz, entry, selector)
+
+    def test_002_rules_change(self):
+        selector = rules.SelectRuleUsingCompiledRules()
+        entry = _make_TimeEntry(issue_id="1", category="Design")
+        first = [rules.MatchIssueID("1", 1.0), rules.MatchAny(0.0)]
+        second = [rules.MatchCategory("Design", 0.5), rules.MatchAny(0.0)]
+        self.assertIs(selector.select(first, entry), first[0])
+        self.assertIs(selector.select(second, entry), second[0])
+
+    def test_003_use_in_RuleEvaluator(self):
+        rulz = [rules.MatchIssueID("65432", 0.9),
+                rules.MatchCategory("Automation", 1.0),
+                rules.MatchAny(0.5)]
+        entrz = [_make_TimeEntry(issue_id="65432", category="Automation"),
+                 _make_TimeEntry(issue_id="1", category="Automation"),
+                 _make_TimeEntry(issue_id="1", category="Other")]
+        evaluator = rules.RuleEvaluator(rules.SelectRuleUsingCompiledRules(),
+                                        _DummyAccumulator)
+        self.assertEqual(list(zip(rulz, entrz)),
+                         evaluator.satisfaction(rulz, entrz).x)
+
+    def test_004_cache(self):
+        "Compiled once per rules, but equal rules give their own objects"
+        rulz = rules.parse_rules({"rules": [{"category": "Design",
+                                             "weight": 1.0},
+                                            {"weight": 0.0}]})
+        same = rules.parse_rules({"rules": [{"category": "Design",
+                                             "weight": 1.0},
+                                            {"weight": 0.0}]})
+        self.assertEqual(rules.rules_key(rulz), rules.rules_key(same))
+        self.assertIs(rules.compile_rules(rulz), rules.compile_rules(rulz))
+        self.assertIs(rules.compile_rules(rulz),
+                      rules.compile_rules(list(rulz)))
+        entry = _make_TimeEntry(category="Design")
+        self.assertIs(rules.compile_rules(same)(entry), same[0])
+        self.assertIs(rules.compile_rules(rulz)(entry), rulz[0])
+
+    def test_005_cache_reused_rules(self):
+        "Rules the compiled function can't return don't have their ids reused"
+        issue = rules.MatchIssueID("1", 1.0)
+        default = rules.MatchAny(0.0)
+        entry = _make_TimeEntry(issue_id="2", category="Dev")
+        for _ in range(100):
+            # The second rule for issue 1 can never be selected
+            rules.compile_rules([issue, rules.MatchIssueID("1", 0.5),
+                                 default])
+            rulz = [issue, rules.MatchCategory("Dev", 0.25), default]
+            self.assertIs(rules.compile_rules(rulz)(entry), rulz[1])
+
+
+def _random_rich_rules(rnd, issue_numbers, categories, projects, patterns,
+                       days):
+    result = []
+    for _ in range(rnd.randrange(1, 30)):
+        kind = rnd.randrange(9)
+        weight = rnd.choice((0.0, 0.5, 1.0))
+        if kind == 0:
+            result.append(rules.MatchIssueID(
+                str(rnd.choice(issue_numbers)), weight))
+        elif kind == 1:
+            result.append(rules.MatchIssueSet(
+                [str(x) for x in rnd.sample(issue_numbers, 3)], weight))
+        elif kind == 2:
+            first = rnd.choice(issue_numbers)
+            result.append(rules.MatchIssueRange(
+                [first, first + rnd.randrange(5)], weight))
+        elif kind == 3:
+            result.append(rules.MatchCategory(rnd.choice(categories), weight))
+        elif kind == 4:
+            result.append(rules.MatchProject(rnd.choice(projects), weight))
+        elif kind in (5, 6):
+            result.append(rules.MatchComment(rnd.choice(patterns), weight))
+        elif kind == 7:
+            first = rnd.choice(days)
+            result.append(rules.MatchDateRange(
+                [first, first + datetime.timedelta(rnd.randrange(5))],
+                weight))
+        elif rnd.random() < 0.3:
+            result.append(rules.MatchAny(weight))
+    if rnd.random() < 0.8:
+        result.append(rules.MatchAny(rnd.choice((0.0, 1.0))))
+    return result
+
+
+class TestRuleEngine(TestSelectRuleUsingIndex):
+    "Compiled rules of all the types, see rules._RuleEngine"
+    def random_selections(self, patterns, seed):
+        rnd = random.Random(seed)
+        issue_numbers = list(range(10))
+        categories = ["Automation", "Design", "Other"]
+        projects = ["", "ProjX", "ProjY"]
+        comments = ["", "daily standup", "Code review", "review of standup",
+                    "stand up"]
+        days = [datetime.date(2017, 7, x) for x in range(1, 15)]
+        for _ in range(300):
+            rulz = _random_rich_rules(rnd, issue_numbers, categories,
+                                      projects, patterns, days)
+            selector = rules.SelectRuleUsingCompiledRules()
+            for _ in range(20):
+                entry = _make_TimeEntry(
+                    issue_id=str(rnd.choice(issue_numbers + [99])),
+                    category=rnd.choice(categories),
+                    comment=rnd.choice(comments),
+                    date=rnd.choice(days),
+                    project=rnd.choice(projects))
+                self.assert_same_selection(rulz, entry, selector)
+
+    def test_001_same_as_match_method(self):
+        "Property: the combined regular expression is used"
+        self.random_selections(["standup", "^review", "stand ?up$", "view"],
+                               20171019)
+
+    def test_002_patterns_with_groups_or_flags(self):
+        "Property: patterns that can't be combined are searched in turn"
+        self.random_selections(["(stand) ?up", "(?i)REVIEW", "^$", "view"],
+                               20171020)
+
+    def test_003_overlapping_ranges(self):
+        rulz = [rules.MatchIssueRange([10, 20], 0.5),
+                rules.MatchIssueRange([5, 30], 1.0),
+                rules.MatchIssueRange([15, 15], 0.0),
+                rules.MatchIssueID("40", 0.5)]
+        select = rules.compile_rules(rulz)
+        for issue_id, expected in (("5", 1), ("10", 0), ("15", 0), ("20", 0),
+                                   ("21", 1), ("30", 1), ("40", 3)):
+            self.assertIs(select(_make_TimeEntry(issue_id=issue_id)),
+                          rulz[expected])
+        for issue_id in ("4", "31", "not a number"):
+            with self.assertRaises(StopIteration):
+                select(_make_TimeEntry(issue_id=issue_id))
+
+
+class TestParseRicherRules(unittest.TestCase):
+    def test_001_all_kinds(self):
+        config = {"rules": [
+            {"comment": "standup", "weight": 0.0},
+            {"issue_ids": ["3", "4"], "weight": 1.0},
+            {"issue_range": [100.0, 199.0], "weight": 1.0},
+            {"project": "ProjX", "weight": 0.5},
+            {"date_range": ["2017-12-24", "2017-12-26"], "weight": 0.0,
+             "_comment": "Christmas"},
+            {"weight": 0.0}]}
+        self.assertEqual(rules.parse_rules(config), [
+            rules.MatchComment("standup", 0.0),
+            rules.MatchIssueSet(["3", "4"], 1.0),
+            rules.MatchIssueRange([100, 199], 1.0),
+            rules.MatchProject("ProjX", 0.5),
+            rules.MatchDateRange([datetime.date(2017, 12, 24),
+                                  datetime.date(2017, 12, 26)], 0.0),
+            rules.MatchAny(0.0)])
+
+
+class _CountingSelector(rules.Selector):
+    def __init__(self):
+        self.calls = 0
+
+    def select(self, rulz, entry):
+        self.calls += 1
+        return rules.SelectRuleUsingTheirMatchMethod().select(rulz, entry)
+
+
+class TestCachingSelector(unittest.TestCase):
+    rulz = [rules.MatchIssueID("1", 0.9),
+            rules.MatchCategory("Automation", 1.0),
+            rules.MatchAny(0.5)]
+
+    def test_001_same_rules_as_wrapped_selector(self):
+        selector = rules.CachingSelector(rules.SelectRuleUsingIndex())
+        for issue_id in ("1", "2", "1", "2"):
+            for category in ("Automation", "Other"):
+                entry = _make_TimeEntry(issue_id=issue_id, category=category)
+                self.assertIs(
+                    selector.select(self.rulz, entry),
+                    rules.SelectRuleUsingTheirMatchMethod().select(
+                        self.rulz, entry))
+        self.assertEqual(selector.cache_info(),
+                         rules.CacheInfo(hits=4, misses=4, maxsize=4096,
+                                         currsize=4))
+
+    def test_002_wrapped_selector_called_once_per_key(self):
+        wrapped = _CountingSelector()
+        selector = rules.CachingSelector(wrapped)
+        for comment in ("a", "b", "c"):
+            selector.select(self.rulz, _make_TimeEntry(comment=comment))
+        self.assertEqual(wrapped.calls, 1)
+        self.assertEqual((selector.hits, selector.misses), (2, 1))
+
+    def test_003_lru_eviction(self):
+        wrapped = _CountingSelector()
+        selector = rules.CachingSelector(wrapped, maxsize=2)
+        for issue_id in ("1", "2", "1", "3", "1", "2"):
+            selector.select(self.rulz, _make_TimeEntry(issue_id=issue_id))
+        # "2" was evicted by "3" because "1" had been used more recently
+        self.assertEqual(wrapped.calls, 4)
+        self.assertEqual(selector.cache_info().currsize, 2)
+
+    def test_004_cleared_when_rules_change(self):
+        selector = rules.CachingSelector(rules.SelectRuleUsingIndex())
+        entry = _make_TimeEntry(issue_id="1")
+        other_rules = [rules.MatchAny(0.0)]
+        self.assertIs(selector.select(self.rulz, entry), self.rulz[0])
+        self.assertIs(selector.select(other_rules, entry), other_rules[0])
+
+    def test_005_invalid_maxsize(self):
+        with self.assertRaisesRegex(ValueError, "maxsize"):
+            rules.CachingSelector(rules.SelectRuleUsingIndex(), maxsize=0)
+
+    def test_006_key_from_rules(self):
+        "By default the key has the fields the rules look at"
+        selector = rules.CachingSelector(rules.SelectRuleUsingCompiledRules())
+        rulz = [rules.MatchProject("ProjX", 1.0), rules.MatchAny(0.0)]
+        for project in ("ProjX", "ProjY", "ProjX"):
+            entry = _make_TimeEntry(project=project)
+            self.assertEqual(selector.select(rulz, entry).weight,
+                             1.0 if project == "ProjX" else 0.0)
+        self.assertEqual(selector.cache_info().misses, 2)
+        catch_all = [rules.MatchAny(0.5)]
+        for issue_id in ("1", "2"):
+            selector.select(catch_all, _make_TimeEntry(issue_id=issue_id))
+        self.assertEqual(selector.cache_info().currsize, 1)
+
+    def test_007_pickle(self):
+        "Selectors are sent to the workers of ParallelRuleEvaluator"
+        selector = rules.CachingSelector(
+            rules.SelectRuleUsingTheirMatchMethod())
+        self.assertEqual(pickle.loads(pickle.dumps(selector)).maxsize, 4096)
+        catch_all = [rules.MatchAny(0.5)]
+        selector.select(catch_all, _make_TimeEntry())
+        copy = pickle.loads(pickle.dumps(selector))
+        self.assertEqual(copy.select(catch_all, _make_TimeEntry()).weight, 0.5)
+        entrz = [_make_TimeEntry(issue_id=str(x % 3)) for x in range(10)]
+        evaluator = rules.ParallelRuleEvaluator(
+            rules.CachingSelector(rules.SelectRuleUsingCompiledRules()),
+            _DummyAccumulator, max_workers=2, chunk_size=3)
+        self.assertEqual(evaluator.satisfaction(self.rulz, entrz).x,
+                         rules.RuleEvaluator(
+                             rules.SelectRuleUsingCompiledRules(),
+                             _DummyAccumulator).satisfaction(
+                                 self.rulz, entrz).x)
+
+
+class _InPlaceAccumulator(_DummyAccumulator):
+    @classmethod
+    def from_rule_and_entry(cls, rule, entry):
+        raise AssertionError("add_entry should be used instead")
+
+    def add_entry(self, rule, entry):
+        self.x.append((rule, entry))
+
+
+class _DuckTypedAccumulator(object):
+    "Doesn't inherit rules.Accumulator's add_entry"
+    def __init__(self, x):
+        self.x = x
+
+    @classmethod
+    def neutral(cls):
+        return cls([])
+
+    def update(self, other):
+        self.x.extend(other.x)
+
+    @classmethod
+    def from_rule_and_entry(cls, rule, entry):
+        return cls([(rule, entry)])
+
+
+class TestRuleEvaluatorAddEntry(unittest.TestCase):
+    rulz = [rules.MatchIssueID("1", 1.0), rules.MatchAny(0.5)]
+    entrz = [_make_TimeEntry(issue_id="1"), _make_TimeEntry(issue_id="2")]
+    expected = [(rulz[0], entrz[0]), (rulz[1], entrz[1])]
+
+    def assert_evaluation(self, Acc):
+        evaluator = rules.RuleEvaluator(rules.SelectRuleUsingIndex(), Acc)
+        self.assertEqual(evaluator.satisfaction(self.rulz, self.entrz).x,
+                         self.expected)
+
+    def test_001_add_entry_is_used(self):
+        self.assert_evaluation(_InPlaceAccumulator)
+
+    def test_002_default_add_entry(self):
+        self.assert_evaluation(_DummyAccumulator)
+
+    def test_003_without_add_entry(self):
+        self.assert_evaluation(_DuckTypedAccumulator)
+
+    def test_004_stats(self):
+        stats = rules.EvaluationStats()
+        evaluator = rules.RuleEvaluator(rules.SelectRuleUsingIndex(),
+                                        _DummyAccumulator, stats)
+        evaluator.satisfaction(self.rulz, self.entrz * 3)
+        self.assertEqual(stats.selections, 6)
+        self.assertEqual(stats.matches(), [(self.rulz[0], 3),
+                                           (self.rulz[1], 3)])
+        self.assertEqual(stats.merges, 0)
+
+
+class TestParallelRuleEvaluator(unittest.TestCase):
+    def test_001_invalid_chunk_size(self):
+        with self.assertRaisesRegex(ValueError, "chunk_size"):
+            rules.ParallelRuleEvaluator(rules.SelectRuleUsingIndex(),
+                                        _DummyAccumulator, chunk_size=0)
+
+    def test_002_same_as_RuleEvaluator(self):
+        "Partial results are merged in the order of the entries"
+        rulz = [rules.MatchIssueID("3", 0.9),
+                rules.MatchCategory("Automation", 1.0),
+                rules.MatchAny(0.5)]
+        entrz = [_make_TimeEntry(issue_id=str(x % 5),
+                                 category=("Automation", "Other")[x % 2],
+                                 comment=str(x))
+                 for x in range(23)]
+        expected = rules.RuleEvaluator(
+            rules.SelectRuleUsingIndex(),
+            _DummyAccumulator).satisfaction(rulz, entrz).x
+        for chunk_size in (1, 4, 100):
+            evaluator = rules.ParallelRuleEvaluator(
+                rules.SelectRuleUsingIndex(), _DummyAccumulator,
+                max_workers=2, chunk_size=chunk_size)
+            self.assertEqual(
+                evaluator.satisfaction(rulz, iter(entrz)).x, expected)
+
+    def test_003_no_entries(self):
+        evaluator = rules.ParallelRuleEvaluator(
+            rules.SelectRuleUsingIndex(), _DummyAccumulator, max_workers=2)
+        self.assertEqual(
+            evaluator.satisfaction([rules.MatchAny(0.5)], []).x, [])
+
+    def test_004_stats(self):
+        "Selections counted in the workers are added to the stats"
+        rulz = [rules.MatchIssueID("3", 0.9), rules.MatchAny(0.5)]
+        entrz = [_make_TimeEntry(issue_id=str(x % 5)) for x in range(23)]
+        stats = rules.EvaluationStats()
+        evaluator = rules.ParallelRuleEvaluator(
+            rules.SelectRuleUsingIndex(), _DummyAccumulator, max_workers=2,
+            chunk_size=4, stats=stats)
+        evaluator.satisfaction(rulz, entrz)
+        self.assertEqual(stats.selections, 23)
+        self.assertEqual(stats.matches(), [(rulz[0], 4), (rulz[1], 19)])
+        # One partial accumulator per chunk of 4 entries
+        self.assertEqual(stats.merges, 6)
+
+    def test_005_keyword_arguments(self):
+        "Only the selector and the accumulator can be passed by position"
+        with self.assertRaises(TypeError):
+            rules.ParallelRuleEvaluator(rules.SelectRuleUsingIndex(),
+                                        _DummyAccumulator, 2)
+
 
 class TestParseRules(unittest.TestCase):
     def assert_parse_rules(self, rules_list, expected):
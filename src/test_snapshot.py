@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+import datetime
+import json
+import os
+import tempfile
+import unittest
+
+import entries
+import main
+import rules
+import snapshot
+
+RULES = rules.parse_rules({"rules": [{"project": "ProjX", "weight": 0.0},
+                                     {"category": "Automation", "weight": 1.0},
+                                     {"issue_id": "295", "weight": 0.5},
+                                     {"weight": 0.0}]})
+
+
+def _d(day):
+    return datetime.date(2017, 6, day)
+
+
+def _e(day, issue_id="1", duration=1.0, category="Automation", project=""):
+    return entries.TimeEntry(issue_id, duration, category, "", _d(day),
+                             project)
+
+
+class TestSnapshot(unittest.TestCase):
+    def make(self):
+        return snapshot.Snapshot(main.StampedHoursAccumulator, RULES)
+
+    def refresh(self, snap, start, end, time_entries):
+        return snap.refresh(RULES, rules.SelectRuleUsingIndex(),
+                            _d(start), _d(end), time_entries)
+
+    def assert_same_as_full_evaluation(self, snap, time_entries):
+        expected = rules.RuleEvaluator(
+            rules.SelectRuleUsingIndex(),
+            main.StampedHoursAccumulator).satisfaction(RULES, time_entries)
+        actual = dict(snap.acc.days())
+        expected_days = dict(expected.days())
+        self.assertEqual(sorted(actual), sorted(expected_days))
+        for when, hours_acc in expected_days.items():
+            self.assertAlmostEqual(actual[when].good, hours_acc.good)
+            self.assertAlmostEqual(actual[when].total, hours_acc.total)
+
+    def test_001_first_refresh(self):
+        snap = self.make()
+        time_entries = [_e(1), _e(1, "295", 2.0, "Other"), _e(3, "7", 4.0)]
+        self.assertEqual(self.refresh(snap, 1, 3, time_entries), 3)
+        self.assertEqual(snap.refreshed_until, _d(3))
+        self.assert_same_as_full_evaluation(snap, time_entries)
+
+    def test_002_only_changes_are_evaluated(self):
+        snap = self.make()
+        self.refresh(snap, 1, 3, [_e(1), _e(2), _e(3)])
+        # Day 2 unchanged, day 3 edited and a new entry on day 4
+        recent = [_e(2), _e(3, duration=2.0), _e(4, category="Other")]
+        self.assertEqual(self.refresh(snap, 2, 4, recent), 3)
+        self.assert_same_as_full_evaluation(snap, [_e(1)] + recent)
+
+    def test_009_project_changed(self):
+        snap = self.make()
+        self.refresh(snap, 1, 1, [_e(1)])
+        self.assertEqual(self.refresh(snap, 1, 1, [_e(1, project="ProjX")]),
+                         2)
+        self.assert_same_as_full_evaluation(snap, [_e(1, project="ProjX")])
+
+    def test_003_duplicates(self):
+        snap = self.make()
+        self.refresh(snap, 1, 1, [_e(1), _e(1), _e(1, category="Other")])
+        self.assertEqual(self.refresh(snap, 1, 1, [_e(1)]), 2)
+        self.assert_same_as_full_evaluation(snap, [_e(1)])
+
+    def test_004_day_emptied(self):
+        snap = self.make()
+        self.refresh(snap, 1, 2, [_e(1), _e(2)])
+        self.refresh(snap, 2, 2, [])
+        self.assertEqual([when for when, _ in snap.acc.days()], [_d(1)])
+        self.assertEqual(sorted(snap.days), [_d(1)])
+
+    def test_005_drop_before(self):
+        snap = self.make()
+        self.refresh(snap, 1, 3, [_e(1), _e(2), _e(3)])
+        snap.drop_before(_d(3))
+        self.assert_same_as_full_evaluation(snap, [_e(3)])
+        self.assertEqual(sorted(snap.days), [_d(3)])
+
+    def test_006_refresh_start(self):
+        snap = self.make()
+        self.assertEqual(snap.refresh_start(_d(1), _d(30), 1), _d(1))
+        self.refresh(snap, 1, 20, [])
+        self.assertEqual(snap.refresh_start(_d(1), _d(30), 1), _d(20))
+        self.assertEqual(snap.refresh_start(_d(1), _d(21), 7), _d(15))
+        self.assertEqual(snap.refresh_start(_d(25), _d(30), 1), _d(25))
+
+    def test_007_json_round_trip(self):
+        snap = self.make()
+        self.refresh(snap, 1, 2, [_e(1), _e(1), _e(2, "295", 3.0, "Other")])
+        loaded = snapshot.Snapshot.from_json(
+            json.loads(json.dumps(snap.to_json())),
+            main.StampedHoursAccumulator, RULES)
+        self.assertEqual(loaded.days, snap.days)
+        self.assertEqual(loaded.refreshed_until, snap.refreshed_until)
+        self.assertEqual(loaded.acc.to_json(), snap.acc.to_json())
+        self.assertEqual(self.refresh(loaded, 1, 2, [_e(1)]), 2)
+
+    def test_008_other_rules(self):
+        snap = self.make()
+        self.refresh(snap, 1, 1, [_e(1)])
+        other_rules = rules.parse_rules({"rules": [{"weight": 1.0}]})
+        loaded = snapshot.Snapshot.from_json(
+            snap.to_json(), main.StampedHoursAccumulator, other_rules)
+        self.assertEqual(loaded.days, {})
+        self.assertIsNone(loaded.refreshed_until)
+        with self.assertRaises(ValueError):
+            snap.refresh(other_rules, rules.SelectRuleUsingIndex(),
+                         _d(1), _d(1), [])
+
+
+class TestLoadSave(unittest.TestCase):
+    def test_001_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "snapshot.json")
+            self.assertIsNone(snapshot.load(filename))
+            snapshot.save(filename, {"a": 1})
+            snapshot.save(filename, {"b": 2})
+            self.assertEqual(snapshot.load(filename), {"b": 2})
+            self.assertEqual(os.listdir(tmp_dir), ["snapshot.json"])
+
+
+if __name__ == "__main__":
+    import sys
+    unittest.main(verbosity=2, exit=not hasattr(sys, "ps1"))